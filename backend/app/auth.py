@@ -1,8 +1,14 @@
 # backend/app/auth.py
+import hashlib
+import threading
+import time
+from collections import OrderedDict
+
 from fastapi import Depends, HTTPException, Header
 from sqlalchemy.orm import Session
 from google.oauth2 import id_token
 from google.auth.transport import requests
+import requests as _requests
 
 from .database import SessionLocal
 from .models import User
@@ -15,14 +21,70 @@ def get_db():
     finally:
         db.close()
 
+class _TTLCache:
+    """스레드 안전한 크기 제한 LRU + 항목별 만료 시각 캐시"""
+    def __init__(self, maxsize: int):
+        self.maxsize = maxsize
+        self._data: OrderedDict = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        with self._lock:
+            item = self._data.get(key)
+            if item is None:
+                return None
+            expires_at, value = item
+            if expires_at <= time.time():
+                del self._data[key]
+                return None
+            self._data.move_to_end(key)
+            return value
+
+    def set(self, key, value, expires_at: float):
+        with self._lock:
+            self._data[key] = (expires_at, value)
+            self._data.move_to_end(key)
+            while len(self._data) > self.maxsize:
+                self._data.popitem(last=False)
+
+    def pop(self, key):
+        with self._lock:
+            self._data.pop(key, None)
+
+def _make_google_request() -> requests.Request:
+    # 커넥션을 재사용하는 공용 세션. cachecontrol 이 있으면 구글 공개키(certs)를 Cache-Control 에 맞춰 캐시
+    session = _requests.Session()
+    try:
+        import cachecontrol
+        session = cachecontrol.CacheControl(session)
+    except Exception:
+        pass
+    return requests.Request(session=session)
+
+_google_request = _make_google_request()
+_token_cache = _TTLCache(settings.auth_token_cache_size)
+_user_cache = _TTLCache(settings.auth_token_cache_size)
+
 def verify_google_id_token(token: str) -> dict:
+    # 검증된 토큰은 sha256 해시를 키로 토큰의 exp 까지 재사용
+    key = hashlib.sha256(token.encode("utf-8")).hexdigest()
+    info = _token_cache.get(key)
+    if info is not None:
+        return info
     try:
         info = id_token.verify_oauth2_token(
-            token, requests.Request(), settings.google_client_id
+            token, _google_request, settings.google_client_id
         )
-        return info
     except Exception:
         raise HTTPException(status_code=401, detail="invalid_google_token")
+    exp = float(info.get("exp") or 0)
+    if exp > time.time():
+        _token_cache.set(key, info, min(exp, time.time() + settings.auth_token_cache_ttl))
+    return info
+
+def invalidate_user_cache(sub: str | None):
+    if sub:
+        _user_cache.pop(sub)
 
 def get_current_user_google(
     authorization: str | None = Header(None),
@@ -33,7 +95,15 @@ def get_current_user_google(
     token = authorization.split(" ", 1)[1]
     info = verify_google_id_token(token)
     sub = info.get("sub")
+
+    cached = _user_cache.get(sub)
+    if cached is not None:
+        # 캐시된(세션에서 분리된) 객체를 쿼리 없이 현재 세션에 붙임
+        return db.merge(cached, load=False)
+
     user = db.query(User).filter(User.google_sub == sub).first()
     if not user:
         raise HTTPException(status_code=401, detail="user_not_registered")
-    return user
+    db.expunge(user)
+    _user_cache.set(sub, user, time.time() + settings.auth_user_cache_ttl)
+    return db.merge(user, load=False)
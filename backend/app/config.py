@@ -10,6 +10,11 @@ class Settings(BaseSettings):
     # Google OAuth (compose에서는 APP_GOOGLE_CLIENT_ID 사용 권장)
     google_client_id: str = ""
 
+    # ID 토큰 검증 캐시 (토큰 exp 와 auth_token_cache_ttl 중 이른 시각까지)
+    auth_token_cache_size: int = 4096
+    auth_token_cache_ttl: int = 3600
+    auth_user_cache_ttl: int = 30        # google_sub -> User 캐시 (초)
+
     # CORS (쉼표로 여러개 가능)
     backend_cors_origins: str = "http://localhost:3000"
 
@@ -17,6 +22,34 @@ class Settings(BaseSettings):
     media_dir: str = "/app/media"
     sqlite_path: str = "/app/db/app.db"
 
+    # 영상 처리 워커 (python -m app.worker)
+    worker_concurrency: int = 2          # 동시에 실행할 작업 수
+    job_lease_seconds: int = 120         # heartbeat 없이 이 시간이 지나면 다른 워커가 회수
+    job_max_attempts: int = 3
+    job_poll_interval: float = 2.0       # 빈 큐 확인 주기(초)
+    summary_concurrency: int = 2         # 소개문 생성 전용 슬롯 수 (영상 작업과 별도)
+
+    # 이어받기 업로드 (/uploads/video)
+    upload_chunk_size: int = 8 * 1024 * 1024       # 기본 청크 크기 (클라이언트가 1~64MB 범위에서 지정 가능)
+    upload_max_bytes: int = 4 * 1024 * 1024 * 1024
+    upload_ttl_hours: int = 48           # 이 시간 동안 완료되지 않은 세션은 파일과 함께 정리
+
+    # 분석용 프록시 영상 (Gemini 업로드 / 3D 복원 입력, app/transcode.py)
+    proxy_enabled: bool = True
+    proxy_short_side: int = 720          # 짧은 변 최대 픽셀
+    proxy_fps: int = 15
+    proxy_keyframe_sec: float = 1.0      # 키프레임 간격(초)
+    proxy_crf: int = 23
+    proxy_timeout: int = 1800            # ffmpeg 제한 시간(초)
+    ffmpeg_bin: str = "ffmpeg"
+    thumbnails_from_original: bool = True  # 상품 썸네일은 원본 해상도에서 추출 (False 면 프록시)
+
+    # 뷰어용 LOD(octree) 타일
+    lod_node_points: int = 20000         # 노드(타일) 하나의 최대 포인트 수 (루트 ≈ 300KB)
+    lod_max_depth: int = 8
+    lod_format: str = "qpc"              # "qpc"(16비트 양자화 + deflate) | "ply"
+    lod_position_bits: int = 16          # qpc 좌표 양자화 비트 수 (노드 bbox 기준, 최대 16)
+
     # Snowflake (옵션)
     snowflake_account: str | None = None
     snowflake_user: str | None = None
@@ -25,6 +58,11 @@ class Settings(BaseSettings):
     snowflake_warehouse: str | None = None
     snowflake_database: str | None = None
     snowflake_schema: str | None = None
+    snowflake_pool_size: int = 4         # 재사용할 커넥션 수 (= 동시에 경쟁시킬 Cortex 호출 수)
+    cortex_model_timeout: int = 60       # 모델별 호출 제한 시간(초)
+    cortex_hedge_delay: float = 20.0     # 이 시간 안에 응답이 없으면 다음 모델도 시작 (실패하면 즉시 시작)
+    cortex_batch_size: int = 100         # 일괄 생성 시 한 문장(SELECT)에 묶을 프롬프트 수
+    cortex_batch_timeout: int = 900      # 일괄 생성 문장 하나의 제한 시간(초)
 
     # .env/compose 에서 APP_ 프리픽스 읽기
     model_config = SettingsConfigDict(
@@ -1,5 +1,5 @@
 # backend/app/database.py
-from sqlalchemy import create_engine
+from sqlalchemy import create_engine, event, inspect, text
 from sqlalchemy.orm import sessionmaker, declarative_base
 from pathlib import Path
 from .config import settings
@@ -12,7 +12,29 @@ SQLALCHEMY_DATABASE_URL = f"sqlite:///{sqlite_path}"
 
 engine = create_engine(
     SQLALCHEMY_DATABASE_URL,
-    connect_args={"check_same_thread": False},
+    connect_args={"check_same_thread": False, "timeout": 30},
 )
+
+# API 와 워커 프로세스가 같은 파일을 동시에 쓰므로 WAL 모드 사용
+@event.listens_for(engine, "connect")
+def _sqlite_pragmas(dbapi_conn, _record):
+    cur = dbapi_conn.cursor()
+    cur.execute("PRAGMA journal_mode=WAL")
+    cur.execute("PRAGMA busy_timeout=30000")
+    cur.close()
+
 SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
 Base = declarative_base()
+
+def add_missing_columns(table) -> None:
+    """
+    create_all 은 기존 테이블에 컬럼을 추가하지 않으므로, 모델에 새로 생긴 nullable 컬럼을
+    ALTER TABLE ADD COLUMN 으로 보충합니다. (마이그레이션 도구 없이 운영 중인 SQLite 용)
+    """
+    existing = {c["name"] for c in inspect(engine).get_columns(table.name)}
+    with engine.begin() as conn:
+        for col in table.columns:
+            if col.name in existing or not col.nullable:
+                continue
+            col_type = col.type.compile(dialect=engine.dialect)
+            conn.execute(text(f'ALTER TABLE "{table.name}" ADD COLUMN "{col.name}" {col_type}'))
@@ -0,0 +1,136 @@
+# backend/app/jobs.py
+# SQLite 기반 영구 작업 큐: 적재(enqueue) / lease 획득(claim) / heartbeat / 완료 처리
+from __future__ import annotations
+import json
+from datetime import datetime, timedelta
+from typing import Optional
+
+from sqlalchemy import or_, and_, update
+from sqlalchemy.orm import Session
+
+from .config import settings
+from . import models
+
+
+def enqueue_job(db: Session, post_id: int, kind: str = "video", **payload) -> models.Job:
+    job = models.Job(
+        post_id=post_id,
+        kind=kind,
+        payload=json.dumps(payload, ensure_ascii=False),
+        status="queued",
+        max_attempts=settings.job_max_attempts,
+    )
+    db.add(job)
+    db.commit()
+    db.refresh(job)
+    return job
+
+
+def _claimable(now: datetime):
+    # 대기 중이거나, 실행 중이지만 lease가 만료된(워커가 죽은) 작업
+    return or_(
+        models.Job.status == "queued",
+        and_(
+            models.Job.status == "running",
+            models.Job.lease_until < now,
+            models.Job.attempts < models.Job.max_attempts,
+        ),
+    )
+
+
+def claim_next_job(db: Session, worker_id: str, kinds: Optional[tuple[str, ...]] = None) -> Optional[models.Job]:
+    """
+    가장 오래된 실행 가능한 작업 하나에 lease를 잡습니다. kinds 를 주면 해당 종류의 작업만 가져옵니다.
+    조건부 UPDATE 의 rowcount 로 다른 워커와의 경쟁을 판정하므로 여러 프로세스에서 동시에 호출해도 안전합니다.
+    """
+    now = datetime.utcnow()
+    for _ in range(5):
+        q = db.query(models.Job.id).filter(_claimable(now))
+        if kinds:
+            q = q.filter(models.Job.kind.in_(kinds))
+        cand = q.order_by(models.Job.id.asc()).first()
+        if not cand:
+            return None
+        res = db.execute(
+            update(models.Job)
+            .where(models.Job.id == cand.id, _claimable(now))
+            .values(
+                status="running",
+                worker_id=worker_id,
+                lease_until=now + timedelta(seconds=settings.job_lease_seconds),
+                attempts=models.Job.attempts + 1,
+                updated_at=now,
+            )
+        )
+        db.commit()
+        if res.rowcount == 1:
+            return db.get(models.Job, cand.id)
+    return None
+
+
+def hold_lease(db: Session, job_id: int, worker_id: str) -> bool:
+    """
+    heartbeat 와 같은 조건부 lease 연장을 커밋 없이 실행합니다. 다른 워커가 이미 회수한 작업이면 False.
+    호출 측의 결과 기록과 같은 트랜잭션으로 커밋되므로, lease 를 가진 동안에만 결과가 기록됩니다.
+    """
+    now = datetime.utcnow()
+    res = db.execute(
+        update(models.Job)
+        .where(models.Job.id == job_id, models.Job.worker_id == worker_id, models.Job.status == "running")
+        .values(lease_until=now + timedelta(seconds=settings.job_lease_seconds), updated_at=now)
+    )
+    return res.rowcount == 1
+
+
+def heartbeat(db: Session, job_id: int, worker_id: str) -> bool:
+    """lease 연장. 다른 워커가 이미 회수한 작업이면 False."""
+    ok = hold_lease(db, job_id, worker_id)
+    db.commit()
+    return ok
+
+
+def finish_job(
+    db: Session, job: models.Job, worker_id: str, ok: bool, error: Optional[str] = None
+) -> Optional[str]:
+    """
+    작업 종료 처리. 실패했고 재시도 횟수가 남아 있으면 다시 queued 로 되돌립니다.
+    아직 이 워커가 lease 를 가진 경우에만 조건부 UPDATE 로 바꾸며, 최종 상태("done" | "queued" | "failed")를 반환합니다.
+    그 사이 lease 가 만료되어 다른 워커가 회수한 작업이면 결과를 버리고 None 을 반환합니다.
+    """
+    if ok:
+        status = "done"
+    elif job.attempts < job.max_attempts:
+        status = "queued"
+    else:
+        status = "failed"
+    res = db.execute(
+        update(models.Job)
+        .where(models.Job.id == job.id, models.Job.status == "running", models.Job.worker_id == worker_id)
+        .values(status=status, last_error=error, lease_until=None, updated_at=datetime.utcnow())
+    )
+    db.commit()
+    if res.rowcount != 1:
+        return None
+    return status
+
+
+def recover_orphaned_jobs(db: Session) -> tuple[int, list[int]]:
+    """
+    lease가 만료된 실행 중 작업을 정리합니다.
+    재시도 횟수가 남은 작업은 큐로 되돌리고, 소진된 작업은 failed 로 바꿉니다.
+    (되돌린 작업 수, failed 처리된 영상 작업들의 post_id 목록)을 반환합니다.
+    """
+    now = datetime.utcnow()
+    expired = and_(models.Job.status == "running", models.Job.lease_until < now)
+    exhausted = db.query(models.Job).filter(expired, models.Job.attempts >= models.Job.max_attempts).all()
+    for job in exhausted:
+        job.status = "failed"
+        job.lease_until = None
+        job.last_error = job.last_error or "lease_expired"
+    res = db.execute(
+        update(models.Job)
+        .where(expired, models.Job.attempts < models.Job.max_attempts)
+        .values(status="queued", worker_id=None, lease_until=None, updated_at=now)
+    )
+    db.commit()
+    return res.rowcount, [job.post_id for job in exhausted if job.kind == "video"]
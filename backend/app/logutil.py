@@ -0,0 +1,11 @@
+# backend/app/logutil.py
+# "접두어 | k=v k=v" 형태의 한 줄 로그 (API / 워커 / 소개문 생성 공용)
+import logging
+
+
+def log_kv(logger: logging.Logger, prefix: str, **kv):
+    try:
+        msg = prefix + " | " + " ".join(f"{k}={v}" for k, v in kv.items())
+        logger.info(msg)
+    except Exception:
+        logger.info(prefix)
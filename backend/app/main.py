@@ -1,34 +1,34 @@
-from fastapi import FastAPI, Depends, HTTPException, UploadFile, File, BackgroundTasks
+from fastapi import FastAPI, Depends, HTTPException, UploadFile, File, Query, Response, Request
 from fastapi.middleware.cors import CORSMiddleware
-from fastapi.staticfiles import StaticFiles
-from sqlalchemy.orm import Session
+from fastapi.concurrency import run_in_threadpool
+from sqlalchemy.orm import Session, joinedload, selectinload
 from pathlib import Path
 import uuid
+import hashlib
 import logging
 import re
 import os
-import json
-import traceback
-from contextlib import contextmanager
+import shutil
+from functools import partial
 from typing import Optional
-from datetime import datetime
 
 from .config import settings
-from .database import Base, engine, SessionLocal
-from . import models, schemas
-from .auth import get_db, verify_google_id_token, get_current_user_google
+from .database import Base, engine, SessionLocal, add_missing_columns
+from . import models, schemas, media, uploads
+from .jobs import enqueue_job
+from .pipeline import find_done_duplicate, clone_results
+from . import review_stats
+from .products import product_out, ensure_populated as ensure_products_populated
+from .summary import summary_is_fresh
+from .logutil import log_kv
+from .auth import get_db, verify_google_id_token, get_current_user_google, invalidate_user_cache
 
 app = FastAPI(title="Board Backend", version="1.1.1")
 
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger("board")
 
-def _log_kv(prefix: str, **kv):
-    try:
-        msg = prefix + " | " + " ".join(f"{k}={v}" for k, v in kv.items())
-        logger.info(msg)
-    except Exception:
-        logger.info(prefix)
+_log_kv = partial(log_kv, logger)
 
 def _get_allowed_origins() -> list[str]:
     raw = (os.getenv("APP_BACKEND_CORS_ORIGINS")
@@ -45,18 +45,46 @@ app.add_middleware(
     allow_credentials=True,
     allow_methods=["*"],
     allow_headers=["*"],
-    expose_headers=["Content-Disposition"],
+    expose_headers=["Content-Disposition", "X-Next-Before"],
     max_age=86400,
 )
 
 Base.metadata.create_all(bind=engine)
+# create_all 은 기존 테이블에 새 컬럼/인덱스를 추가하지 않으므로 따로 보장
+for _table in (models.User.__table__, models.Post.__table__, models.Product.__table__):
+    add_missing_columns(_table)
+    for _idx in _table.indexes:
+        _idx.create(bind=engine, checkfirst=True)
 
 media_root = Path(settings.media_dir)
 media_root.mkdir(parents=True, exist_ok=True)
 for sub in ("videos", "ply", "traj", "points", "logs"):
     (media_root / sub).mkdir(parents=True, exist_ok=True)
 
-app.mount("/media", StaticFiles(directory=str(media_root)), name="media")
+@app.api_route("/media/{rel_path:path}", methods=["GET", "HEAD"])
+def get_media_file(rel_path: str, request: Request):
+    # ?v=버전 URL 은 immutable, 그 외에는 ETag 재검증 / 압축 사본 / Range 지원 (app/media.py)
+    return media.serve(request, rel_path)
+
+# LOD 타일 / 앵커 파일: 이름에 내용 해시가 들어가 내용이 바뀌면 URL 도 바뀌므로 항상 영구 캐시
+_CONTENT_HASH_RE = re.compile(r"_(?:lod|anchors)-[0-9a-f]{12}")
+
+@app.api_route("/lod/{rel_path:path}", methods=["GET", "HEAD"])
+def get_lod_file(rel_path: str, request: Request):
+    if not _CONTENT_HASH_RE.search(Path(rel_path).parent.name):
+        raise HTTPException(status_code=404, detail="not_found")
+    return media.serve(request, rel_path, immutable=True)
+
+@app.api_route("/anchors/{rel_path:path}", methods=["GET", "HEAD"])
+def get_anchors_file(rel_path: str, request: Request):
+    if not _CONTENT_HASH_RE.search(Path(rel_path).name):
+        raise HTTPException(status_code=404, detail="not_found")
+    return media.serve(request, rel_path, immutable=True)
+
+# 파생 테이블(리뷰 집계, 상품)이 비어 있으면 기존 데이터로 한 번 채움
+with SessionLocal() as _db:
+    review_stats.ensure_populated(_db)
+    ensure_products_populated(_db, media_root)
 
 _RAW_MARKETS = [
     "용두시장","B청량리농수산물시장","C경동시장","D동서시장","E전농로터리시장","F동부시장","G전곡시장","H이경시장","I이문제일시장",
@@ -125,39 +153,13 @@ def signup(payload: schemas.SignupRequest, db: Session = Depends(get_db)):
         )
         db.add(user)
     db.commit()
+    invalidate_user_cache(sub)
     return {"ok": True}
 
 @app.get("/me", response_model=schemas.UserOut)
 def me(user: models.User = Depends(get_current_user_google)):
     return user
 
-def _stats(db: Session, post_id: int) -> schemas.ReviewStats:
-    qs = db.query(models.Review).filter(models.Review.post_id == post_id)
-    total = qs.count()
-
-    def c(field, val):
-        return qs.filter(getattr(models.Review, field) == val).count()
-
-    def pack(field, pos_alias=(), neu_alias=("mid",), neg_alias=()):
-        pos = c(field, 1)
-        neu = c(field, 0)
-        neg = c(field, -1)
-        d = {
-            "1": pos, "0": neu, "-1": neg,
-            "pos": pos, "neu": neu, "neg": neg,
-        }
-        for a in pos_alias: d[a] = pos
-        for a in neu_alias: d[a] = neu
-        for a in neg_alias: d[a] = neg
-        return d
-
-    return schemas.ReviewStats(
-        total=total,
-        kindness=pack("kindness", pos_alias=("positive",), neg_alias=("negative",)),
-        price=pack("price",    pos_alias=("cheap",),       neg_alias=("exp",)),
-        variety=pack("variety",pos_alias=("div",),         neg_alias=("low",)),
-    )
-
 @app.post("/posts/{post_id}/reviews", response_model=schemas.ReviewStats)
 def upsert_review(
     post_id: int,
@@ -182,84 +184,60 @@ def upsert_review(
     v = norm(payload.variety)
 
     r = db.query(models.Review).filter_by(post_id=post_id, user_id=user.id).first()
+    new = {"kindness": k, "price": p, "variety": v}
     if r:
+        old = {"kindness": r.kindness, "price": r.price, "variety": r.variety}
         r.kindness = k
         r.price = p
         r.variety = v
     else:
+        old = None
         r = models.Review(post_id=post_id, user_id=user.id, kindness=k, price=p, variety=v)
         db.add(r)
 
+    # 리뷰 저장과 같은 트랜잭션에서 집계 반영
+    review_stats.apply_review_change(db, post_id, old, new)
     db.commit()
-    return _stats(db, post_id)
+    return review_stats.get_stats(db, post_id)
 
 @app.get("/posts/{post_id}/reviews", response_model=schemas.ReviewStats)
 def get_reviews_stats(post_id: int, db: Session = Depends(get_db)):
     post = db.query(models.Post).filter(models.Post.id == post_id).first()
     if not post:
         raise HTTPException(status_code=404, detail="not_found")
-    return _stats(db, post_id)
-
-def _load_products_json_for_post(p: models.Post) -> Optional[list[dict]]:
-    folder = None
-    if p.video_path:
-        folder = (media_root / p.video_path).parent
-    elif p.ply_path:
-        folder = (media_root / p.ply_path).parent
-    if not folder:
-        return None
-    try:
-        stem = folder.name
-        candidates = [
-            folder / f"{stem}.json",
-            *sorted(folder.glob("*.json"))
-        ]
-        for cand in candidates:
-            if cand.exists():
-                with open(cand, "r", encoding="utf-8") as f:
-                    data = json.load(f)
-                if isinstance(data, list):
-                    out = []
-                    for idx, it in enumerate(data):
-                        if not isinstance(it, dict):
-                            continue
-                        item = {
-                            "name": it.get("name"),
-                            "price": it.get("price"),
-                            "time_min": int(it.get("time_min", 0) or 0),
-                            "time_sec": int(it.get("time_sec", 0) or 0),
-                            "time_ms": int(it.get("time_ms", 0) or 0),
-                        }
-                        img_file = folder / "img" / f"{idx}.png"
-                        if img_file.exists():
-                            item["image_url"] = f"/media/{folder.name}/img/{idx}.png"
-                        else:
-                            item["image_url"] = None
-                        out.append(item)
-                    return out
-        return None
-    except Exception as e:
-        logger.warning("products json load failed: %s", e)
-        return None
-
-def _post_out(p: models.Post, db: Session) -> schemas.PostOut:
-    return {
+    return review_stats.get_stats(db, post_id)
+
+_FULL_FIELDS = ("ai_summary", "products")
+
+def _post_out(
+    p: models.Post,
+    db: Session,
+    stats: Optional[schemas.ReviewStats] = None,
+    include: tuple[str, ...] = _FULL_FIELDS,
+) -> schemas.PostOut:
+    out = {
         "id": p.id,
         "created_at": p.created_at,
         "content": p.content,
-        "video_url": f"/media/{p.video_path}" if p.video_path else None,
-        "ply_url": f"/media/{p.ply_path}" if p.ply_path else None,
-        "traj_url": f"/media/{p.traj_path}" if p.traj_path else None,
-        "points_url": f"/media/{p.points_path}" if p.points_path else None,
+        "video_url": media.media_url(p.video_path, p.video_version),
+        "ply_url": media.media_url(p.ply_path, p.ply_version),
+        "traj_url": media.media_url(p.traj_path, p.traj_version),
+        "points_url": media.media_url(p.points_path, p.points_version),
+        "lod_url": f"/lod/{p.lod_path}" if p.lod_path else None,
+        "anchors_url": f"/anchors/{p.anchors_path}" if p.anchors_path else None,
         "status": p.status,
         "log_url": (f"/media/{p.log_path}" if p.log_path else None),
         "store_name": p.author.store_name if p.author else None,
         "market": p.author.market if p.author else None,
         "stall_no": p.author.stall_no if p.author else None,
-        "review_stats": _stats(db, p.id),
-        "ai_summary": p.ai_summary,
-        "products": _load_products_json_for_post(p),
+        "review_stats": stats if stats is not None else review_stats.get_stats(db, p.id),
     }
+    # 무거운 필드는 요청된 경우에만 (피드에서는 생략)
+    if "ai_summary" in include:
+        out["ai_summary"] = p.ai_summary
+    if "products" in include:
+        out["products"] = [product_out(pr) for pr in p.products] or None
+    return out
 
 from fastapi import UploadFile as _UF, File as _File
 @app.post("/posts", response_model=schemas.PostOut)
@@ -308,6 +286,7 @@ async def create_post_ply(
         author_id=user.id,
         ply_path=ply_name, traj_path=traj_name, points_path=points_name
     )
+    media.stamp_post_versions(post)
     db.add(post)
     db.commit()
     db.refresh(post)
@@ -326,128 +305,8 @@ def _safe_stem(original_filename: str) -> str:
         i += 1
     return stem
 
-def _append_log(log_file: Path, msg: str):
-    log_file.parent.mkdir(parents=True, exist_ok=True)
-    with open(log_file, "a", encoding="utf-8") as f:
-        f.write(f"{datetime.utcnow().isoformat()}Z | {msg}\n")
-
-def _classify_txt_name(name: str) -> str:
-    n = name.lower()
-    if any(k in n for k in ("traj", "trajectory", "tum")):
-        return "traj"
-    if any(k in n for k in ("point", "coord", "xyz")):
-        return "points"
-    return "traj"
-
-def _process_video_job(post_id: int, video_rel: str, log_rel: str):
-    log_file = media_root / log_rel
-    _append_log(log_file, f"Job start post_id={post_id} video={video_rel}")
-    db = SessionLocal()
-    try:
-        from . import process_video as pv
-    except Exception as e:
-        _append_log(log_file, f"process_video import 실패: {e}")
-        db_post = db.query(models.Post).get(post_id)
-        if db_post:
-            db_post.status = "error"
-            db.commit()
-        db.close()
-        return
-
-    try:
-        db_post = db.query(models.Post).get(post_id)
-        if not db_post:
-            _append_log(log_file, "Post not found")
-            return
-
-        db_post.status = "processing"
-        db.commit()
-
-        video_abs = media_root / video_rel
-        work_dir = video_abs.parent
-
-        _append_log(log_file, "3D 변환 시작(get_3d_model)")
-        pv.get_3d_model(str(video_abs))
-        product_result = pv.analyze_products_in_video(str(video_abs))
-        pv.save_product_frames(str(video_abs), product_result)
-        _append_log(log_file, "3D 변환 완료, 결과 스캔")
-
-        ply_file = None
-        txt_files = []
-        json_files = []
-        for pth in work_dir.iterdir():
-            if pth.is_file():
-                if pth.suffix.lower() == ".ply" and not ply_file:
-                    ply_file = pth
-                if pth.suffix.lower() == ".txt":
-                    txt_files.append(pth)
-                if pth.suffix.lower() == ".json":
-                    json_files.append(pth)
-
-        if not ply_file and not txt_files and not json_files:
-            _append_log(log_file, "결과 파일(.ply/.txt/.json) 미발견")
-            db_post.status = "error"
-            db.commit()
-            return
-
-        if ply_file:
-            rel = f"{work_dir.name}/{ply_file.name}"
-            db_post.ply_path = rel
-            _append_log(log_file, f"PLY 기록: /media/{rel}")
-
-        used_traj = False
-        used_points = False
-        for t in txt_files:
-            kind = _classify_txt_name(t.name)
-            rel = f"{work_dir.name}/{t.name}"
-            if kind == "traj" and not used_traj:
-                db_post.traj_path = rel
-                used_traj = True
-                _append_log(log_file, f"TRAJ 기록: /media/{rel}")
-            elif kind == "points" and not used_points:
-                db_post.points_path = rel
-                used_points = True
-                _append_log(log_file, f"POINTS 기록(txt): /media/{rel}")
-            else:
-                _append_log(log_file, f"EXTRA TXT: /media/{rel}")
-
-        # 좌표 포함된 제품 JSON을 points 소스로도 사용
-        stem = work_dir.name
-        target_json = None
-        for j in json_files:
-            if j.name.lower() == f"{stem}.json":
-                target_json = j
-                break
-        if target_json is None and json_files:
-            target_json = json_files[0]
-
-        for j in json_files:
-            _append_log(log_file, f"PRODUCTS JSON 발견: /media/{work_dir.name}/{j.name}")
-
-        if target_json is not None:
-            rel = f"{work_dir.name}/{target_json.name}"
-            db_post.points_path = rel  # JSON 우선 사용 (PLYViewer가 x,y,z 추출)
-            _append_log(log_file, f"COORDS(JSON) 기록: /media/{rel}")
-
-        db_post.status = "done"
-        db.commit()
-        _append_log(log_file, "Job done")
-    except Exception as e:
-        _append_log(log_file, f"오류: {e}")
-        _append_log(log_file, f"TRACE:\n{traceback.format_exc()}")
-        try:
-            db_post = db.query(models.Post).get(post_id)
-            if db_post:
-                db_post.status = "error"
-                db.commit()
-        except:
-            pass
-    finally:
-        db.close()
-
 @app.post("/posts/video", response_model=schemas.PostOut)
 async def create_post_video(
-    background: BackgroundTasks,
     video: UploadFile = File(...),
     db: Session = Depends(get_db),
     user: models.User = Depends(get_current_user_google),
@@ -466,200 +325,233 @@ async def create_post_video(
     video_rel = f"{stem}/{stem}{ext}"
     video_abs = media_root / video_rel
 
+    # 디스크에 쓰는 동안 같은 청크로 내용 해시 계산
+    digest = hashlib.sha256()
     with open(video_abs, "wb") as f:
         while True:
             chunk = await video.read(1024 * 1024)
             if not chunk: break
+            digest.update(chunk)
             f.write(chunk)
     await video.close()
-
-    log_rel = f"{stem}/process.log"
+    video_sha256 = digest.hexdigest()
+
+    return _start_video_post(db, user, video_rel, video_sha256)
+
+def _start_video_post(
+    db: Session,
+    user: models.User,
+    video_rel: str,
+    video_sha256: str,
+    upload: Optional[models.Upload] = None,
+) -> schemas.PostOut:
+    """
+    업로드가 끝난 영상으로 게시글을 만들고, 중복이면 결과를 연결하고 아니면 처리 작업을 적재합니다.
+    upload 를 주면 게시글 생성과 같은 커밋에서 업로드 세션을 complete 로 바꿉니다.
+    """
+    log_rel = f"{Path(video_rel).parent.as_posix()}/process.log"
 
     post = models.Post(
         author_id=user.id,
         video_path=video_rel,
+        video_sha256=video_sha256,
         status="processing",
         log_path=log_rel,
     )
+    media.stamp_post_versions(post)  # 영상 버전은 업로드 때 계산한 video_sha256 을 그대로 사용
     db.add(post)
+    if upload is not None:
+        db.flush()
+        uploads.mark_complete(upload, post.id)
     db.commit()
     db.refresh(post)
 
-    background.add_task(_process_video_job, post.id, video_rel, log_rel)
+    # 같은 영상이 이미 처리되어 있으면 결과를 바로 연결 (재처리 없음)
+    src = find_done_duplicate(db, video_sha256, exclude_post_id=post.id)
+    if src is not None:
+        clone_results(db, src, post, media_root / log_rel)
+        db.commit()
+        db.refresh(post)
+        return _post_out(post, db)
+
+    # 실제 처리는 별도 워커 프로세스(python -m app.worker)가 jobs 테이블에서 가져가 수행
+    enqueue_job(db, post.id, video_rel=video_rel, log_rel=log_rel)
 
     return _post_out(post, db)
 
-@app.get("/posts", response_model=list[schemas.PostOut])
-def list_posts(db: Session = Depends(get_db)):
-    posts = db.query(models.Post).order_by(models.Post.id.desc()).all()
-    return [_post_out(p, db) for p in posts]
+# --- 이어받기 업로드 (app/uploads.py) ---
+# POST /uploads/video 로 세션을 만들고, PUT /uploads/{id}/chunks/{n} 로 청크를 보낸 뒤 complete 하면
+# create_post_video 와 같은 흐름(중복 판정 -> 작업 적재)으로 게시글이 만들어집니다.
 
-@app.get("/posts/{post_id}", response_model=schemas.PostOut)
-def get_post(post_id: int, db: Session = Depends(get_db)):
-    p = db.query(models.Post).filter(models.Post.id == post_id).first()
-    if not p:
-        raise HTTPException(status_code=404, detail="not_found")
-    return _post_out(p, db)
+@app.post("/uploads/video", response_model=schemas.UploadOut)
+def create_video_upload(
+    payload: schemas.UploadCreate,
+    db: Session = Depends(get_db),
+    user: models.User = Depends(get_current_user_google),
+):
+    if user.role != "SELLER":
+        raise HTTPException(status_code=403, detail="forbidden")
 
-@contextmanager
-def _snowflake_conn():
-    try:
-        import snowflake.connector as sf
-    except Exception as e:
-        logger.error("Snowflake 커넥터 import 실패: %s", e)
-        raise
-    cfg = {
-        "account":   settings.snowflake_account,
-        "user":      settings.snowflake_user,
-        "password":  settings.snowflake_password,
-        "role":      settings.snowflake_role,
-        "warehouse": settings.snowflake_warehouse,
-        "database":  settings.snowflake_database,
-        "schema":    settings.snowflake_schema,
-        "client_session_keep_alive": True,
-    }
-    redacted = {k: ("***" if k == "password" else v) for k, v in cfg.items()}
-    _log_kv("Snowflake 연결 시도", **redacted)
+    ext = Path(payload.filename).suffix.lower()
+    if ext not in (".mp4",):
+        raise HTTPException(status_code=400, detail="mp4_only")
 
-    for k in ("account","user","password","warehouse","database","schema"):
-        if not cfg.get(k):
-            raise RuntimeError(f"Snowflake 설정 누락: {k}")
+    uploads.purge_expired(db)
 
-    conn = None
+    stem = _safe_stem(payload.filename)
+    work_dir = media_root / stem
+    work_dir.mkdir(parents=True, exist_ok=True)
     try:
-        conn = sf.connect(**cfg)
-        cur = conn.cursor()
-        try:
-            cur.execute("SELECT CURRENT_ROLE(), CURRENT_WAREHOUSE(), CURRENT_DATABASE(), CURRENT_SCHEMA()")
-            row = cur.fetchone()
-            _log_kv("Snowflake 세션 확인",
-                    current_role=row[0], current_wh=row[1], current_db=row[2], current_schema=row[3])
-        finally:
-            cur.close()
-        yield conn
-    except Exception as e:
-        logger.error("Snowflake 연결 실패: %s", e)
-        logger.error("TRACE:\n%s", traceback.format_exc())
+        up = uploads.create_upload(
+            db, user.id, payload.filename, f"{stem}/{stem}{ext}",
+            payload.size, payload.chunk_size, payload.sha256,
+        )
+    except HTTPException:
+        shutil.rmtree(work_dir, ignore_errors=True)
         raise
-    finally:
-        try:
-            if conn is not None:
-                conn.close()
-        except Exception:
-            pass
-
-def _snowflake_cortex_complete(conn, prompt: str, model_list: Optional[list[str]] = None) -> str:
-    if model_list is None:
-        model_list = [
-            "mistral-large2",
-            "mistral-large",
-            "snowflake-arctic",
-            "snowflake-arctic-m",
-            "llama3-70b-instruct",
-        ]
-    _log_kv("Cortex 호출 준비", prompt_preview=prompt[:160].replace("\n", " "))
-    def esc(s: str) -> str:
-        return s.replace("'", "''")
-    cur = conn.cursor()
-    try:
-        for model in model_list:
+    _log_kv("업로드 세션 생성", upload_id=up.id, size=up.size, chunks=up.total_chunks)
+    return uploads.upload_out(db, up)
+
+@app.get("/uploads/{upload_id}", response_model=schemas.UploadOut)
+def get_video_upload(
+    upload_id: int,
+    db: Session = Depends(get_db),
+    user: models.User = Depends(get_current_user_google),
+):
+    return uploads.upload_out(db, uploads.get_upload(db, upload_id, user.id))
+
+@app.put("/uploads/{upload_id}/chunks/{index}", response_model=schemas.SimpleOK)
+async def put_video_upload_chunk(
+    upload_id: int,
+    index: int,
+    request: Request,
+    db: Session = Depends(get_db),
+    user: models.User = Depends(get_current_user_google),
+):
+    # 본문은 청크 원본 바이트 (multipart 아님), 헤더 X-Chunk-Sha256 이 있으면 대조
+    # 본문 수신만 이벤트 루프에서 하고, DB 조회와 해시/파일 쓰기/커밋은 다른 동기 핸들러처럼 스레드풀에서 실행
+    up = await run_in_threadpool(uploads.get_upload, db, upload_id, user.id)
+    expected_len = uploads.check_chunk(up, index)
+    data = await uploads.read_chunk(request.stream(), expected_len)
+    await run_in_threadpool(uploads.write_chunk, db, up, index, data, request.headers.get("x-chunk-sha256"))
+    return {"ok": True}
+
+@app.post("/uploads/{upload_id}/complete", response_model=schemas.PostOut)
+def complete_video_upload(
+    upload_id: int,
+    db: Session = Depends(get_db),
+    user: models.User = Depends(get_current_user_google),
+):
+    up = uploads.get_upload(db, upload_id, user.id)
+    if up.post_id is None:
+        video_sha256 = uploads.finalize(db, up)
+        if video_sha256 is not None:
             try:
-                sql = f"SELECT SNOWFLAKE.CORTEX.COMPLETE('{esc(model)}', '{esc(prompt)}') AS TEXT"
-                _log_kv("Cortex 시도", model=model)
-                cur.execute(sql)
-                row = cur.fetchone()
-                if row and row[0] is not None:
-                    text = str(row[0])
-                    _log_kv("Cortex 성공", model=model, len=len(text))
-                    return text
-            except Exception as e:
-                logger.warning("모델 %s 실패: %s", model, e)
-        raise RuntimeError("모든 Cortex 모델 호출 실패")
-    finally:
-        cur.close()
-
-def _build_shop_prompt(store_name: str, market: Optional[str], stall_no: Optional[str], stats: schemas.ReviewStats) -> str:
-    def part(tag: str, d: dict) -> str:
-        kv = ", ".join(f"{k}:{v}" for k, v in d.items())
-        return f"{tag}({kv})"
-    reviews = f"총 {stats.total}명이 평가. " \
-              f"{part('친절도', stats.kindness)}, " \
-              f"{part('가격',   stats.price)}, " \
-              f"{part('구성',   stats.variety)}."
-    loc = []
-    if market: loc.append(f"시장: {market}")
-    if stall_no: loc.append(f"위치/호수: {stall_no}")
-    loc_str = " / ".join(loc) if loc else "위치 정보: 미상"
-    guide = (
-    "아래 가게에 대한 한국어 소개문을 작성하세요.\n"
-    "- 길이: 300자 이상 600자 이하, 3~6문장.\n"
-    "- 톤: 밝고 따뜻하며 먹음직스럽게. 과장·허위·이모지 금지.\n"
-    "- 가능한 한 리뷰 요약을 근거로 인상과 장점을 균형 있게 서술.\n"
-    "- 특정 고유명사는 그대로 유지.\n"
-    "- **시장 주변의 명소**를 활용하여, 가게 방문 동선을 자연스럽게 연결해 소개.\n"
-    "- **시장을 제외한 구체적인 명소 이름을 찾아오고, 없으면 생략. 단, 반드시 동대문구 안에 있는 장소여야 함.\n"
-    "- 주변 명소는 *도보 n분*이나 *차로 m분*과 같은 형식으로 서술. 모호하면 “가까운”, “근처” 등 일반 표현 사용.\n"
-    "- 눈길을 끌 수 있는 센스 있는 문구를 적절히 포함.\n"
-    "- **반드시 Markdown 문법을 적극적으로 활용**하여 시장, 평가, 주변 명소를 적절히 강조할 것.\n"
-    "- 마지막 줄에는 한 줄 띄운 후, 파란 글씨(`span` 태그 style)로 적절한 해시태그를 넣을 것.\n"
-    "- 오직 소개문만 출력하고, 추가 설명은 하지 말 것.\n"
-)
-    info = (
-        f"[가게명] {store_name or '이 가게'}\n"
-        f"[시장/위치] {loc_str}\n"
-        f"[리뷰 요약] {reviews}\n"
-    )
-    return guide + "\n" + info + "\n[출력형식] 순수 본문만 작성"
+                out = _start_video_post(db, user, up.video_path, video_sha256, upload=up)
+            except Exception:
+                uploads.release(db, up)
+                raise
+            _log_kv("업로드 완료", upload_id=up.id, post_id=up.post_id)
+            return out
+        # 다른 요청이 완료 처리 중: 끝나면 같은 게시글을 반환
+        if uploads.wait_finalized(db, up) is None:
+            raise HTTPException(status_code=409, detail="upload_finalizing")
+    # 응답 유실 후 재시도: 이미 만든 게시글을 그대로 반환
+    return _post_out(db.get(models.Post, up.post_id), db)
+
+@app.get("/posts", response_model=list[schemas.PostOut], response_model_exclude_unset=True)
+def list_posts(
+    response: Response,
+    before: Optional[int] = Query(None, description="이 id 보다 작은 게시글부터 (keyset 커서)"),
+    limit: int = Query(20, ge=1, le=100),
+    market: Optional[str] = None,
+    author_id: Optional[int] = None,
+    include: Optional[str] = Query(None, description="쉼표 구분: ai_summary,products"),
+    db: Session = Depends(get_db),
+):
+    fields = tuple(f.strip() for f in (include or "").split(",") if f.strip() in _FULL_FIELDS)
+    q = db.query(models.Post).options(joinedload(models.Post.author))
+    if "products" in fields:
+        q = q.options(selectinload(models.Post.products))
+    if market:
+        q = q.join(models.User, models.Post.author_id == models.User.id).filter(models.User.market == market)
+    if author_id is not None:
+        q = q.filter(models.Post.author_id == author_id)
+    if before is not None:
+        q = q.filter(models.Post.id < before)
+    posts = q.order_by(models.Post.id.desc()).limit(limit).all()
+
+    # 다음 페이지 커서: 꽉 찬 페이지였다면 마지막 id
+    if len(posts) == limit:
+        response.headers["X-Next-Before"] = str(posts[-1].id)
+
+    stats = review_stats.get_stats_bulk(db, [p.id for p in posts])
+    return [_post_out(p, db, stats[p.id], include=fields) for p in posts]
 
-@app.get("/posts/{post_id}/summary", response_model=schemas.PostOut)
-def get_post_for_summary(post_id: int, db: Session = Depends(get_db)):
+@app.get("/posts/{post_id}", response_model=schemas.PostOut)
+def get_post(post_id: int, db: Session = Depends(get_db)):
     p = db.query(models.Post).filter(models.Post.id == post_id).first()
     if not p:
         raise HTTPException(status_code=404, detail="not_found")
     return _post_out(p, db)
 
-@app.post("/posts/{post_id}/summary", response_model=dict)
-def gen_summary(post_id: int, db: Session = Depends(get_db)):
+@app.get("/posts/{post_id}/summary", response_model=schemas.PostOut)
+def get_post_for_summary(post_id: int, db: Session = Depends(get_db)):
     p = db.query(models.Post).filter(models.Post.id == post_id).first()
     if not p:
         raise HTTPException(status_code=404, detail="not_found")
+    return _post_out(p, db)
 
-    store_name = p.author.store_name if p.author else None
-    market = p.author.market if p.author else None
-    stall_no = p.author.stall_no if p.author else None
-    stats = _stats(db, post_id)
+def _summary_status(job: Optional[models.Job], p: models.Post, cached: bool = False) -> dict:
+    status = "done" if cached else (job.status if job else ("done" if p.ai_summary else "none"))
+    return {
+        "ok": status != "failed",
+        "job_id": None if cached or not job else job.id,
+        "status": status,                       # "queued" | "running" | "done" | "failed" | "none"
+        "cached": cached,
+        "text": p.ai_summary if status == "done" else None,
+        "ai_summary": p.ai_summary,
+    }
 
-    _log_kv("요약생성 시작", post_id=post_id, store_name=store_name, market=market, stall_no=stall_no, reviews_total=stats.total)
+def _latest_summary_job(db: Session, post_id: int) -> Optional[models.Job]:
+    return (
+        db.query(models.Job)
+        .filter(models.Job.post_id == post_id, models.Job.kind == "summary")
+        .order_by(models.Job.id.desc())
+        .first()
+    )
 
-    prompt = _build_shop_prompt(store_name, market, stall_no, stats)
-    text: Optional[str] = None
-    try:
-        with _snowflake_conn() as conn:
-            text = _snowflake_cortex_complete(conn, prompt)
-    except Exception as e:
-        logger.error("Snowflake 호출 실패: %s", e)
-        logger.error("TRACE:\n%s", traceback.format_exc())
-        if not p.ai_summary:
-            lines = [f"{store_name or '이 가게'}은(는) 지역 시장에서 사랑받는 곳입니다."]
-            if stats.total:
-                if stats.kindness.get("pos", 0) >= stats.kindness.get("neg", 0):
-                    lines.append("친절한 응대로 손님을 맞이합니다.")
-                if stats.price.get("cheap", 0) >= stats.price.get("exp", 0):
-                    lines.append("가격대도 합리적이에요.")
-                if stats.variety.get("div", 0) >= stats.variety.get("low", 0):
-                    lines.append("메뉴/상품 구성이 다양해 선택의 폭이 넓어요.")
-            text = " ".join(lines)
-            _log_kv("폴백 소개문 사용", length=len(text))
-
-    if text is None:
-        raise HTTPException(status_code=502, detail="summary_generation_failed")
+@app.post("/posts/{post_id}/summary", response_model=dict, status_code=202)
+def gen_summary(
+    post_id: int,
+    response: Response,
+    force: bool = Query(False, description="입력이 바뀌지 않았어도 다시 생성"),
+    db: Session = Depends(get_db),
+):
+    """
+    소개문 생성을 워커 작업으로 적재하고 바로 반환합니다.
+    진행 상황은 GET /posts/{post_id}/summary/status 로 확인합니다.
+    가게 정보/리뷰 통계가 마지막 생성 때와 같으면 캐시된 소개문을 200 으로 즉시 돌려줍니다.
+    """
+    p = db.query(models.Post).filter(models.Post.id == post_id).first()
+    if not p:
+        raise HTTPException(status_code=404, detail="not_found")
 
-    try:
-        p.ai_summary = text
-        db.commit()
-        _log_kv("소개문 저장 완료", post_id=post_id, length=len(text))
-    except Exception as e:
-        logger.error("소개문 저장 실패: %s", e)
-        logger.error("TRACE:\n%s", traceback.format_exc())
+    if not force and summary_is_fresh(db, p):
+        _log_kv("요약 캐시 적중", post_id=post_id)
+        response.status_code = 200
+        return _summary_status(None, p, cached=True)
+
+    # 이미 진행 중인 생성 작업이 있으면 그대로 돌려줌 (중복 클릭 방지)
+    job = _latest_summary_job(db, post_id)
+    if job is None or job.status not in ("queued", "running"):
+        job = enqueue_job(db, post_id, kind="summary", force=force)
+        _log_kv("요약생성 적재", post_id=post_id, job_id=job.id, force=force)
+    return _summary_status(job, p)
 
-    return {"ok": True, "text": text, "ai_summary": text}
+@app.get("/posts/{post_id}/summary/status", response_model=dict)
+def get_summary_status(post_id: int, db: Session = Depends(get_db)):
+    p = db.query(models.Post).filter(models.Post.id == post_id).first()
+    if not p:
+        raise HTTPException(status_code=404, detail="not_found")
+    return _summary_status(_latest_summary_job(db, post_id), p)
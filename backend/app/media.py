@@ -0,0 +1,232 @@
+# backend/app/media.py
+# /media 정적 파일 제공: 버전 붙은 영구 캐시 URL, ETag/304, 미리 압축해 둔 .gz/.br, Range(206)
+# 기존 파일 미리 압축: python -m app.media
+from __future__ import annotations
+import argparse
+import gzip
+import hashlib
+import mimetypes
+import os
+import re
+from pathlib import Path
+from typing import Iterator, Optional
+
+from fastapi import HTTPException, Request, Response
+from fastapi.responses import StreamingResponse
+
+from .config import settings
+
+media_root = Path(settings.media_dir)
+
+IMMUTABLE_CACHE = "public, max-age=31536000, immutable"
+REVALIDATE_CACHE = "no-cache"          # 캐시는 하되 매번 ETag 로 확인 (304)
+
+# 미리 압축해 둘 텍스트 계열 (.ply 는 ascii 일 때만)
+_COMPRESSIBLE = {".json", ".txt", ".ply"}
+_MIN_COMPRESS_SIZE = 1024
+_CHUNK = 256 * 1024
+_RANGE_RE = re.compile(r"^bytes=(\d*)-(\d*)$")
+
+try:
+    import brotli  # 선택 의존성: 없으면 .br 은 만들지 않음
+except Exception:
+    brotli = None
+
+mimetypes.add_type("text/plain", ".log")
+
+
+_POST_MEDIA_FIELDS = ("video", "ply", "traj", "points")
+_VERSION_LEN = 12
+
+
+def file_version(path: Path) -> str:
+    """ETag 용 버전 토큰. 파일이 다시 쓰이면 바뀌며 stat 한 번으로 계산합니다."""
+    st = path.stat()
+    return hashlib.sha1(f"{st.st_mtime_ns}:{st.st_size}".encode()).hexdigest()[:_VERSION_LEN]
+
+
+def content_version(rel: Optional[str]) -> Optional[str]:
+    """media 파일 내용 해시(sha256 앞 12자리). 파일이 없으면 None."""
+    if not rel:
+        return None
+    digest = hashlib.sha256()
+    try:
+        with open(media_root / rel, "rb") as f:
+            while True:
+                chunk = f.read(1024 * 1024)
+                if not chunk:
+                    break
+                digest.update(chunk)
+    except OSError:
+        return None
+    return digest.hexdigest()[:_VERSION_LEN]
+
+
+def stamp_post_versions(post) -> None:
+    """
+    게시글 media 파일(과 상품 썸네일)의 내용 해시를 *_version 컬럼에 기록합니다. 커밋은 호출자가 합니다.
+    결과 파일이 확정되는 시점(작업 완료, 업로드 완료)에 한 번만 호출하므로 렌더링 때는 파일을 보지 않습니다.
+    """
+    for field in _POST_MEDIA_FIELDS:
+        rel = getattr(post, f"{field}_path")
+        if field == "video" and rel and post.video_sha256:
+            version = post.video_sha256[:_VERSION_LEN]  # 업로드 때 이미 계산한 해시
+        else:
+            version = content_version(rel)
+        setattr(post, f"{field}_version", version)
+    for pr in post.products:
+        pr.image_version = content_version(pr.image_path)
+
+
+def media_url(rel: Optional[str], version: Optional[str] = None) -> Optional[str]:
+    """
+    /media URL 에 DB 에 기록해 둔 내용 해시(?v=)를 붙입니다. 버전이 붙은 요청은 immutable 로 캐시되어
+    다시 볼 때 요청 자체가 생기지 않고, 파일이 바뀌면 해시와 함께 URL 이 바뀝니다.
+    버전이 없으면(기록 전 게시글) ETag 재검증 URL.
+    """
+    if not rel:
+        return None
+    if version:
+        return f"/media/{rel}?v={version}"
+    return f"/media/{rel}"
+
+
+def _is_ascii_ply(path: Path) -> bool:
+    with open(path, "rb") as f:
+        head = f.read(512)
+    return b"format ascii" in head
+
+
+def _should_compress(path: Path) -> bool:
+    if path.suffix.lower() not in _COMPRESSIBLE or path.stat().st_size < _MIN_COMPRESS_SIZE:
+        return False
+    return path.suffix.lower() != ".ply" or _is_ascii_ply(path)
+
+
+def precompress(path: Path) -> list[Path]:
+    """텍스트 계열 파일 옆에 .gz(/.br) 를 만듭니다. 원본보다 오래된 사본만 다시 만듭니다."""
+    if not path.is_file() or not _should_compress(path):
+        return []
+    made = []
+    mtime = path.stat().st_mtime
+    data = None
+    variants = [(".gz", lambda b: gzip.compress(b, compresslevel=9, mtime=0))]
+    if brotli is not None:
+        variants.append((".br", lambda b: brotli.compress(b, quality=11)))
+    for ext, compress in variants:
+        sib = path.with_name(path.name + ext)
+        if sib.exists() and sib.stat().st_mtime >= mtime:
+            continue
+        if data is None:
+            data = path.read_bytes()
+        tmp = sib.with_name(sib.name + ".tmp")
+        tmp.write_bytes(compress(data))
+        os.replace(tmp, sib)
+        made.append(sib)
+    return made
+
+
+def precompress_dir(folder: Path) -> int:
+    n = 0
+    for p in folder.iterdir():
+        if p.is_file():
+            n += len(precompress(p))
+    return n
+
+
+def _resolve(rel_path: str) -> Path:
+    path = (media_root / rel_path).resolve()
+    if not path.is_relative_to(media_root.resolve()) or not path.is_file():
+        raise HTTPException(status_code=404, detail="not_found")
+    return path
+
+
+def _pick_encoding(request: Request, path: Path) -> tuple[Path, Optional[str]]:
+    """Accept-Encoding 에 맞는 최신 압축 사본이 있으면 그 경로와 인코딩을 돌려줍니다."""
+    accept = request.headers.get("accept-encoding", "")
+    mtime = path.stat().st_mtime
+    for token, ext in (("br", ".br"), ("gzip", ".gz")):
+        if token in accept:
+            sib = path.with_name(path.name + ext)
+            if sib.exists() and sib.stat().st_mtime >= mtime:
+                return sib, token
+    return path, None
+
+
+def _iter_file(path: Path, start: int, length: int) -> Iterator[bytes]:
+    with open(path, "rb") as f:
+        f.seek(start)
+        while length > 0:
+            chunk = f.read(min(_CHUNK, length))
+            if not chunk:
+                break
+            length -= len(chunk)
+            yield chunk
+
+
+def serve(request: Request, rel_path: str, immutable: bool = False) -> Response:
+    """
+    media_root 아래 파일 하나를 제공합니다.
+    - ETag(stat 기반 버전 토큰) + If-None-Match -> 304
+    - ?v=(내용 해시) 가 붙었거나 immutable 이면 Cache-Control: immutable, 아니면 no-cache(재검증)
+      (파일이 바뀌면 media_url 의 ?v= 도 바뀌므로 예전 URL 은 다시 참조되지 않음)
+    - 압축 사본(.br/.gz)이 있으면 Accept-Encoding 에 맞춰 그대로 전송
+    - Range: bytes=a-b 단일 구간은 206 으로 필요한 부분만 읽어 전송 (영상 탐색용)
+    """
+    path = _resolve(rel_path)
+    version = file_version(path)
+    body_path, encoding = _pick_encoding(request, path)
+    etag = f'"{version}-{encoding}"' if encoding else f'"{version}"'
+
+    headers = {
+        "ETag": etag,
+        "Accept-Ranges": "bytes",
+        "Vary": "Accept-Encoding",
+        "Cache-Control": IMMUTABLE_CACHE if immutable or request.query_params.get("v") else REVALIDATE_CACHE,
+    }
+    if encoding:
+        headers["Content-Encoding"] = encoding
+
+    inm = request.headers.get("if-none-match")
+    if inm and etag in [t.strip() for t in inm.split(",")]:
+        return Response(status_code=304, headers=headers)
+
+    media_type = mimetypes.guess_type(path.name)[0] or "application/octet-stream"
+    size = body_path.stat().st_size
+    start, length, status = 0, size, 200
+
+    rng = request.headers.get("range")
+    if_range = request.headers.get("if-range")
+    if rng and (not if_range or if_range == etag):
+        m = _RANGE_RE.match(rng.strip())
+        if m and (m.group(1) or m.group(2)):
+            if m.group(1):
+                start = int(m.group(1))
+                end = min(int(m.group(2)), size - 1) if m.group(2) else size - 1
+            else:  # bytes=-N (마지막 N 바이트)
+                start = max(size - int(m.group(2)), 0)
+                end = size - 1
+            if start >= size or end < start:
+                return Response(status_code=416, headers={**headers, "Content-Range": f"bytes */{size}"})
+            length = end - start + 1
+            status = 206
+            headers["Content-Range"] = f"bytes {start}-{end}/{size}"
+
+    headers["Content-Length"] = str(length)
+    if request.method == "HEAD":
+        return Response(status_code=status, headers=headers, media_type=media_type)
+    return StreamingResponse(_iter_file(body_path, start, length), status_code=status,
+                             headers=headers, media_type=media_type)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Precompress text media files (.gz/.br siblings)")
+    parser.parse_args(argv)
+    n = 0
+    for folder in [media_root, *(p for p in media_root.rglob("*") if p.is_dir())]:
+        n += precompress_dir(folder)
+    print(f"압축 사본 생성 완료: {n}개 (brotli {'사용' if brotli is not None else '미설치'})")
+
+
+if __name__ == "__main__":
+    main()
@@ -1,4 +1,4 @@
-from sqlalchemy import Column, Integer, String, DateTime, ForeignKey, Boolean, UniqueConstraint, Text
+from sqlalchemy import Column, Integer, String, DateTime, ForeignKey, Boolean, UniqueConstraint, Text, Index, Float
 from sqlalchemy.orm import relationship
 from datetime import datetime
 
@@ -14,7 +14,7 @@ class User(Base):
     role = Column(String, nullable=False, default="BUYER")
 
     store_name = Column(String, nullable=True)
-    market = Column(String, nullable=True)
+    market = Column(String, nullable=True, index=True)
     stall_no = Column(String, nullable=True)
 
     created_at = Column(DateTime, default=datetime.utcnow)
@@ -34,6 +34,14 @@ class Post(Base):
     ply_path = Column(String, nullable=True)
     traj_path = Column(String, nullable=True)
     points_path = Column(String, nullable=True)
+    lod_path = Column(String, nullable=True)     # LOD manifest (e.g. "abcd/abcd_optimized_lod-1a2b3c/manifest.json")
+    anchors_path = Column(String, nullable=True) # 뷰어용 상품 앵커 바이너리 (e.g. "abcd/abcd_anchors-1a2b3c.bin")
+    video_sha256 = Column(String, nullable=True, index=True)  # 업로드 영상 내용 해시 (중복 업로드 결과 재사용)
+    # 위 파일들의 내용 해시 (/media URL 의 ?v=, 파일이 확정될 때 media.stamp_post_versions 로 한 번 기록)
+    video_version = Column(String, nullable=True)
+    ply_version = Column(String, nullable=True)
+    traj_version = Column(String, nullable=True)
+    points_version = Column(String, nullable=True)
 
     # 처리 상태/로그
     status = Column(String, nullable=True, default=None)     # "processing" | "done" | "error" | None
@@ -41,9 +49,17 @@ class Post(Base):
 
     # AI 요약(소개문) 캐시
     ai_summary = Column(Text, nullable=True)
+    ai_summary_fp = Column(String, nullable=True)            # 생성 당시 프롬프트 입력 지문 (같으면 재생성 생략)
 
     author = relationship("User", back_populates="posts")
     reviews = relationship("Review", back_populates="post", cascade="all, delete-orphan")
+    products = relationship("Product", back_populates="post", order_by="Product.idx",
+                            cascade="all, delete-orphan")
+
+    __table_args__ = (
+        # 피드 keyset 페이지네이션(id DESC) + 작성자/시장 필터용
+        Index("ix_posts_author_id_id", "author_id", "id"),
+    )
 
 
 class Review(Base):
@@ -64,3 +80,103 @@ class Review(Base):
     __table_args__ = (
         UniqueConstraint("post_id", "user_id", name="uq_review_post_user"),
     )
+
+
+class Product(Base):
+    """영상 분석으로 찾은 상품 (작업 완료 시 products JSON 에서 한 번 적재)"""
+    __tablename__ = "products"
+    id = Column(Integer, primary_key=True, index=True)
+    post_id = Column(Integer, ForeignKey("posts.id"), nullable=False, index=True)
+    idx = Column(Integer, nullable=False)                    # JSON 내 순서 = img/{idx}.png
+
+    name = Column(String, nullable=True)
+    price = Column(String, nullable=True)
+    time_min = Column(Integer, nullable=False, default=0)
+    time_sec = Column(Integer, nullable=False, default=0)
+    time_ms = Column(Integer, nullable=False, default=0)
+    x = Column(Float, nullable=True)
+    y = Column(Float, nullable=True)
+    z = Column(Float, nullable=True)
+
+    image_path = Column(String, nullable=True)               # 추출 시점에 저장된 썸네일만 기록
+    image_version = Column(String, nullable=True)            # 썸네일 내용 해시 (/media URL 의 ?v=)
+
+    post = relationship("Post", back_populates="products")
+
+    __table_args__ = (
+        UniqueConstraint("post_id", "idx", name="uq_product_post_idx"),
+    )
+
+
+class PostReviewStats(Base):
+    """게시글별 리뷰 집계 (upsert_review 에서 증분 갱신, app.review_stats 로 재구성)"""
+    __tablename__ = "post_review_stats"
+    post_id = Column(Integer, ForeignKey("posts.id"), primary_key=True)
+    total = Column(Integer, nullable=False, default=0)
+
+    kindness_pos = Column(Integer, nullable=False, default=0)
+    kindness_neu = Column(Integer, nullable=False, default=0)
+    kindness_neg = Column(Integer, nullable=False, default=0)
+    price_pos = Column(Integer, nullable=False, default=0)
+    price_neu = Column(Integer, nullable=False, default=0)
+    price_neg = Column(Integer, nullable=False, default=0)
+    variety_pos = Column(Integer, nullable=False, default=0)
+    variety_neu = Column(Integer, nullable=False, default=0)
+    variety_neg = Column(Integer, nullable=False, default=0)
+
+    updated_at = Column(DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
+
+
+class Job(Base):
+    """영상 처리 작업 큐 (API는 적재만 하고, app.worker 프로세스가 lease를 잡고 실행)"""
+    __tablename__ = "jobs"
+    id = Column(Integer, primary_key=True, index=True)
+    post_id = Column(Integer, ForeignKey("posts.id"), nullable=False, index=True)
+    kind = Column(String, nullable=False, default="video")
+    payload = Column(Text, nullable=True)                    # JSON (작업 인자)
+
+    status = Column(String, nullable=False, default="queued", index=True)  # "queued" | "running" | "done" | "failed"
+    attempts = Column(Integer, nullable=False, default=0)
+    max_attempts = Column(Integer, nullable=False, default=3)
+
+    worker_id = Column(String, nullable=True)                # e.g. "hostname:pid:slot"
+    lease_until = Column(DateTime, nullable=True)            # 이 시각까지 heartbeat가 없으면 고아 작업
+    last_error = Column(Text, nullable=True)
+
+    created_at = Column(DateTime, default=datetime.utcnow)
+    updated_at = Column(DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
+
+
+class Upload(Base):
+    """이어받기 가능한 영상 업로드 세션 (청크를 최종 경로에 바로 기록, 모두 도착하면 게시글 생성)"""
+    __tablename__ = "uploads"
+    id = Column(Integer, primary_key=True, index=True)
+    user_id = Column(Integer, ForeignKey("users.id"), nullable=False, index=True)
+
+    filename = Column(String, nullable=False)                # 원본 파일명
+    video_path = Column(String, nullable=False)              # 최종 경로 (e.g. "abcd/abcd.mp4")
+    size = Column(Integer, nullable=False)                   # 전체 바이트 수
+    chunk_size = Column(Integer, nullable=False)
+    total_chunks = Column(Integer, nullable=False)
+    sha256 = Column(String, nullable=True)                   # 클라이언트가 알려준 전체 해시 (선택, 완료 시 대조)
+
+    status = Column(String, nullable=False, default="uploading")  # "uploading" | "finalizing" | "complete"
+    post_id = Column(Integer, ForeignKey("posts.id"), nullable=True)
+
+    created_at = Column(DateTime, default=datetime.utcnow)
+    updated_at = Column(DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
+
+    chunks = relationship("UploadChunk", cascade="all, delete-orphan")
+
+
+class UploadChunk(Base):
+    """업로드 세션에서 검증을 통과해 기록된 청크 (재개 시 이미 받은 청크는 건너뜀)"""
+    __tablename__ = "upload_chunks"
+    id = Column(Integer, primary_key=True, index=True)
+    upload_id = Column(Integer, ForeignKey("uploads.id"), nullable=False, index=True)
+    idx = Column(Integer, nullable=False)
+    sha256 = Column(String, nullable=False)
+
+    __table_args__ = (
+        UniqueConstraint("upload_id", "idx", name="uq_upload_chunk_idx"),
+    )
@@ -0,0 +1,288 @@
+# backend/app/pipeline.py
+# 업로드된 영상 한 건을 3D 맵/상품 정보로 변환하는 작업 본문 (API 프로세스와 워커가 공유)
+from pathlib import Path
+from datetime import datetime
+import threading
+import traceback
+from concurrent.futures import ThreadPoolExecutor
+from typing import Callable, Optional
+
+from .config import settings
+from .database import SessionLocal
+from . import models
+from .products import load_products_json, replace_post_products, write_anchors
+from .pointcloud import build_post_lod
+from .media import precompress_dir, stamp_post_versions
+from .transcode import make_analysis_proxy
+
+media_root = Path(settings.media_dir)
+
+# 결과 기록 직전에 같은 트랜잭션에서 작업 lease 를 확인하는 함수 (worker 가 jobs.hold_lease 로 만들어 넘김)
+LeaseFence = Callable[[object], bool]
+
+
+class LeaseLost(Exception):
+    """처리 도중 작업 lease 를 잃음 (다른 워커가 회수). 결과를 기록하지 않고 중단합니다."""
+
+
+def _commit(db, fence: Optional[LeaseFence] = None):
+    """fence 가 있으면 lease 를 확인하는 UPDATE 와 함께 커밋합니다. lease 를 잃었으면 롤백하고 LeaseLost."""
+    if fence is not None and not fence(db):
+        db.rollback()
+        raise LeaseLost()
+    db.commit()
+
+def _append_log(log_file: Path, msg: str):
+    log_file.parent.mkdir(parents=True, exist_ok=True)
+    with open(log_file, "a", encoding="utf-8") as f:
+        f.write(f"{datetime.utcnow().isoformat()}Z | {msg}\n")
+
+def _classify_txt_name(name: str) -> str:
+    n = name.lower()
+    if any(k in n for k in ("traj", "trajectory", "tum")):
+        return "traj"
+    if any(k in n for k in ("point", "coord", "xyz")):
+        return "points"
+    return "traj"
+
+def find_done_duplicate(db, video_sha256: str | None, exclude_post_id: int | None = None):
+    """같은 내용(sha256)의 영상으로 처리가 끝난 게시글이 있으면 반환합니다."""
+    if not video_sha256:
+        return None
+    q = db.query(models.Post).filter(
+        models.Post.video_sha256 == video_sha256,
+        models.Post.status == "done",
+    )
+    if exclude_post_id is not None:
+        q = q.filter(models.Post.id != exclude_post_id)
+    return q.order_by(models.Post.id.asc()).first()
+
+def clone_results(db, src: models.Post, dst: models.Post, log_file: Path):
+    """
+    동일 영상으로 이미 만들어진 결과(3D 복원, 상품 분석, 썸네일)를 새 게시글에 연결합니다.
+    결과 파일은 복사하지 않고 원본 게시글의 경로를 그대로 참조합니다. 커밋은 호출자가 합니다.
+    """
+    dup_video = media_root / dst.video_path if dst.video_path else None
+    dst.video_path = src.video_path
+    dst.ply_path = src.ply_path
+    dst.traj_path = src.traj_path
+    dst.points_path = src.points_path
+    dst.video_version = src.video_version
+    dst.ply_version = src.ply_version
+    dst.traj_version = src.traj_version
+    dst.points_version = src.points_version
+    dst.lod_path = src.lod_path
+    dst.anchors_path = src.anchors_path
+    dst.products = [
+        models.Product(
+            idx=pr.idx, name=pr.name, price=pr.price,
+            time_min=pr.time_min, time_sec=pr.time_sec, time_ms=pr.time_ms,
+            x=pr.x, y=pr.y, z=pr.z, image_path=pr.image_path, image_version=pr.image_version,
+        )
+        for pr in src.products
+    ]
+    dst.status = "done"
+    # 내용이 같은 영상이므로 새로 올라온 사본은 지움 (로그 폴더는 유지)
+    if dup_video is not None and dup_video.exists() and dup_video.resolve() != (media_root / src.video_path).resolve():
+        dup_video.unlink()
+    _append_log(log_file, f"중복 영상: post_id={src.id} 의 결과를 재사용합니다. (sha256={src.video_sha256})")
+
+def _run_analysis_stages(pv, video_path: str, log_file: Path, cancel: Optional[threading.Event] = None):
+    """
+    분석 단계를 작은 DAG 로 실행합니다.
+
+        transcode_proxy ─┬─ get_3d_model ─────────────────────────┐
+                         └─ detect_products ─┬─ save_product_frames ┤
+                                             └──────────────────────┴─ save_products_json (좌표 결합)
+
+    먼저 분석용 프록시(저해상도/저fps)를 만들어 3D 복원과 Gemini 상품 감지에 보냅니다. 둘은 서로 독립이라 동시에 돌리고,
+    썸네일 추출은 상품 목록이 나오는 즉시 시작합니다(기본은 원본 화질에서 추출).
+    좌표 결합만 두 결과를 모두 기다립니다. 저장된 썸네일 {상품 인덱스: 경로} 를 반환합니다.
+    cancel 이 set 되면(lease 상실) 다음 단계를 시작하지 않고 LeaseLost 를 냅니다.
+    """
+    def stage(name, fn, *args, **kwargs):
+        if cancel is not None and cancel.is_set():
+            raise LeaseLost()
+        _append_log(log_file, f"[{name}] 시작")
+        result = fn(*args, **kwargs)
+        _append_log(log_file, f"[{name}] 완료")
+        return result
+
+    proxy = stage("transcode_proxy", make_analysis_proxy, video_path)
+    analysis_path = str(proxy) if proxy else video_path
+    _append_log(log_file, f"분석 입력: {Path(analysis_path).name}")
+    thumb_path = video_path if settings.thumbnails_from_original else analysis_path
+
+    with ThreadPoolExecutor(max_workers=3, thread_name_prefix="pipeline") as ex:
+        recon_f = ex.submit(stage, "get_3d_model", pv.get_3d_model, video_path, upload_path=analysis_path)
+        products_f = ex.submit(stage, "detect_products", pv.detect_products_in_video, video_path,
+                               upload_path=analysis_path)
+
+        def frames():
+            products = products_f.result()
+            if products:
+                return stage("save_product_frames", pv.save_product_frames, thumb_path, products)
+            return {}
+        frames_f = ex.submit(frames)
+
+        recon_f.result()
+        products = products_f.result()
+        if products:
+            stage("save_products_json", pv.save_products_json, video_path, products)
+        else:
+            _append_log(log_file, "상품 감지 결과 없음")
+        return frames_f.result() or {}
+
+def process_video_job(
+    post_id: int,
+    video_rel: str,
+    log_rel: str,
+    cancel: Optional[threading.Event] = None,
+    fence: Optional[LeaseFence] = None,
+):
+    """
+    영상 한 건을 처리하고 결과를 게시글에 기록합니다. 예외는 삼키고 post.status 로 결과를 남깁니다.
+    워커에서 호출할 때는 cancel(lease 상실 시 set)과 fence 를 넘겨, lease 를 잃은 뒤에는
+    다음 단계를 시작하지 않고 게시글(상태, 결과 경로, 상품)도 고치지 않습니다.
+    """
+    log_file = media_root / log_rel
+    _append_log(log_file, f"Job start post_id={post_id} video={video_rel}")
+    db = SessionLocal()
+    try:
+        from . import process_video as pv
+    except Exception as e:
+        _append_log(log_file, f"process_video import 실패: {e}")
+        db_post = db.query(models.Post).get(post_id)
+        if db_post:
+            db_post.status = "error"
+            try:
+                _commit(db, fence)
+            except LeaseLost:
+                pass
+        db.close()
+        return
+
+    try:
+        db_post = db.query(models.Post).get(post_id)
+        if not db_post:
+            _append_log(log_file, "Post not found")
+            return
+
+        # 처리 대기 중에 같은 영상이 먼저 끝났다면 결과만 연결하고 종료
+        src = find_done_duplicate(db, db_post.video_sha256, exclude_post_id=db_post.id)
+        if src is not None:
+            clone_results(db, src, db_post, log_file)
+            _commit(db, fence)
+            _append_log(log_file, "Job done")
+            return
+
+        db_post.status = "processing"
+        _commit(db, fence)
+
+        video_abs = media_root / video_rel
+        work_dir = video_abs.parent
+
+        saved_images = _run_analysis_stages(pv, str(video_abs), log_file, cancel)
+        _append_log(log_file, "3D 변환 완료, 결과 스캔")
+
+        ply_file = None
+        txt_files = []
+        json_files = []
+        for pth in work_dir.iterdir():
+            if pth.is_file():
+                if pth.suffix.lower() == ".ply" and not ply_file:
+                    ply_file = pth
+                if pth.suffix.lower() == ".txt":
+                    txt_files.append(pth)
+                if pth.suffix.lower() == ".json":
+                    json_files.append(pth)
+
+        if not ply_file and not txt_files and not json_files:
+            _append_log(log_file, "결과 파일(.ply/.txt/.json) 미발견")
+            db_post.status = "error"
+            _commit(db, fence)
+            return
+
+        if ply_file:
+            rel = f"{work_dir.name}/{ply_file.name}"
+            db_post.ply_path = rel
+            _append_log(log_file, f"PLY 기록: /media/{rel}")
+            try:
+                build_post_lod(db_post, media_root)
+                _append_log(log_file, f"LOD 생성: {db_post.lod_path}")
+            except Exception as e:
+                # LOD 가 없으면 뷰어가 PLY 전체를 받아서 표시
+                _append_log(log_file, f"LOD 생성 실패(PLY 전체로 표시): {e}")
+
+        used_traj = False
+        used_points = False
+        for t in txt_files:
+            kind = _classify_txt_name(t.name)
+            rel = f"{work_dir.name}/{t.name}"
+            if kind == "traj" and not used_traj:
+                db_post.traj_path = rel
+                used_traj = True
+                _append_log(log_file, f"TRAJ 기록: /media/{rel}")
+            elif kind == "points" and not used_points:
+                db_post.points_path = rel
+                used_points = True
+                _append_log(log_file, f"POINTS 기록(txt): /media/{rel}")
+            else:
+                _append_log(log_file, f"EXTRA TXT: /media/{rel}")
+
+        # 좌표 포함된 제품 JSON을 points 소스로도 사용
+        stem = work_dir.name
+        target_json = None
+        for j in json_files:
+            if j.name.lower() == f"{stem}.json":
+                target_json = j
+                break
+        if target_json is None and json_files:
+            target_json = json_files[0]
+
+        for j in json_files:
+            _append_log(log_file, f"PRODUCTS JSON 발견: /media/{work_dir.name}/{j.name}")
+
+        if target_json is not None:
+            rel = f"{work_dir.name}/{target_json.name}"
+            db_post.points_path = rel  # JSON 우선 사용 (PLYViewer가 x,y,z 추출)
+            _append_log(log_file, f"COORDS(JSON) 기록: /media/{rel}")
+
+            # 상품 목록을 DB 에 적재 (렌더링 시 파일 시스템 접근 없음)
+            items = load_products_json(target_json)
+            if items is not None:
+                image_rels = {
+                    idx: Path(path).resolve().relative_to(media_root.resolve()).as_posix()
+                    for idx, path in saved_images.items()
+                }
+                replace_post_products(db, db_post, items, image_rels)
+                _append_log(log_file, f"PRODUCTS 적재: {len(items)}개 (이미지 {len(image_rels)}개)")
+                if write_anchors(db_post, media_root):
+                    _append_log(log_file, f"ANCHORS 기록: {db_post.anchors_path}")
+
+        # 텍스트 결과물(.json/.txt/ascii .ply)의 .gz/.br 사본 (media 서빙 시 그대로 전송)
+        try:
+            precompress_dir(work_dir)
+        except Exception as e:
+            _append_log(log_file, f"압축 사본 생성 실패(무시): {e}")
+
+        # /media URL 버전(내용 해시)을 여기서 한 번 계산해 두고 렌더링 때는 DB 값만 사용
+        stamp_post_versions(db_post)
+        db_post.status = "done"
+        _commit(db, fence)
+        _append_log(log_file, "Job done")
+    except LeaseLost:
+        # 작업을 회수한 워커가 결과를 기록하므로 여기서는 아무것도 남기지 않음
+        _append_log(log_file, f"lease 상실로 중단 post_id={post_id}")
+    except Exception as e:
+        _append_log(log_file, f"오류: {e}")
+        _append_log(log_file, f"TRACE:\n{traceback.format_exc()}")
+        try:
+            db_post = db.query(models.Post).get(post_id)
+            if db_post:
+                db_post.status = "error"
+                _commit(db, fence)
+        except:
+            pass
+    finally:
+        db.close()
@@ -0,0 +1,383 @@
+# backend/app/pointcloud.py
+# 포인트 클라우드(PLY) 읽기/쓰기와 뷰어용 LOD(octree) 타일 생성, 양자화 압축 포맷(qpc)
+# LOD 누락분 생성: python -m app.pointcloud [--post-id N] [--rebuild]
+# 크기/오차 비교: python -m app.pointcloud --benchmark some.ply
+from __future__ import annotations
+import argparse
+import hashlib
+import json
+import os
+import shutil
+import struct
+import time
+import uuid
+import zlib
+from pathlib import Path
+from typing import Optional
+
+import numpy as np
+from sqlalchemy.orm import Session
+
+from .config import settings
+from . import models
+
+LOD_MANIFEST = "manifest.json"
+
+# qpc (quantized point cloud), little-endian
+#   header : b"QPC1", u32 count, u8 flags(1 = 색상 있음), u8 bits, u16 reserved,
+#            f32 min[3], f32 scale[3]                                  (36 bytes)
+#   blocks : [u32 길이 + zlib(deflate) 데이터] 를 position, (color) 순서로
+#     position: 좌표당 uint16 (x = min + q * scale), 축별로 하위 바이트 면 -> 상위 바이트 면 (x, y, z)
+#     color   : uint8 r 면, g 면, b 면
+#   포인트는 Morton 순서로 정렬되어 있어 인접한 값이 비슷하므로 deflate 가 잘 먹습니다.
+QPC_MAGIC = b"QPC1"
+_QPC_HEADER = struct.Struct("<4sIBBH3f3f")
+
+_PLY_TYPES = {
+    "char": "i1", "int8": "i1", "uchar": "u1", "uint8": "u1",
+    "short": "i2", "int16": "i2", "ushort": "u2", "uint16": "u2",
+    "int": "i4", "int32": "i4", "uint": "u4", "uint32": "u4",
+    "float": "f4", "float32": "f4", "double": "f8", "float64": "f8",
+}
+
+
+def read_ply(path: Path) -> tuple[np.ndarray, Optional[np.ndarray]]:
+    """
+    PLY 의 vertex 좌표(float32, N x 3)와 색상(uint8, N x 3 또는 None)을 읽습니다.
+    binary 는 memmap 으로, ascii 는 텍스트로 읽습니다. (vertex 가 첫 element 인 포인트 클라우드)
+    """
+    with open(path, "rb") as f:
+        if f.readline().strip() != b"ply":
+            raise ValueError(f"PLY 파일이 아닙니다: {path}")
+        fmt, count, fields, element = None, None, [], None
+        while True:
+            line = f.readline()
+            if not line:
+                raise ValueError("PLY 헤더가 끝나지 않았습니다.")
+            tokens = line.decode("ascii", errors="replace").split()
+            if not tokens or tokens[0] in ("comment", "obj_info"):
+                continue
+            if tokens[0] == "end_header":
+                break
+            if tokens[0] == "format":
+                fmt = tokens[1]
+            elif tokens[0] == "element":
+                element = tokens[1]
+                if element == "vertex":
+                    count = int(tokens[2])
+            elif tokens[0] == "property" and element == "vertex":
+                if tokens[1] == "list":
+                    raise ValueError("vertex 의 list 속성은 지원하지 않습니다.")
+                fields.append((tokens[2], _PLY_TYPES[tokens[1]]))
+        offset = f.tell()
+    if count is None:
+        raise ValueError("vertex element 가 없습니다.")
+
+    names = [n for n, _ in fields]
+    if fmt == "ascii":
+        table = np.loadtxt(path, skiprows=_ascii_header_lines(path), max_rows=count, ndmin=2)
+        cols = {n: table[:, i] for i, n in enumerate(names)}
+    elif fmt in ("binary_little_endian", "binary_big_endian"):
+        endian = "<" if fmt == "binary_little_endian" else ">"
+        dtype = np.dtype([(n, endian + c) for n, c in fields])
+        cols = np.memmap(path, dtype=dtype, mode="r", offset=offset, shape=(count,))
+    else:
+        raise ValueError(f"지원하지 않는 PLY 형식: {fmt}")
+
+    xyz = np.stack([cols["x"], cols["y"], cols["z"]], axis=1).astype(np.float32)
+    rgb = None
+    for r, g, b in (("red", "green", "blue"), ("r", "g", "b"), ("diffuse_red", "diffuse_green", "diffuse_blue")):
+        if r in names and g in names and b in names:
+            c = np.stack([cols[r], cols[g], cols[b]], axis=1)
+            if np.issubdtype(c.dtype, np.floating) and c.size and c.max() <= 1.0:
+                c = c * 255.0
+            rgb = np.clip(np.rint(c), 0, 255).astype(np.uint8)
+            break
+    return xyz, rgb
+
+
+def _ascii_header_lines(path: Path) -> int:
+    with open(path, "rb") as f:
+        for i, line in enumerate(f, 1):
+            if line.strip() == b"end_header":
+                return i
+    return 0
+
+
+def write_ply(path: Path, xyz: np.ndarray, rgb: Optional[np.ndarray] = None) -> None:
+    """float32 xyz (+ uint8 rgb) 를 binary_little_endian PLY 로 저장합니다."""
+    fields = [("x", "<f4"), ("y", "<f4"), ("z", "<f4")]
+    if rgb is not None:
+        fields += [("red", "u1"), ("green", "u1"), ("blue", "u1")]
+    data = np.empty(len(xyz), dtype=fields)
+    data["x"], data["y"], data["z"] = xyz[:, 0], xyz[:, 1], xyz[:, 2]
+    if rgb is not None:
+        data["red"], data["green"], data["blue"] = rgb[:, 0], rgb[:, 1], rgb[:, 2]
+    header = ["ply", "format binary_little_endian 1.0", f"element vertex {len(data)}",
+              "property float x", "property float y", "property float z"]
+    if rgb is not None:
+        header += ["property uchar red", "property uchar green", "property uchar blue"]
+    header.append("end_header")
+    with open(path, "wb") as f:
+        f.write(("\n".join(header) + "\n").encode("ascii"))
+        data.tofile(f)
+
+
+def _morton_order(q: np.ndarray, bits: int) -> np.ndarray:
+    # 상위 10비트씩만 써서 30비트 Morton 코드로 정렬
+    top = (q >> max(bits - 10, 0)).astype(np.uint64)
+
+    def spread(v):
+        v = (v | (v << 16)) & 0x030000FF
+        v = (v | (v << 8)) & 0x0300F00F
+        v = (v | (v << 4)) & 0x030C30C3
+        v = (v | (v << 2)) & 0x09249249
+        return v
+
+    code = (spread(top[:, 0]) << 2) | (spread(top[:, 1]) << 1) | spread(top[:, 2])
+    return np.argsort(code, kind="stable")
+
+
+def encode_qpc(xyz: np.ndarray, rgb: Optional[np.ndarray] = None, bits: int = 16, level: int = 6) -> bytes:
+    """좌표를 bbox 기준 bits 비트 정수로 양자화하고 속성 블록별로 deflate 압축합니다."""
+    if not 1 <= bits <= 16:
+        raise ValueError("bits 는 1~16 이어야 합니다.")
+    n = len(xyz)
+    xyz = np.asarray(xyz, dtype=np.float64)
+    lo = xyz.min(axis=0) if n else np.zeros(3)
+    extent = (xyz.max(axis=0) - lo) if n else np.zeros(3)
+    maxq = (1 << bits) - 1
+    scale = np.where(extent > 0, extent / maxq, 1.0)
+    q = np.clip(np.rint((xyz - lo) / scale), 0, maxq).astype("<u2")
+
+    order = _morton_order(q, bits)
+    q = q[order]
+    # (n, 3) uint16 -> 축별 [하위 바이트 n개, 상위 바이트 n개]
+    planes = q.T.copy().view(np.uint8).reshape(3, n, 2).transpose(0, 2, 1)
+    blocks = [zlib.compress(planes.tobytes(), level)]
+    flags = 0
+    if rgb is not None:
+        flags |= 1
+        blocks.append(zlib.compress(np.asarray(rgb, dtype=np.uint8)[order].T.tobytes(), level))
+
+    out = [_QPC_HEADER.pack(QPC_MAGIC, n, flags, bits, 0, *lo.astype(np.float32), *scale.astype(np.float32))]
+    for b in blocks:
+        out.append(struct.pack("<I", len(b)))
+        out.append(b)
+    return b"".join(out)
+
+
+def decode_qpc(data: bytes) -> tuple[np.ndarray, Optional[np.ndarray]]:
+    """encode_qpc 의 역변환 (뷰어 디코더와 같은 규칙). 포인트 순서는 Morton 순서입니다."""
+    magic, n, flags, _bits, _, *rest = _QPC_HEADER.unpack_from(data, 0)
+    if magic != QPC_MAGIC:
+        raise ValueError("qpc 파일이 아닙니다.")
+    lo = np.array(rest[:3], dtype=np.float32)
+    scale = np.array(rest[3:], dtype=np.float32)
+    pos = _QPC_HEADER.size
+
+    def block():
+        nonlocal pos
+        (length,) = struct.unpack_from("<I", data, pos)
+        raw = zlib.decompress(data[pos + 4:pos + 4 + length])
+        pos += 4 + length
+        return np.frombuffer(raw, dtype=np.uint8)
+
+    planes = block().reshape(3, 2, n).astype(np.uint16)
+    q = (planes[:, 0] | (planes[:, 1] << 8)).T
+    xyz = lo + q.astype(np.float32) * scale
+    rgb = block().reshape(3, n).T.copy() if flags & 1 else None
+    return xyz.astype(np.float32), rgb
+
+
+def file_sha256(path: Path) -> str:
+    h = hashlib.sha256()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(1024 * 1024), b""):
+            h.update(chunk)
+    return h.hexdigest()
+
+
+def build_lod(ply_path: Path, node_points: Optional[int] = None, max_depth: Optional[int] = None,
+              fmt: Optional[str] = None) -> Path:
+    """
+    PLY 에서 뷰어용 LOD octree 를 만들고 manifest 경로를 반환합니다.
+
+    포인트를 한 번 무작위로 섞은 뒤, 각 노드는 자기 영역에 남은 포인트 중 앞에서 node_points 개를 갖고
+    나머지는 8개 자식 영역으로 내려보냅니다. 그래서 루트만으로도 전체를 고르게 덮는 성긴 미리보기가 되고,
+    자식 노드를 받을수록 밀도가 올라갑니다.
+
+    노드 파일 형식(fmt)은 "qpc"(양자화 + deflate, 기본) 또는 "ply" 입니다.
+
+    결과는 '{stem}_lod-{원본 해시·설정 해시 12자리}/' 폴더에 저장되므로 URL 이 내용에 따라 바뀌고,
+    같은 원본·설정이면 다시 만들지 않습니다.
+    """
+    node_points = node_points or settings.lod_node_points
+    max_depth = max_depth if max_depth is not None else settings.lod_max_depth
+    fmt = fmt or settings.lod_format
+    bits = settings.lod_position_bits
+    if fmt not in ("qpc", "ply"):
+        raise ValueError(f"지원하지 않는 LOD 형식: {fmt}")
+
+    key = f"{file_sha256(ply_path)}:{fmt}:{bits}:{node_points}:{max_depth}"
+    out_dir = ply_path.parent / f"{ply_path.stem}_lod-{hashlib.sha256(key.encode()).hexdigest()[:12]}"
+    manifest_path = out_dir / LOD_MANIFEST
+    if manifest_path.exists():
+        return manifest_path
+
+    xyz, rgb = read_ply(ply_path)
+    n = len(xyz)
+    if n == 0:
+        raise ValueError("포인트가 없습니다.")
+    perm = np.random.default_rng(0).permutation(n)
+    xyz = np.ascontiguousarray(xyz[perm])
+    rgb = np.ascontiguousarray(rgb[perm]) if rgb is not None else None
+
+    lo = xyz.min(axis=0).astype(np.float64)
+    size = float(max((xyz.max(axis=0) - lo).max(), 1e-6))
+
+    tmp_dir = out_dir.with_name(f"{out_dir.name}.{uuid.uuid4().hex}.tmp")
+    tmp_dir.mkdir(parents=True)
+    nodes = []
+    try:
+        # (노드 id, 이 영역의 포인트 인덱스(오름차순 = 섞인 순서), 영역 최소 좌표, 한 변 길이, 깊이)
+        stack = [("r", np.arange(n), lo, size, 0)]
+        while stack:
+            node_id, idx, nlo, nsize, depth = stack.pop()
+            take = idx if depth >= max_depth else idx[:node_points]
+            rest = idx[len(take):]
+            node_file = f"{node_id}.{fmt}"
+            node_rgb = rgb[take] if rgb is not None else None
+            if fmt == "qpc":
+                (tmp_dir / node_file).write_bytes(encode_qpc(xyz[take], node_rgb, bits=bits))
+            else:
+                write_ply(tmp_dir / node_file, xyz[take], node_rgb)
+
+            children = []
+            if len(rest):
+                half = nsize / 2
+                octant = np.clip(np.floor((xyz[rest] - nlo) / half), 0, 1).astype(np.int64)
+                code = octant[:, 0] * 4 + octant[:, 1] * 2 + octant[:, 2]
+                order = np.argsort(code, kind="stable")
+                rest, code = rest[order], code[order]
+                for c in np.unique(code):
+                    sel = rest[code == c]
+                    child_lo = nlo + half * np.array([(c >> 2) & 1, (c >> 1) & 1, c & 1])
+                    child_id = f"{node_id}{c}"
+                    children.append(child_id)
+                    stack.append((child_id, sel, child_lo, half, depth + 1))
+
+            nodes.append({
+                "id": node_id,
+                "file": node_file,
+                "points": int(len(take)),
+                "depth": depth,
+                "min": [float(v) for v in nlo],
+                "size": nsize,
+                "children": children,
+            })
+
+        nodes.sort(key=lambda nd: (nd["depth"], nd["id"]))
+        manifest = {
+            "version": 1,
+            "format": fmt,
+            "points": int(n),
+            "has_color": rgb is not None,
+            "min": [float(v) for v in lo],
+            "size": size,
+            "root": "r",
+            "nodes": nodes,
+        }
+        (tmp_dir / LOD_MANIFEST).write_text(json.dumps(manifest, separators=(",", ":")), encoding="utf-8")
+        os.replace(tmp_dir, out_dir)
+    except Exception:
+        shutil.rmtree(tmp_dir, ignore_errors=True)
+        raise
+    return manifest_path
+
+
+def build_post_lod(post: models.Post, media_root: Path) -> Optional[str]:
+    """게시글 PLY 의 LOD 를 만들고 post.lod_path(미디어 기준 상대 경로)를 채웁니다. 커밋은 호출자가 합니다."""
+    if not post.ply_path:
+        return None
+    manifest = build_lod(media_root / post.ply_path)
+    post.lod_path = manifest.resolve().relative_to(media_root.resolve()).as_posix()
+    return post.lod_path
+
+
+def benchmark(ply_path: Path, bits_list=(10, 12, 14, 16), level: int = 6) -> list[dict]:
+    """qpc 양자화 비트 수별 크기/오차/시간을 원본 PLY(float32 xyz + uint8 rgb)와 비교합니다."""
+    xyz, rgb = read_ply(ply_path)
+    raw = len(xyz) * (12 + (3 if rgb is not None else 0))
+    diag = float(np.linalg.norm(xyz.max(axis=0) - xyz.min(axis=0))) or 1.0
+    rows = []
+    for bits in bits_list:
+        t0 = time.perf_counter()
+        data = encode_qpc(xyz, rgb, bits=bits, level=level)
+        t1 = time.perf_counter()
+        dec, _ = decode_qpc(data)
+        t2 = time.perf_counter()
+        # 디코딩 결과는 Morton 순서이므로 같은 순서로 원본을 맞춰 비교
+        n = len(xyz)
+        lo = xyz.min(axis=0).astype(np.float64)
+        extent = xyz.max(axis=0) - lo
+        scale = np.where(extent > 0, extent / ((1 << bits) - 1), 1.0)
+        q = np.clip(np.rint((xyz - lo) / scale), 0, (1 << bits) - 1).astype("<u2")
+        err = np.linalg.norm(dec - xyz[_morton_order(q, bits)], axis=1) if n else np.zeros(1)
+        rows.append({
+            "bits": bits,
+            "bytes": len(data),
+            "ratio": raw / max(len(data), 1),
+            "max_err": float(err.max()),
+            "rms_err": float(np.sqrt((err ** 2).mean())),
+            "max_err_rel": float(err.max()) / diag,
+            "encode_ms": (t1 - t0) * 1000,
+            "decode_ms": (t2 - t1) * 1000,
+        })
+    return rows
+
+
+def main(argv=None):
+    from .database import Base, engine, SessionLocal, add_missing_columns
+
+    parser = argparse.ArgumentParser(description="Build LOD tiles for post point clouds")
+    parser.add_argument("--post-id", type=int, default=None, help="특정 게시글만")
+    parser.add_argument("--rebuild", action="store_true", help="이미 LOD 가 있어도 다시 연결")
+    parser.add_argument("--benchmark", default=None, metavar="PLY", help="qpc 크기/오차 비교만 출력")
+    args = parser.parse_args(argv)
+
+    if args.benchmark:
+        path = Path(args.benchmark)
+        print(f"원본 PLY: {path.stat().st_size / 1024 / 1024:.2f} MB")
+        print(f"{'bits':>4} {'size(MB)':>9} {'ratio':>6} {'max_err':>10} {'rms_err':>10} {'max/diag':>9} {'enc ms':>7} {'dec ms':>7}")
+        for r in benchmark(path):
+            print(f"{r['bits']:>4} {r['bytes'] / 1024 / 1024:>9.2f} {r['ratio']:>6.2f} {r['max_err']:>10.2e} "
+                  f"{r['rms_err']:>10.2e} {r['max_err_rel']:>9.1e} {r['encode_ms']:>7.0f} {r['decode_ms']:>7.0f}")
+        return
+
+    Base.metadata.create_all(bind=engine)
+    add_missing_columns(models.Post.__table__)
+    media_root = Path(settings.media_dir)
+    db: Session = SessionLocal()
+    try:
+        q = db.query(models.Post).filter(models.Post.ply_path.isnot(None))
+        if args.post_id is not None:
+            q = q.filter(models.Post.id == args.post_id)
+        if not args.rebuild:
+            q = q.filter(models.Post.lod_path.is_(None))
+        n = 0
+        for post in q.all():
+            try:
+                build_post_lod(post, media_root)
+                db.commit()
+                n += 1
+            except Exception as e:
+                db.rollback()
+                print(f"LOD 생성 실패 post_id={post.id}: {e}")
+        print(f"LOD 생성 완료: {n}개 게시글")
+    finally:
+        db.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -6,6 +6,7 @@ import pydantic
 from typing import List, Optional
 import requests
 import time
+import random
 import numpy as np
 import zipfile
 import cv2  # OpenCV 라이브러리 import 추가
@@ -32,86 +33,131 @@ class ProductInfo(pydantic.BaseModel):
     time_ms: int = pydantic.Field(description="해당 상품이 동영상에서 구체적으로 나타난 시간(밀리초)")
 
 
+def _load_trajectory(txt_path: str) -> Optional[np.ndarray]:
+    """
+    TUM 형식(time x y z qx qy qz qw) 궤적 파일을 시간순으로 정렬된 (N, 8) 배열로 읽습니다.
+    쿼터니언이 없는 줄은 NaN으로 채웁니다. 유효한 줄이 없으면 None을 반환합니다.
+    """
+    rows = []
+    with open(txt_path, "r", encoding="utf-8") as f:
+        for line in f:
+            parts = line.strip().split()
+            if len(parts) < 4 or parts[0].startswith("#"):
+                continue
+            try:
+                vals = [float(p) for p in parts[:8]]
+            except ValueError:
+                # 숫자로 변환할 수 없는 줄은 건너뜁니다.
+                continue
+            rows.append(vals + [np.nan] * (8 - len(vals)))
+    if not rows:
+        return None
+    traj = np.asarray(rows, dtype=np.float64)
+    return traj[np.argsort(traj[:, 0], kind="stable")]
+
+
+def _slerp(q0: np.ndarray, q1: np.ndarray, w: np.ndarray) -> np.ndarray:
+    """(M, 4) 쿼터니언 쌍을 가중치 w(M,)로 구면 선형 보간합니다."""
+    dot = np.sum(q0 * q1, axis=1)
+    # 최단 경로로 보간하도록 부호를 맞춥니다.
+    q1 = np.where(dot[:, None] < 0, -q1, q1)
+    dot = np.clip(np.abs(dot), -1.0, 1.0)
+    theta = np.arccos(dot)
+    sin_theta = np.sin(theta)
+    near = sin_theta < 1e-6
+    safe = np.where(near, 1.0, sin_theta)
+    a = np.where(near, 1.0 - w, np.sin((1.0 - w) * theta) / safe)
+    b = np.where(near, w, np.sin(w * theta) / safe)
+    out = a[:, None] * q0 + b[:, None] * q1
+    return out / np.linalg.norm(out, axis=1, keepdims=True)
+
+
+def _lookup_poses(traj: np.ndarray, query_times: np.ndarray, interpolation: str = "linear") -> np.ndarray:
+    """
+    정렬된 궤적에서 searchsorted로 각 질의 시간을 감싸는 두 포즈를 찾아 (M, 8) 포즈를 반환합니다.
+
+    Args:
+        traj (np.ndarray): _load_trajectory()가 반환한 (N, 8) 배열.
+        query_times (np.ndarray): 질의 시간(초) 배열.
+        interpolation (str): "nearest"(가장 가까운 포즈), "linear"(위치 선형 보간),
+                             "slerp"(위치 선형 보간 + 회전 구면 선형 보간).
+    """
+    t = traj[:, 0]
+    q = np.asarray(query_times, dtype=np.float64)
+    if len(traj) == 1:
+        return np.repeat(traj, len(q), axis=0)
+
+    hi = np.clip(np.searchsorted(t, q), 1, len(t) - 1)
+    lo = hi - 1
+    span = t[hi] - t[lo]
+    # 궤적 범위 밖은 외삽하지 않고 양 끝 포즈에 고정합니다.
+    w = np.clip(np.divide(q - t[lo], span, out=np.zeros_like(q), where=span > 0), 0.0, 1.0)
+
+    if interpolation == "nearest":
+        return traj[np.where(w < 0.5, lo, hi)]
+
+    out = (1.0 - w)[:, None] * traj[lo] + w[:, None] * traj[hi]
+    out[:, 0] = q
+    if interpolation == "slerp":
+        q0, q1 = traj[lo, 4:8], traj[hi, 4:8]
+        valid = np.all(np.isfinite(q0), axis=1) & np.all(np.isfinite(q1), axis=1)
+        if np.any(valid):
+            out[valid, 4:8] = _slerp(q0[valid], q1[valid], w[valid])
+    return out
+
+
 def _add_coordinates_from_txt(
     product_list: List[ProductInfo], 
-    video_path: str
-) -> List[ProductInfo]:
+    video_path: str,
+    interpolation: str = "linear"
+) -> Optional[np.ndarray]:
     """
-    상품 정보 리스트에 해당하는 txt 파일에서 좌표 정보를 찾아 추가합니다.
+    상품 정보 리스트에 해당하는 txt 파일에서 좌표 정보를 찾아 (상품 수, 8) 포즈 배열로 반환합니다.
+    각 행은 [시간, x, y, z, qx, qy, qz, qw] 이며, 좌표 파일이 없거나 읽을 수 없으면 None을 반환합니다.
     """
     txt_path = os.path.splitext(video_path)[0] + ".txt"
     
     if not os.path.exists(txt_path):
         print(f"경고: 좌표 파일 '{txt_path}'을(를) 찾을 수 없습니다. 좌표 없이 진행합니다.")
-        return product_list
+        return None
 
     try:
-        with open(txt_path, "r", encoding="utf-8") as f:
-            lines = f.readlines()
-
-        # txt 파일 데이터를 파싱하여 [시간, x, y, z] 형태의 리스트로 저장
-        coord_data = []
-        for line in lines:
-            parts = line.strip().split()
-            if len(parts) >= 4:
-                try:
-                    # 시간, x, y, z 값만 float으로 변환하여 저장
-                    coord_data.append([float(p) for p in parts[:4]])
-                except (ValueError, IndexError):
-                    # 숫자로 변환할 수 없는 줄은 건너뜁니다.
-                    continue
-        
-        if not coord_data:
+        traj = _load_trajectory(txt_path)
+        if traj is None:
             print(f"경고: '{txt_path}' 파일에서 유효한 좌표 데이터를 읽지 못했습니다.")
-            return product_list
-
+            return None
     except Exception as e:
         print(f"좌표 파일을 읽는 중 오류 발생: {e}")
-        return product_list
+        return None
 
-    # 각 상품 정보에 대해 가장 가까운 시간의 좌표를 찾습니다.
-    a = []
-    for product in product_list:
-        # ProductInfo의 시간 정보를 전체 초(float)로 변환
-        product_time_sec = product.time_min * 60 + product.time_sec + product.time_ms / 1000.0
-        
-        min_diff = float('inf')
-        closest_coords = None
-
-        # 모든 좌표 데이터와 시간 차이를 비교하여 가장 가까운 행을 찾습니다.
-        for row in coord_data:
-            time_diff = abs(row[0] - product_time_sec)
-            if time_diff < min_diff:
-                min_diff = time_diff
-                closest_coords = row
-
-        # 가장 가까운 좌표를 찾았으면 ProductInfo 객체에 값을 할당합니다.
-        if closest_coords:
-            a.append(closest_coords)
-            
-    return a
+    # ProductInfo의 시간 정보를 전체 초(float)로 변환
+    product_times = np.array(
+        [p.time_min * 60 + p.time_sec + p.time_ms / 1000.0 for p in product_list],
+        dtype=np.float64,
+    )
+    return _lookup_poses(traj, product_times, interpolation)
 
-def analyze_products_in_video(video_path: str) -> Optional[list[ProductInfo]]:
+def _products_json_path(video_path: str) -> str:
+    # 동영상이 있는 디렉토리에 동영상과 같은 이름의 .json 파일 경로를 만듭니다.
+    file_name_without_ext = os.path.splitext(os.path.basename(video_path))[0]
+    return os.path.join(os.path.dirname(video_path), f"{file_name_without_ext}.json")
+
+
+def detect_products_in_video(video_path: str, upload_path: Optional[str] = None) -> Optional[list[ProductInfo]]:
     """
-    동영상을 분석하여 프롬프트에 따른 상품 정보를 structured_output 형식으로 추출합니다.
-    이미 분석 결과(json)가 존재하면 API를 호출하지 않고 캐시된 결과를 반환합니다.
+    동영상을 Gemini로 분석하여 상품 정보(이름/가격/등장 시간)만 추출합니다. 3D 복원 결과가 필요 없으므로
+    get_3d_model 과 동시에 실행할 수 있습니다. 이미 분석 결과(json)가 존재하면 API를 호출하지 않습니다.
 
     Args:
         video_path (str): 분석할 로컬 동영상 파일의 경로.
+        upload_path (str): 실제로 업로드할 파일 (분석용 프록시). 없으면 video_path 를 업로드합니다.
 
     Returns:
-        Optional[list[ProductInfo]]: 추출된 상품 정보 리스트가 담긴 Pydantic 모델 객체.
-                                         오류 발생 시 None을 반환합니다.
+        Optional[list[ProductInfo]]: 추출된 상품 정보 리스트. 오류 발생 시 None을 반환합니다.
     """
-    # 1. JSON 파일 경로 생성 및 캐시 확인
+    # 1. JSON 캐시 확인
+    json_file_path = _products_json_path(video_path)
     try:
-        # 동영상 파일명에서 확장자를 제외한 부분을 가져옵니다.
-        base_name = os.path.basename(video_path)
-        file_name_without_ext = os.path.splitext(base_name)[0]
-        
-        # 동영상이 있는 디렉토리에 .json 확장자로 된 파일 경로를 만듭니다.
-        json_file_path = os.path.join(os.path.dirname(video_path), f"{file_name_without_ext}.json")
-
         if os.path.exists(json_file_path):
             print(f"'{json_file_path}'에서 캐시된 결과를 로드합니다.")
             with open(json_file_path, "r", encoding="utf-8") as f:
@@ -126,8 +172,9 @@ def analyze_products_in_video(video_path: str) -> Optional[list[ProductInfo]]:
 
     # --- 캐시가 없는 경우, 아래의 Gemini API 호출 로직 실행 ---
     try:
-        print(f"'{video_path}' 파일을 업로드하는 중...")
-        video_file = client.files.upload(file=video_path)
+        upload_path = upload_path or video_path
+        print(f"'{upload_path}' 파일을 업로드하는 중...")
+        video_file = client.files.upload(file=upload_path)
 
         while video_file.state.name == "PROCESSING":
             print("파일 처리 중...")
@@ -154,39 +201,7 @@ def analyze_products_in_video(video_path: str) -> Optional[list[ProductInfo]]:
         )
         
         # Pydantic 모델 리스트를 가져옵니다.
-        product_info_list = response.parsed
-
-        if product_info_list:
-            # --- 기능 추가 ---
-            # API 응답 결과에 좌표 정보를 추가합니다.
-            xyz_info_list = _add_coordinates_from_txt(product_info_list, video_path)
-
-            # Pydantic 모델을 JSON으로 저장하기 위해 dict 리스트로 변환
-            data_to_save = [info.model_dump() for info in product_info_list]
-
-            for i in range(len(product_info_list)):
-                data_to_save[i]['x'] = xyz_info_list[i][1]
-                data_to_save[i]['y'] = xyz_info_list[i][2]
-                data_to_save[i]['z'] = xyz_info_list[i][3]
-
-            with open(json_file_path, "w", encoding="utf-8") as f:
-                json.dump(data_to_save, f, ensure_ascii=False, indent=4)
-        
-        # # 1. 반환된 결과를 JSON 파일로 저장
-        # if product_info_list:
-        #     # Pydantic 모델을 JSON으로 저장하기 위해 dict 리스트로 변환
-        #     # 모델 인스턴스에서는 .model_dump()를 사용하고, 일반 dict에서는 그대로 사용
-        #     if isinstance(product_info_list[0], dict):
-        #          data_to_save = product_info_list
-        #     else: # Pydantic 모델인 경우
-        #          data_to_save = [info.model_dump() for info in product_info_list]
-
-
-        #     with open(json_file_path, "w", encoding="utf-8") as f:
-        #         json.dump(data_to_save, f, ensure_ascii=False, indent=4)
-        #     print(f"분석 결과를 '{json_file_path}'에 저장했습니다.")
-        
-        return product_info_list
+        return response.parsed
 
     except FileNotFoundError:
         print(f"오류: '{video_path}' 파일을 찾을 수 없습니다. 파일 경로를 확인해주세요.")
@@ -196,21 +211,68 @@ def analyze_products_in_video(video_path: str) -> Optional[list[ProductInfo]]:
         return None
 
 
-def get_3d_model(video_path: str, server_url: str = "http://localhost:7141"):
+def save_products_json(video_path: str, product_info_list: List[ProductInfo]) -> Optional[str]:
+    """
+    상품 정보에 3D 복원 궤적(.txt)의 좌표를 붙여 동영상 옆 .json 으로 저장합니다.
+    get_3d_model 이 끝난 뒤 호출해야 좌표가 채워집니다. 저장한 경로를 반환합니다.
+    """
+    if not product_info_list:
+        return None
+
+    # API 응답 결과에 좌표 정보를 추가합니다.
+    xyz_info_list = _add_coordinates_from_txt(product_info_list, video_path)
+
+    # Pydantic 모델을 JSON으로 저장하기 위해 dict 리스트로 변환
+    data_to_save = [info.model_dump() for info in product_info_list]
+
+    if xyz_info_list is not None:
+        for i in range(len(product_info_list)):
+            data_to_save[i]['x'] = float(xyz_info_list[i][1])
+            data_to_save[i]['y'] = float(xyz_info_list[i][2])
+            data_to_save[i]['z'] = float(xyz_info_list[i][3])
+
+    json_file_path = _products_json_path(video_path)
+    with open(json_file_path, "w", encoding="utf-8") as f:
+        json.dump(data_to_save, f, ensure_ascii=False, indent=4)
+    print(f"분석 결과를 '{json_file_path}'에 저장했습니다.")
+    return json_file_path
+
+
+def analyze_products_in_video(video_path: str) -> Optional[list[ProductInfo]]:
+    """
+    동영상을 분석하여 상품 정보를 추출하고, 좌표를 붙여 json 으로 저장합니다.
+    (detect_products_in_video + save_products_json, 3D 복원이 끝난 뒤 호출)
+
+    Args:
+        video_path (str): 분석할 로컬 동영상 파일의 경로.
+
+    Returns:
+        Optional[list[ProductInfo]]: 추출된 상품 정보 리스트가 담긴 Pydantic 모델 객체.
+                                         오류 발생 시 None을 반환합니다.
+    """
+    product_info_list = detect_products_in_video(video_path)
+    if product_info_list:
+        save_products_json(video_path, product_info_list)
+    return product_info_list
+
+
+def get_3d_model(video_path: str, server_url: str = "http://localhost:7141", upload_path: Optional[str] = None):
     """
     서버에 동영상 파일을 업로드하고, 결과 파일을 폴링하여 다운로드합니다.
+    upload_path(분석용 프록시)를 주면 그 파일을 보내고, 결과물 이름/위치는 video_path 기준으로 정합니다.
     """
+    upload_path = upload_path or video_path
     # --- 1. 파일 유효성 검사 ---
-    if not os.path.exists(video_path):
-        print(f"❌ 오류: 파일이 존재하지 않습니다. '{video_path}'")
+    if not os.path.exists(upload_path):
+        print(f"❌ 오류: 파일이 존재하지 않습니다. '{upload_path}'")
         return
     
     # --- 2. /generate: 동영상 파일 업로드 ---
     generate_url = f"{server_url}/generate"
-    print(f"🚀 동영상 파일 업로드 중: '{os.path.basename(video_path)}'...")
+    print(f"🚀 동영상 파일 업로드 중: '{os.path.basename(upload_path)}'...")
 
     try:
-        with open(video_path, 'rb') as f:
+        with open(upload_path, 'rb') as f:
             files = {'file': (os.path.basename(video_path), f, 'video/mp4')}
             response = requests.post(generate_url, files=files, timeout=30)
             
@@ -230,59 +292,162 @@ def get_3d_model(video_path: str, server_url: str = "http://localhost:7141"):
         print(f"❌ 서버 연결 오류: {e}")
         return
 
-    # --- 3. /search: 10초 단위로 상태 폴링 및 결과 다운로드 ---
-    search_url = f"{server_url}/search"
-    print("\n🔄 10초마다 결과 생성 여부를 확인합니다...")
+    # --- 3. /wait 롱폴링으로 완료를 기다린 뒤 /search 에서 결과 다운로드 ---
+    if _wait_for_job(server_url, job_id):
+        stem = os.path.splitext(os.path.basename(video_path))[0]
+        _download_result(server_url, job_id, os.path.dirname(video_path), stem)
 
+
+def _backoff_delays(base: float = 1.0, cap: float = 30.0):
+    """지수 백오프 + full jitter 대기 시간(초)을 무한히 생성합니다."""
+    attempt = 0
     while True:
-        try:
-            params = {'id': job_id}
-            response = requests.get(search_url, params=params, timeout=30)
-            response.raise_for_status()
+        yield random.uniform(0, min(cap, base * (2 ** attempt)))
+        attempt += 1
+
 
-            # 응답이 파일(zip)인지 JSON(상태)인지 헤더로 확인
-            if 'application/zip' in response.headers.get('Content-Type', ''):
-                # --- 4-1. 파일 다운로드 및 압축 해제 ---
-                print("\n🎉 변환 완료! 결과 파일을 다운로드합니다...")
-                
-                # 결과 저장 디렉토리 생성
-                output_dir = os.path.dirname(video_path)
-
-                zip_filename = os.path.join(output_dir, f"download.zip")
-                with open(zip_filename, 'wb') as f:
-                    f.write(response.content)
-                
-                print(f"✅ '{zip_filename}' 저장 완료.")
-
-                # 압축 해제
-                with zipfile.ZipFile(zip_filename, 'r') as zip_ref:
-                    zip_ref.extractall(output_dir)
-                print(f"✅ '{output_dir}' 디렉토리에 파일 압축 해제 완료.")
-                
-                # 원본 zip 파일 삭제 (선택 사항)
-                os.remove(zip_filename)
-                
-                break # 루프 종료
+def _wait_for_job(server_url: str, job_id: str, long_poll_sec: int = 30) -> bool:
+    """
+    작업 완료를 기다립니다. 완료되면 True, 실패하거나 작업이 없으면 False.
+    서버의 /wait 롱폴링을 우선 사용하고, 지원하지 않는 서버(404)나 통신 오류 시에는
+    지수 백오프 + jitter 로 /search 를 폴링합니다.
+    """
+    wait_url = f"{server_url}/wait"
+    search_url = f"{server_url}/search"
+    use_long_poll = True
+    delays = _backoff_delays()
+    print("\n🔄 결과 생성 완료를 기다립니다...")
 
+    while True:
+        try:
+            if use_long_poll:
+                response = requests.get(
+                    wait_url,
+                    params={'id': job_id, 'timeout': long_poll_sec},
+                    timeout=long_poll_sec + 10,
+                )
+                if response.status_code == 404:
+                    print("ℹ️ 서버가 /wait 를 지원하지 않아 백오프 폴링으로 전환합니다.")
+                    use_long_poll = False
+                    continue
+                response.raise_for_status()
+                status = response.json().get('status')
+            else:
+                # 구버전 서버는 완료 시 zip 본문을 보내므로 stream=True 로 헤더만 확인하고 본문은 받지 않음
+                with requests.get(search_url, params={'id': job_id, 'format': 'json'}, timeout=30, stream=True) as response:
+                    response.raise_for_status()
+                    if 'application/zip' in response.headers.get('Content-Type', ''):
+                        status = 1
+                    else:
+                        status = response.json().get('status')
+
+            if status == 1:
+                return True
+            if status == 0:
+                if use_long_poll:
+                    # 롱폴링은 서버가 대기해 주므로 즉시 다시 요청
+                    delays = _backoff_delays()
+                    continue
+                delay = next(delays)
+                print(f"⏳ 처리 중... {delay:.1f}초 후 다시 확인합니다.")
+                time.sleep(delay)
+            elif status == -1:
+                print("❌ 서버에서 오류가 발생했거나 작업을 찾을 수 없습니다.")
+                return False
             else:
-                # --- 4-2. 상태 확인 ---
-                status_data = response.json()
-                status = status_data.get('status')
-
-                if status == 0:
-                    print("⏳ 처리 중... 10초 후 다시 확인합니다.")
-                    time.sleep(10)
-                elif status == -1:
-                    print("❌ 서버에서 오류가 발생했거나 작업을 찾을 수 없습니다.")
-                    break # 루프 종료
-                else:
-                    print(f"❓ 알 수 없는 상태 코드: {status}")
-                    break
+                print(f"❓ 알 수 없는 상태 코드: {status}")
+                return False
 
         except requests.exceptions.RequestException as e:
+            delay = next(delays)
             print(f"❌ 서버 통신 오류: {e}")
-            print("10초 후 재시도합니다.")
-            time.sleep(10)
+            print(f"{delay:.1f}초 후 재시도합니다.")
+            time.sleep(delay)
+
+
+def _stream_to_file(url: str, dest_path: str, chunk_size: int = 1024 * 1024, max_retries: int = 3):
+    """
+    url 의 내용을 iter_content 로 dest_path 에 스트리밍 저장합니다(메모리 사용량 일정).
+    전송이 끊기면 받은 만큼부터 Range + If-Range(ETag) 로 이어받고, 완료 후 원자적으로 교체합니다.
+    """
+    part_path = dest_path + ".part"
+    if os.path.exists(part_path):
+        os.remove(part_path)  # 검증자(ETag)가 없는 이전 조각은 신뢰하지 않음
+
+    etag = None
+    delays = _backoff_delays()
+    for attempt in range(max_retries + 1):
+        offset = os.path.getsize(part_path) if os.path.exists(part_path) else 0
+        headers = {}
+        if offset and etag:
+            headers = {'Range': f"bytes={offset}-", 'If-Range': etag}
+        try:
+            with requests.get(url, headers=headers, stream=True, timeout=(10, 60)) as response:
+                response.raise_for_status()
+                etag = response.headers.get('ETag') or etag
+                # 206 이면 이어쓰기, 200 이면(서버가 Range 무시 / 파일 변경) 처음부터
+                mode = 'ab' if response.status_code == 206 else 'wb'
+                with open(part_path, mode) as f:
+                    for chunk in response.iter_content(chunk_size=chunk_size):
+                        if chunk:
+                            f.write(chunk)
+            os.replace(part_path, dest_path)
+            return
+        except requests.exceptions.RequestException as e:
+            if attempt == max_retries:
+                raise
+            delay = next(delays)
+            print(f"⚠️ 다운로드 중단({e}), {delay:.1f}초 후 이어받기를 시도합니다.")
+            time.sleep(delay)
+
+
+# 결과물 종류 -> 동영상 옆에 저장할 파일명 (서버의 job_id 는 영상 내용 해시라 파일명과 다름)
+_ARTIFACT_NAMES = {
+    'traj': '{stem}.txt',
+    'ply': '{stem}_optimized.ply',
+}
+
+
+def _download_result(server_url: str, job_id: str, output_dir: str, stem: Optional[str] = None):
+    """
+    완료된 작업의 결과물(.txt 궤적, _optimized.ply)을 output_dir 에 저장합니다.
+    /artifacts 를 지원하는 서버면 파일별로 스트리밍하고, 아니면 결과 zip 을 스트리밍 후 압축 해제합니다.
+    stem 을 주면 결과물을 '{stem}.txt', '{stem}_optimized.ply' 로 저장합니다.
+    """
+    with requests.get(
+        f"{server_url}/search", params={'id': job_id, 'format': 'json'}, stream=True, timeout=30
+    ) as response:
+        response.raise_for_status()
+        is_zip = 'application/zip' in response.headers.get('Content-Type', '')
+        data = None if is_zip else response.json()
+
+    print("\n🎉 변환 완료! 결과 파일을 다운로드합니다...")
+    if data and isinstance(data.get('artifacts'), dict):
+        for kind, art in data['artifacts'].items():
+            name = os.path.basename(art['filename'])
+            if stem and kind in _ARTIFACT_NAMES:
+                name = _ARTIFACT_NAMES[kind].format(stem=stem)
+            dest = os.path.join(output_dir, name)
+            _stream_to_file(f"{server_url}{art['url']}", dest)
+            print(f"✅ [{kind}] '{dest}' 저장 완료.")
+        return
+
+    if not is_zip:
+        print(f"❌ 결과 파일 대신 상태 응답을 받았습니다: {data}")
+        return
+
+    # 구버전 서버: zip 을 디스크로 스트리밍한 뒤 압축 해제
+    zip_filename = os.path.join(output_dir, f"download.zip")
+    _stream_to_file(f"{server_url}/search?id={requests.utils.quote(job_id)}", zip_filename)
+    print(f"✅ '{zip_filename}' 저장 완료.")
+
+    # 압축 해제
+    with zipfile.ZipFile(zip_filename, 'r') as zip_ref:
+        zip_ref.extractall(output_dir)
+    print(f"✅ '{output_dir}' 디렉토리에 파일 압축 해제 완료.")
+    
+    # 원본 zip 파일 삭제 (선택 사항)
+    os.remove(zip_filename)
 
 # 선명도 점수를 계산하는 헬퍼 함수
 def calculate_focus_score(frame: np.ndarray) -> float:
@@ -297,26 +462,117 @@ def calculate_focus_score(frame: np.ndarray) -> float:
     # 라플라시안 변환 후 분산을 계산하여 반환합니다.
     return cv2.Laplacian(gray, cv2.CV_64F).var()
 
+def _product_target_ms(product_info) -> tuple[int, str]:
+    """상품 정보(dict 또는 ProductInfo)에서 목표 시간(ms)과 이름을 꺼냅니다."""
+    if isinstance(product_info, dict):
+        target_timestamp_sec = product_info.get('time_min', 0) * 60 + product_info.get('time_sec', 0) + product_info.get('time_ms', 0) / 1000
+        product_name = product_info.get('name', 'unknown')
+    else:
+        target_timestamp_sec = product_info.time_min * 60 + product_info.time_sec + product_info.time_ms / 1000
+        product_name = product_info.name
+    return int(target_timestamp_sec * 1000), product_name
+
+
+def _scan_frames_seek(cap, targets, search_range_ms: int, step_ms: int) -> dict:
+    """
+    (기존 방식) 각 상품마다 목표 시간 주변을 step_ms 간격으로 seek 하며 가장 선명한 프레임을 찾습니다.
+    seek 마다 키프레임부터 다시 디코딩하므로 상품 수가 많으면 느립니다.
+
+    Returns:
+        dict: {상품 인덱스: (프레임, 선택된 시간(ms), 선명도)}
+    """
+    best = {}
+    for i, target_ms in targets:
+        start_ms = max(0, target_ms - search_range_ms)
+        end_ms = target_ms + search_range_ms
+        for current_ms in range(start_ms, end_ms, step_ms):
+            cap.set(cv2.CAP_PROP_POS_MSEC, current_ms)
+            success, frame = cap.read()
+            if success:
+                score = calculate_focus_score(frame)
+                # 더 선명한 프레임을 찾으면 교체
+                if i not in best or score > best[i][2]:
+                    best[i] = (frame.copy(), current_ms, score) # 중요: 프레임 데이터를 복사해야 합니다.
+    return best
+
+
+def _scan_frames_sequential(cap, targets, search_range_ms: int) -> dict:
+    """
+    동영상을 처음부터 한 번만 순차 디코딩하면서, 어느 상품의 탐색 구간에라도 속하는 프레임만
+    retrieve() 하여 선명도를 계산합니다. 구간 밖의 프레임은 grab()으로 건너뛰기만 합니다.
+
+    Returns:
+        dict: {상품 인덱스: (프레임, 선택된 시간(ms), 선명도)}
+    """
+    # 탐색 구간을 시작 시간 순으로 정렬
+    windows = sorted(
+        (max(0, target_ms - search_range_ms), target_ms + search_range_ms, i)
+        for i, target_ms in targets
+    )
+    if not windows:
+        return {}
+    last_end_ms = max(w[1] for w in windows)
+
+    fps = cap.get(cv2.CAP_PROP_FPS) or 0.0
+    best = {}
+    active = []   # 현재 시간이 포함된 구간들 (end_ms, i)
+    next_w = 0    # 아직 열리지 않은 다음 구간의 인덱스
+    frame_idx = 0
+
+    while True:
+        # grab() 이전의 위치가 이번에 디코딩될 프레임의 시간입니다.
+        current_ms = frame_idx * 1000.0 / fps if fps > 0 else cap.get(cv2.CAP_PROP_POS_MSEC)
+        if current_ms > last_end_ms:
+            break
+        if not cap.grab():
+            break
+        frame_idx += 1
+
+        while next_w < len(windows) and windows[next_w][0] <= current_ms:
+            active.append((windows[next_w][1], windows[next_w][2]))
+            next_w += 1
+        active = [(end_ms, i) for end_ms, i in active if current_ms < end_ms]
+        if not active:
+            continue
+
+        success, frame = cap.retrieve()
+        if not success:
+            continue
+        # 겹치는 구간이 여러 개여도 선명도는 한 번만 계산합니다.
+        score = calculate_focus_score(frame)
+        for _, i in active:
+            if i not in best or score > best[i][2]:
+                best[i] = (frame.copy(), int(current_ms), score)
+    return best
+
+
 def save_product_frames(
     video_path: str,
     product_info_list: List[ProductInfo],
     search_range_ms: int = 50,
-    step_ms: int = 5
-):
+    step_ms: int = 5,
+    sequential: bool = True
+) -> dict[int, str]:
     """
     동영상에서 특정 시간 주변의 프레임들을 탐색하여 가장 선명한 프레임을 저장합니다.
+    실제로 저장된 이미지 경로를 {상품 인덱스: 경로} 로 반환합니다.
 
     Args:
         video_path (str): 원본 동영상 파일의 경로.
         product_info_list (List[Union[dict, 'ProductInfo']]): 상품 정보 리스트.
         search_range_ms (int): 선명한 프레임을 찾기 위해 탐색할 시간 범위(밀리초).
                                예: 250이면 지정 시간의 -250ms ~ +250ms 범위를 탐색합니다.
-        step_ms (int): 탐색 시 건너뛸 시간 간격(밀리초). 작을수록 꼼꼼하지만 오래 걸립니다.
+        step_ms (int): 탐색 시 건너뛸 시간 간격(밀리초). seek 방식에서만 사용됩니다.
+        sequential (bool): True면 동영상을 한 번만 순차 디코딩하며 구간 내 모든 프레임을 평가합니다.
+                           False면 기존처럼 상품마다 seek 하며 탐색합니다.
     """
     # 1. 동영상 파일 존재 여부 확인
     if not os.path.exists(video_path):
         print(f"❌ 오류: 동영상 파일을 찾을 수 없습니다. '{video_path}'")
-        return
+        return {}
+    if not product_info_list:
+        print("⚠️ 추출할 상품 정보가 없습니다.")
+        return {}
 
     # 2. 이미지 저장용 'img' 폴더 경로 설정 및 생성
     video_dir = os.path.dirname(video_path)
@@ -328,59 +584,40 @@ def save_product_frames(
     cap = cv2.VideoCapture(video_path)
     if not cap.isOpened():
         print(f"❌ 오류: 동영상을 열 수 없습니다. '{video_path}'")
-        return
+        return {}
 
-    # 4. 각 상품 정보에 대해 가장 선명한 프레임 추출
+    # 4. 각 상품 정보에 대해 가장 선명한 프레임 탐색
     print("🚀 가장 선명한 프레임 탐색 및 추출을 시작합니다...")
+    targets = []
+    names = {}
     for i, product_info in enumerate(product_info_list):
-        # Pydantic 모델과 dict 형태 모두 지원
-        if isinstance(product_info, dict):
-            target_timestamp_sec = product_info.get('time_min', 0) * 60 + product_info.get('time_sec', 0) + product_info.get('time_ms', 0) / 1000
-            product_name = product_info.get('name', 'unknown')
-            product_price = product_info.get('price', 0)
-        else:
-            target_timestamp_sec = product_info.time_min * 60 + product_info.time_sec + product_info.time_ms / 1000
-            product_name = product_info.name
-            product_price = product_info.price
-
-        target_timestamp_ms = int(target_timestamp_sec * 1000)
+        target_ms, names[i] = _product_target_ms(product_info)
+        targets.append((i, target_ms))
 
-        best_frame = None
-        max_focus_score = -1.0
-        best_frame_time_ms = -1
-
-        # 지정된 시간 주변을 탐색
-        start_ms = max(0, target_timestamp_ms - search_range_ms)
-        end_ms = target_timestamp_ms + search_range_ms
-        
-        print(f"\n  [항목 {i}] '{product_name}' 탐색 중... (목표 시간: {target_timestamp_sec:.2f}초)")
-        
-        for current_ms in range(start_ms, end_ms, step_ms):
-            cap.set(cv2.CAP_PROP_POS_MSEC, current_ms)
-            success, frame = cap.read()
-
-            if success:
-                score = calculate_focus_score(frame)
-                # 더 선명한 프레임을 찾으면 교체
-                if score > max_focus_score:
-                    max_focus_score = score
-                    best_frame = frame.copy() # 중요: 프레임 데이터를 복사해야 합니다.
-                    best_frame_time_ms = current_ms
-
-        if best_frame is not None:
-            # 가장 선명했던 프레임을 이미지 파일로 저장
-            image_name = f"{i}.png"
-            image_path = os.path.join(output_img_dir, image_name)
-            cv2.imwrite(image_path, best_frame)
-            chosen_time_sec = best_frame_time_ms / 1000
-            print(f"  - ✔️ '{image_path}' 저장 완료 (선택된 시간: {chosen_time_sec:.2f}초, 선명도: {max_focus_score:.2f})")
+    try:
+        if sequential:
+            best = _scan_frames_sequential(cap, targets, search_range_ms)
+        else:
+            best = _scan_frames_seek(cap, targets, search_range_ms, step_ms)
+    finally:
+        # 5. 자원 해제
+        cap.release()
+
+    # 6. 가장 선명했던 프레임을 이미지 파일로 저장
+    saved = {}
+    for i, target_ms in targets:
+        print(f"\n  [항목 {i}] '{names[i]}' (목표 시간: {target_ms / 1000:.2f}초)")
+        if i in best:
+            frame, chosen_ms, score = best[i]
+            image_path = os.path.join(output_img_dir, f"{i}.png")
+            if cv2.imwrite(image_path, frame):
+                saved[i] = image_path
+            print(f"  - ✔️ '{image_path}' 저장 완료 (선택된 시간: {chosen_ms / 1000:.2f}초, 선명도: {score:.2f})")
         else:
-            print(f"  - ❌ {target_timestamp_sec:.2f}초 주변에서 프레임을 읽는 데 실패했습니다.")
+            print(f"  - ❌ {target_ms / 1000:.2f}초 주변에서 프레임을 읽는 데 실패했습니다.")
 
-    # 5. 자원 해제
-    cap.release()
     print("\n🎉 모든 프레임 추출 작업을 완료했습니다.")
-
+    return saved
 
 
 if __name__ == '__main__':
@@ -0,0 +1,226 @@
+# backend/app/products.py
+# 상품 목록을 DB(products 테이블)에 적재. 게시글 렌더링 시에는 파일 시스템을 보지 않습니다.
+# 기존 게시글 일괄 적재: python -m app.products
+from __future__ import annotations
+import argparse
+import hashlib
+import json
+import struct
+from pathlib import Path
+from typing import Iterable, Optional
+
+import numpy as np
+from sqlalchemy.orm import Session
+
+from . import models
+from .media import media_url, stamp_post_versions
+
+# 뷰어 오버레이용 앵커 파일 (little-endian)
+#   header  : b"ANCH", u16 version, u16 reserved, u32 count, u32 strings_len   (16 bytes)
+#   coords  : float32[count * 3]  (x, y, z / 좌표 없으면 NaN)
+#   strings : UTF-8, "\0" 구분, 상품 순서대로 name, price 반복 (count * 2 개)
+ANCHORS_MAGIC = b"ANCH"
+ANCHORS_VERSION = 1
+
+# 기존 게시글 일괄 적재를 마쳤다는 표시 (media 루트). 테이블이 비었는지로 판단하면
+# 상품이 하나도 없는 배포에서 서버를 켤 때마다 전체 게시글 폴더를 다시 훑게 됩니다.
+BACKFILL_MARKER = ".products_backfilled"
+
+
+def _float_or_none(v) -> Optional[float]:
+    try:
+        return float(v) if v is not None else None
+    except (TypeError, ValueError):
+        return None
+
+
+def load_products_json(path: Path) -> Optional[list[dict]]:
+    """products JSON(list[dict])을 읽습니다. 형식이 맞지 않으면 None."""
+    with open(path, "r", encoding="utf-8") as f:
+        data = json.load(f)
+    if not isinstance(data, list):
+        return None
+    return [it for it in data if isinstance(it, dict)]
+
+
+def replace_post_products(
+    db: Session,
+    post: models.Post,
+    items: list[dict],
+    image_rels: dict[int, str],
+) -> None:
+    """
+    게시글의 상품 행을 items 로 교체합니다. 커밋은 호출자가 합니다.
+    image_rels 는 {상품 인덱스: media 기준 상대 경로} 로, 썸네일 추출 시점에 실제로 저장된 것만 담습니다.
+    """
+    post.products = [
+        models.Product(
+            idx=idx,
+            name=it.get("name"),
+            price=it.get("price"),
+            time_min=int(it.get("time_min", 0) or 0),
+            time_sec=int(it.get("time_sec", 0) or 0),
+            time_ms=int(it.get("time_ms", 0) or 0),
+            x=_float_or_none(it.get("x")),
+            y=_float_or_none(it.get("y")),
+            z=_float_or_none(it.get("z")),
+            image_path=image_rels.get(idx),
+        )
+        for idx, it in enumerate(items)
+    ]
+
+
+def product_out(pr: models.Product) -> dict:
+    return {
+        "name": pr.name,
+        "price": pr.price,
+        "time_min": pr.time_min,
+        "time_sec": pr.time_sec,
+        "time_ms": pr.time_ms,
+        "image_url": media_url(pr.image_path, pr.image_version),
+    }
+
+
+def encode_anchors(products: list[models.Product]) -> bytes:
+    coords = np.array(
+        [[pr.x if pr.x is not None else np.nan,
+          pr.y if pr.y is not None else np.nan,
+          pr.z if pr.z is not None else np.nan] for pr in products],
+        dtype="<f4",
+    ).reshape(-1, 3)
+    strings = "\0".join(s for pr in products for s in (pr.name or "", pr.price or "")).encode("utf-8")
+    header = struct.pack("<4sHHII", ANCHORS_MAGIC, ANCHORS_VERSION, 0, len(products), len(strings))
+    return header + coords.tobytes() + strings
+
+
+def write_anchors(post: models.Post, media_root: Path) -> Optional[str]:
+    """
+    상품 좌표/이름/가격을 앵커 파일로 저장하고 post.anchors_path 를 채웁니다. 커밋은 호출자가 합니다.
+    파일 이름에 내용 해시가 들어가므로 URL 이 바뀌지 않는 한 내용도 바뀌지 않습니다.
+    """
+    rel = post.video_path or post.ply_path
+    if not rel or not post.products:
+        post.anchors_path = None
+        return None
+    folder = (media_root / rel).parent
+    data = encode_anchors(list(post.products))
+    name = f"{folder.name}_anchors-{hashlib.sha256(data).hexdigest()[:12]}.bin"
+    path = folder / name
+    if not path.exists():
+        tmp = path.with_suffix(".tmp")
+        tmp.write_bytes(data)
+        tmp.replace(path)
+    post.anchors_path = f"{folder.name}/{name}"
+    return post.anchors_path
+
+
+def _find_products_json(folder: Path) -> Optional[Path]:
+    stem = folder.name
+    for cand in (folder / f"{stem}.json", *sorted(folder.glob("*.json"))):
+        if cand.exists():
+            return cand
+    return None
+
+
+def backfill(db: Session, media_root: Path, posts: Iterable[models.Post]) -> int:
+    """이전 방식(JSON + img/ 폴더)으로만 남아 있는 게시글의 상품을 DB 로 옮깁니다."""
+    n = 0
+    for p in posts:
+        rel = p.video_path or p.ply_path
+        if not rel or p.products:
+            continue
+        folder = (media_root / rel).parent
+        cand = _find_products_json(folder)
+        if cand is None:
+            continue
+        items = load_products_json(cand)
+        if items is None:
+            continue
+        image_rels = {
+            idx: f"{folder.name}/img/{idx}.png"
+            for idx in range(len(items))
+            if (folder / "img" / f"{idx}.png").exists()
+        }
+        replace_post_products(db, p, items, image_rels)
+        write_anchors(p, media_root)
+        stamp_post_versions(p)
+        n += 1
+    db.commit()
+    return n
+
+
+def backfill_versions(db: Session, posts: Iterable[models.Post]) -> int:
+    """/media URL 버전(내용 해시) 도입 전 게시글의 버전을 기록합니다. 파일을 모두 읽으므로 CLI 에서만 실행합니다."""
+    n = 0
+    for p in posts:
+        paths = (p.video_path, p.ply_path, p.traj_path, p.points_path)
+        versions = (p.video_version, p.ply_version, p.traj_version, p.points_version)
+        missing = any(path and v is None for path, v in zip(paths, versions)) or any(
+            pr.image_path and pr.image_version is None for pr in p.products
+        )
+        if not missing:
+            continue
+        stamp_post_versions(p)
+        n += 1
+    db.commit()
+    return n
+
+
+def backfill_anchors(db: Session, media_root: Path, posts: Iterable[models.Post]) -> int:
+    """상품은 있는데 앵커 파일이 없는 게시글의 앵커 파일을 만듭니다."""
+    n = 0
+    for p in posts:
+        if p.anchors_path or not p.products:
+            continue
+        if write_anchors(p, media_root):
+            n += 1
+    db.commit()
+    return n
+
+
+def _mark_backfilled(media_root: Path) -> None:
+    (media_root / BACKFILL_MARKER).touch()
+
+
+def ensure_populated(db: Session, media_root: Path) -> None:
+    """기존 게시글 적재를 아직 하지 않았으면(도입 직후) 한 번 적재하고, 빠진 앵커 파일을 만듭니다."""
+    if not (media_root / BACKFILL_MARKER).exists():
+        backfill(db, media_root, db.query(models.Post).filter(models.Post.video_path.isnot(None)).all())
+        _mark_backfilled(media_root)
+    # 앵커 파일 도입 전에 적재된 상품
+    missing = (
+        db.query(models.Post)
+        .filter(models.Post.anchors_path.is_(None), models.Post.products.any())
+        .all()
+    )
+    if missing:
+        backfill_anchors(db, media_root, missing)
+
+
+def main(argv=None):
+    from .config import settings
+    from .database import Base, engine, SessionLocal, add_missing_columns
+
+    parser = argparse.ArgumentParser(
+        description="Backfill products table, viewer anchors and media URL versions from media files"
+    )
+    parser.parse_args(argv)
+
+    Base.metadata.create_all(bind=engine)
+    add_missing_columns(models.Post.__table__)
+    add_missing_columns(models.Product.__table__)
+    db = SessionLocal()
+    try:
+        n = backfill(db, Path(settings.media_dir), db.query(models.Post).all())
+        _mark_backfilled(Path(settings.media_dir))
+        print(f"상품 적재 완료: {n}개 게시글")
+        n = backfill_anchors(db, Path(settings.media_dir), db.query(models.Post).all())
+        print(f"앵커 파일 생성 완료: {n}개 게시글")
+        n = backfill_versions(db, db.query(models.Post).all())
+        print(f"media 버전 기록 완료: {n}개 게시글")
+    finally:
+        db.close()
+
+
+if __name__ == "__main__":
+    main()
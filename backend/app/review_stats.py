@@ -0,0 +1,148 @@
+# backend/app/review_stats.py
+# post_review_stats 집계 테이블 유지보수
+#   - apply_review_change: 리뷰 작성/수정 시 같은 트랜잭션 안에서 증분 반영
+#   - rebuild: reviews 테이블로부터 재계산 (드리프트 복구용)
+# 재구성: python -m app.review_stats [--post-id N]
+from __future__ import annotations
+import argparse
+from typing import Optional
+
+from sqlalchemy import func, case, update, delete, insert
+from sqlalchemy.dialects.sqlite import insert as sqlite_insert
+from sqlalchemy.orm import Session
+
+from . import models, schemas
+
+STAT_FIELDS = ("kindness", "price", "variety")
+_TAGS = {1: "pos", 0: "neu", -1: "neg"}
+
+
+def _column(field: str, value: int) -> str:
+    return f"{field}_{_TAGS[value]}"
+
+
+def apply_review_change(
+    db: Session,
+    post_id: int,
+    old: Optional[dict[str, int]],
+    new: dict[str, int],
+) -> None:
+    """
+    리뷰 한 건의 변경분을 집계 행에 더합니다. 커밋은 호출자가 리뷰 저장과 함께 합니다.
+    old 가 None 이면 신규 리뷰(total +1), 아니면 기존 값에서 new 로 바뀐 필드만 ±1 합니다.
+    """
+    db.execute(
+        sqlite_insert(models.PostReviewStats)
+        .values(post_id=post_id)
+        .on_conflict_do_nothing(index_elements=["post_id"])
+    )
+
+    T = models.PostReviewStats
+    values = {}
+    if old is None:
+        values["total"] = T.total + 1
+    for field in STAT_FIELDS:
+        before = None if old is None else old[field]
+        after = new[field]
+        if before == after:
+            continue
+        if before is not None:
+            col = _column(field, before)
+            values[col] = getattr(T, col) - 1
+        col = _column(field, after)
+        values[col] = getattr(T, col) + 1
+    if values:
+        db.execute(update(T).where(T.post_id == post_id).values(**values))
+
+
+def pack_stats(row) -> schemas.ReviewStats:
+    def pack(field, pos_alias=(), neu_alias=("mid",), neg_alias=()):
+        pos = int(getattr(row, f"{field}_pos", 0) or 0) if row is not None else 0
+        neu = int(getattr(row, f"{field}_neu", 0) or 0) if row is not None else 0
+        neg = int(getattr(row, f"{field}_neg", 0) or 0) if row is not None else 0
+        d = {
+            "1": pos, "0": neu, "-1": neg,
+            "pos": pos, "neu": neu, "neg": neg,
+        }
+        for a in pos_alias: d[a] = pos
+        for a in neu_alias: d[a] = neu
+        for a in neg_alias: d[a] = neg
+        return d
+
+    return schemas.ReviewStats(
+        total=int(row.total or 0) if row is not None else 0,
+        kindness=pack("kindness", pos_alias=("positive",), neg_alias=("negative",)),
+        price=pack("price",    pos_alias=("cheap",),       neg_alias=("exp",)),
+        variety=pack("variety",pos_alias=("div",),         neg_alias=("low",)),
+    )
+
+
+def get_stats(db: Session, post_id: int) -> schemas.ReviewStats:
+    # post_review_stats 의 기본키 조회 한 번 (upsert_review 에서 증분 갱신됨)
+    return pack_stats(db.get(models.PostReviewStats, post_id))
+
+
+def get_stats_bulk(db: Session, post_ids: list[int]) -> dict[int, schemas.ReviewStats]:
+    """여러 게시글의 리뷰 통계를 post_review_stats 에서 한 번에 읽습니다."""
+    if not post_ids:
+        return {}
+    rows = (
+        db.query(models.PostReviewStats)
+        .filter(models.PostReviewStats.post_id.in_(post_ids))
+        .all()
+    )
+    by_id = {r.post_id: pack_stats(r) for r in rows}
+    empty = pack_stats(None)
+    return {pid: by_id.get(pid, empty) for pid in post_ids}
+
+
+def _aggregate_columns():
+    cols = [func.count(models.Review.id).label("total")]
+    for field in STAT_FIELDS:
+        src = getattr(models.Review, field)
+        for val in _TAGS:
+            cols.append(
+                func.coalesce(func.sum(case((src == val, 1), else_=0)), 0).label(_column(field, val))
+            )
+    return cols
+
+
+def rebuild(db: Session, post_id: Optional[int] = None) -> int:
+    """reviews 테이블에서 집계를 다시 계산해 덮어씁니다. 재구성한 게시글 수를 반환합니다."""
+    q = db.query(models.Review.post_id, *_aggregate_columns()).group_by(models.Review.post_id)
+    stmt = delete(models.PostReviewStats)
+    if post_id is not None:
+        q = q.filter(models.Review.post_id == post_id)
+        stmt = stmt.where(models.PostReviewStats.post_id == post_id)
+    rows = [dict(r._mapping) for r in q.all()]
+    db.execute(stmt)
+    if rows:
+        db.execute(insert(models.PostReviewStats), rows)
+    db.commit()
+    return len(rows)
+
+
+def ensure_populated(db: Session) -> None:
+    """집계 테이블이 비어 있는데 리뷰가 있으면(도입 직후) 한 번 재구성합니다."""
+    if db.query(models.PostReviewStats.post_id).first() is None and db.query(models.Review.id).first() is not None:
+        rebuild(db)
+
+
+def main(argv=None):
+    from .database import Base, engine, SessionLocal
+
+    parser = argparse.ArgumentParser(description="Rebuild post_review_stats from reviews")
+    parser.add_argument("--post-id", type=int, default=None, help="특정 게시글만 재구성")
+    args = parser.parse_args(argv)
+
+    Base.metadata.create_all(bind=engine)
+    db = SessionLocal()
+    try:
+        n = rebuild(db, args.post_id)
+        print(f"post_review_stats 재구성 완료: {n}개 게시글")
+    finally:
+        db.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -45,6 +45,21 @@ class ProductItem(BaseModel):
     time_ms: int
     image_url: Optional[str] = None  # ← 호버 미리보기용 이미지 경로
 
+class UploadCreate(BaseModel):
+    filename: str
+    size: int
+    chunk_size: Optional[int] = None
+    sha256: Optional[str] = None     # 전체 파일 해시 (선택)
+
+class UploadOut(BaseModel):
+    id: int
+    status: str
+    size: int
+    chunk_size: int
+    total_chunks: int
+    received: List[int]              # 이미 받은 청크 번호 (재개 시 나머지만 전송)
+    post_id: Optional[int] = None
+
 class PostOut(BaseModel):
     id: int
     created_at: datetime
@@ -53,6 +68,8 @@ class PostOut(BaseModel):
     ply_url: Optional[str] = None
     traj_url: Optional[str] = None
     points_url: Optional[str] = None
+    lod_url: Optional[str] = None
+    anchors_url: Optional[str] = None
     status: Optional[str] = None
     log_url: Optional[str] = None
     store_name: Optional[str] = None
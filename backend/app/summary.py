@@ -0,0 +1,511 @@
+# backend/app/summary.py
+# 가게 소개문(AI 요약) 생성: Snowflake Cortex 커넥션 풀 + 모델 순차 헤지 호출 + 폴백 문구
+# API 는 jobs 테이블에 kind="summary" 작업만 적재하고, 실제 생성은 워커(app.worker)가 수행합니다.
+# 오래된 소개문 일괄 재생성: python -m app.summary [--market M] [--concurrency N] [--include-missing]
+from __future__ import annotations
+import argparse
+import hashlib
+import json
+import logging
+import queue
+import threading
+import traceback
+from collections import defaultdict
+from concurrent.futures import ThreadPoolExecutor, FIRST_COMPLETED, wait
+from contextlib import contextmanager, nullcontext
+from functools import partial
+from typing import Optional
+
+from sqlalchemy.orm import Session, joinedload
+
+from .config import settings
+from . import models, schemas, review_stats
+from .logutil import log_kv
+
+logger = logging.getLogger("board.summary")
+
+DEFAULT_MODELS = [
+    "mistral-large2",
+    "mistral-large",
+    "snowflake-arctic",
+    "snowflake-arctic-m",
+    "llama3-70b-instruct",
+]
+
+
+_log_kv = partial(log_kv, logger)
+
+
+class _SnowflakePool:
+    """
+    오래 유지되는 Snowflake 커넥션 풀. 요청마다 새로 연결(+세션 확인 쿼리)하지 않고 재사용합니다.
+    사용 중 오류가 난 커넥션은 풀로 돌려보내지 않고 닫습니다.
+    """
+    def __init__(self, maxsize: int):
+        self.maxsize = maxsize
+        self._idle: queue.LifoQueue = queue.LifoQueue()
+        self._created = 0
+        self._lock = threading.Lock()
+
+    def _config(self) -> dict:
+        cfg = {
+            "account":   settings.snowflake_account,
+            "user":      settings.snowflake_user,
+            "password":  settings.snowflake_password,
+            "role":      settings.snowflake_role,
+            "warehouse": settings.snowflake_warehouse,
+            "database":  settings.snowflake_database,
+            "schema":    settings.snowflake_schema,
+            "client_session_keep_alive": True,
+        }
+        for k in ("account","user","password","warehouse","database","schema"):
+            if not cfg.get(k):
+                raise RuntimeError(f"Snowflake 설정 누락: {k}")
+        return cfg
+
+    def _connect(self):
+        try:
+            import snowflake.connector as sf
+        except Exception as e:
+            logger.error("Snowflake 커넥터 import 실패: %s", e)
+            raise
+        cfg = self._config()
+        redacted = {k: ("***" if k == "password" else v) for k, v in cfg.items()}
+        _log_kv("Snowflake 연결 시도", **redacted)
+        conn = sf.connect(**cfg)
+        cur = conn.cursor()
+        try:
+            cur.execute("SELECT CURRENT_ROLE(), CURRENT_WAREHOUSE(), CURRENT_DATABASE(), CURRENT_SCHEMA()")
+            row = cur.fetchone()
+            _log_kv("Snowflake 세션 확인",
+                    current_role=row[0], current_wh=row[1], current_db=row[2], current_schema=row[3])
+        finally:
+            cur.close()
+        return conn
+
+    def _take(self, timeout: float):
+        while True:
+            try:
+                conn = self._idle.get_nowait()
+            except queue.Empty:
+                break
+            if not conn.is_closed():
+                return conn
+            with self._lock:
+                self._created -= 1
+        with self._lock:
+            can_create = self._created < self.maxsize
+            if can_create:
+                self._created += 1
+        if can_create:
+            try:
+                return self._connect()
+            except Exception:
+                with self._lock:
+                    self._created -= 1
+                raise
+        return self._idle.get(timeout=timeout)
+
+    def _discard(self, conn):
+        try:
+            conn.close()
+        except Exception:
+            pass
+        with self._lock:
+            self._created -= 1
+
+    @contextmanager
+    def connection(self, timeout: float = 30.0):
+        conn = self._take(timeout)
+        try:
+            yield conn
+        except Exception:
+            self._discard(conn)
+            raise
+        else:
+            self._idle.put(conn)
+
+
+_pool = _SnowflakePool(settings.snowflake_pool_size)
+_race_executor = ThreadPoolExecutor(max_workers=max(1, settings.snowflake_pool_size), thread_name_prefix="cortex")
+
+
+class _CortexCall:
+    """
+    모델 하나에 대한 COMPLETE 호출. execute_async 로 쿼리 id 를 먼저 받아 두므로,
+    다른 모델이 먼저 성공하면 SYSTEM$CANCEL_QUERY 로 Snowflake 쪽 실행을 멈추고 커넥션을 바로 돌려받습니다.
+    """
+    def __init__(self, model: str, prompt: str, timeout: int):
+        self.model = model
+        self.prompt = prompt
+        self.timeout = timeout
+        self._cancelled = threading.Event()
+        self._conn = None
+        self._qid: Optional[str] = None
+
+    def run(self) -> Optional[str]:
+        if self._cancelled.is_set():
+            return None
+        with _pool.connection() as conn:
+            cur = conn.cursor()
+            try:
+                _log_kv("Cortex 시도", model=self.model)
+                cur.execute_async(
+                    "SELECT SNOWFLAKE.CORTEX.COMPLETE(%s, %s) AS TEXT",
+                    (self.model, self.prompt),
+                    timeout=self.timeout,
+                )
+                self._conn, self._qid = conn, cur.sfqid
+                if self._cancelled.is_set():
+                    self._abort()
+                try:
+                    cur.get_results_from_sfqid(self._qid)
+                    row = cur.fetchone()
+                except Exception:
+                    if self._cancelled.is_set():
+                        return None  # 취소된 쿼리: 커넥션은 정상이므로 풀로 돌려보냄
+                    raise
+                if row and row[0] is not None:
+                    return str(row[0])
+                return None
+            finally:
+                cur.close()
+
+    def _abort(self):
+        conn, qid = self._conn, self._qid
+        if conn is None or not qid:
+            return
+        try:
+            cur = conn.cursor()
+            try:
+                cur.execute("SELECT SYSTEM$CANCEL_QUERY(%s)", (qid,))
+            finally:
+                cur.close()
+            _log_kv("Cortex 취소", model=self.model, qid=qid)
+        except Exception as e:
+            logger.warning("Cortex 취소 실패 | model=%s qid=%s err=%s", self.model, qid, e)
+
+    def cancel(self):
+        self._cancelled.set()
+        self._abort()
+
+
+def cortex_complete(prompt: str, model_list: Optional[list[str]] = None,
+                    timeout: Optional[int] = None, hedge_delay: Optional[float] = None) -> str:
+    """
+    Cortex 모델을 순서대로 시도해 가장 먼저 성공한 응답을 반환합니다. (hedged request)
+    앞 모델이 실패하면 바로, hedge_delay(초) 안에 응답이 없으면 앞 모델을 유지한 채 다음 모델을 추가로 시작합니다.
+    보통은 첫 모델 한 번만 호출되고, 응답을 받으면 아직 실행 중인 다른 모델 쿼리는 취소합니다.
+    각 모델 호출은 timeout(초)을 넘기면 Snowflake 쪽에서 취소됩니다.
+    """
+    if model_list is None:
+        model_list = DEFAULT_MODELS
+    if timeout is None:
+        timeout = settings.cortex_model_timeout
+    if hedge_delay is None:
+        hedge_delay = settings.cortex_hedge_delay
+    _log_kv("Cortex 호출 준비", prompt_preview=prompt[:160].replace("\n", " "))
+
+    models_left = list(model_list)
+    pending: dict = {}
+
+    def launch():
+        call = _CortexCall(models_left.pop(0), prompt, timeout)
+        pending[_race_executor.submit(call.run)] = call
+
+    launch()
+    try:
+        while pending:
+            done, _ = wait(pending, timeout=hedge_delay if models_left else timeout + 10,
+                           return_when=FIRST_COMPLETED)
+            if not done:
+                if not models_left:
+                    break
+                _log_kv("Cortex 응답 지연, 다음 모델 추가", waiting=",".join(c.model for c in pending.values()))
+                launch()
+                continue
+            for fut in done:
+                call = pending.pop(fut)
+                try:
+                    text = fut.result()
+                except Exception as e:
+                    logger.warning("모델 %s 실패: %s", call.model, e)
+                    text = None
+                if text is not None:
+                    _log_kv("Cortex 성공", model=call.model, len=len(text))
+                    return text
+                if models_left:
+                    launch()
+        raise RuntimeError("모든 Cortex 모델 호출 실패")
+    finally:
+        # 진 호출은 시작 전이면 취소, 실행 중이면 Snowflake 쿼리를 취소해 크레딧/커넥션을 돌려받음
+        for fut, call in pending.items():
+            fut.cancel()
+            call.cancel()
+
+
+def _complete_batch_sql(n: int) -> str:
+    # 프롬프트를 VALUES 테이블로 넘기고 행마다 COMPLETE 를 적용. 모델명/프롬프트는 모두 바인드 파라미터.
+    rows = ", ".join(["(%s, %s)"] * n)
+    return (
+        "SELECT v.ID, SNOWFLAKE.CORTEX.COMPLETE(%s, v.PROMPT) AS TEXT "
+        f"FROM (VALUES {rows}) AS v(ID, PROMPT)"
+    )
+
+
+def cortex_complete_many(prompts: dict[int, str], model_list: Optional[list[str]] = None,
+                         timeout: Optional[int] = None, conn=None,
+                         batch_size: Optional[int] = None) -> dict[int, str]:
+    """
+    여러 프롬프트를 한 번의 SELECT 로 생성합니다. {post_id: prompt} -> {post_id: text}.
+    첫 모델에서 비었거나 실패한 항목만 다음 모델로 다시 보냅니다.
+    conn 을 주면 풀 대신 그 커넥션을 씁니다 (가짜 커넥션으로 확인할 때, backend/scripts/check_cortex_batch.py).
+    모든 모델에서 실패한 post_id 는 결과에 들어가지 않습니다.
+    """
+    if model_list is None:
+        model_list = DEFAULT_MODELS
+    if timeout is None:
+        timeout = settings.cortex_batch_timeout
+    size = max(1, batch_size or settings.cortex_batch_size)
+
+    results: dict[int, str] = {}
+    remaining = dict(prompts)
+    for model in model_list:
+        if not remaining:
+            break
+        items = list(remaining.items())
+        for start in range(0, len(items), size):
+            chunk = items[start:start + size]
+            params: list = [model]
+            for post_id, prompt in chunk:
+                params += [post_id, prompt]
+            _log_kv("Cortex 일괄 호출", model=model, count=len(chunk))
+            try:
+                with (nullcontext(conn) if conn is not None else _pool.connection()) as c:
+                    cur = c.cursor()
+                    try:
+                        cur.execute(_complete_batch_sql(len(chunk)), params, timeout=timeout)
+                        rows = cur.fetchall()
+                    finally:
+                        cur.close()
+            except Exception as e:
+                logger.warning("모델 %s 일괄 호출 실패: %s", model, e)
+                continue
+            for post_id, text in rows:
+                if text is not None:
+                    results[int(post_id)] = str(text)
+        remaining = {k: v for k, v in remaining.items() if k not in results}
+    _log_kv("Cortex 일괄 완료", ok=len(results), failed=len(remaining))
+    return results
+
+
+def build_shop_prompt(store_name: str, market: Optional[str], stall_no: Optional[str], stats: schemas.ReviewStats) -> str:
+    def part(tag: str, d: dict) -> str:
+        kv = ", ".join(f"{k}:{v}" for k, v in d.items())
+        return f"{tag}({kv})"
+    reviews = f"총 {stats.total}명이 평가. " \
+              f"{part('친절도', stats.kindness)}, " \
+              f"{part('가격',   stats.price)}, " \
+              f"{part('구성',   stats.variety)}."
+    loc = []
+    if market: loc.append(f"시장: {market}")
+    if stall_no: loc.append(f"위치/호수: {stall_no}")
+    loc_str = " / ".join(loc) if loc else "위치 정보: 미상"
+    guide = (
+    "아래 가게에 대한 한국어 소개문을 작성하세요.\n"
+    "- 길이: 300자 이상 600자 이하, 3~6문장.\n"
+    "- 톤: 밝고 따뜻하며 먹음직스럽게. 과장·허위·이모지 금지.\n"
+    "- 가능한 한 리뷰 요약을 근거로 인상과 장점을 균형 있게 서술.\n"
+    "- 특정 고유명사는 그대로 유지.\n"
+    "- **시장 주변의 명소**를 활용하여, 가게 방문 동선을 자연스럽게 연결해 소개.\n"
+    "- **시장을 제외한 구체적인 명소 이름을 찾아오고, 없으면 생략. 단, 반드시 동대문구 안에 있는 장소여야 함.\n"
+    "- 주변 명소는 *도보 n분*이나 *차로 m분*과 같은 형식으로 서술. 모호하면 “가까운”, “근처” 등 일반 표현 사용.\n"
+    "- 눈길을 끌 수 있는 센스 있는 문구를 적절히 포함.\n"
+    "- **반드시 Markdown 문법을 적극적으로 활용**하여 시장, 평가, 주변 명소를 적절히 강조할 것.\n"
+    "- 마지막 줄에는 한 줄 띄운 후, 파란 글씨(`span` 태그 style)로 적절한 해시태그를 넣을 것.\n"
+    "- 오직 소개문만 출력하고, 추가 설명은 하지 말 것.\n"
+)
+    info = (
+        f"[가게명] {store_name or '이 가게'}\n"
+        f"[시장/위치] {loc_str}\n"
+        f"[리뷰 요약] {reviews}\n"
+    )
+    return guide + "\n" + info + "\n[출력형식] 순수 본문만 작성"
+
+
+def _fallback_text(store_name: Optional[str], stats: schemas.ReviewStats) -> str:
+    lines = [f"{store_name or '이 가게'}은(는) 지역 시장에서 사랑받는 곳입니다."]
+    if stats.total:
+        if stats.kindness.get("pos", 0) >= stats.kindness.get("neg", 0):
+            lines.append("친절한 응대로 손님을 맞이합니다.")
+        if stats.price.get("cheap", 0) >= stats.price.get("exp", 0):
+            lines.append("가격대도 합리적이에요.")
+        if stats.variety.get("div", 0) >= stats.variety.get("low", 0):
+            lines.append("메뉴/상품 구성이 다양해 선택의 폭이 넓어요.")
+    return " ".join(lines)
+
+
+def summary_fingerprint(prompt: str, model_list: Optional[list[str]] = None) -> str:
+    """
+    소개문 입력 지문. 프롬프트(가게명·시장·호수·리뷰 통계가 모두 들어 있음)와 모델 목록의 해시입니다.
+    지문이 같으면 다시 생성해도 같은 입력이므로 Cortex 호출을 생략합니다.
+    """
+    raw = json.dumps({"prompt": prompt, "models": model_list or DEFAULT_MODELS}, ensure_ascii=False, sort_keys=True)
+    return hashlib.sha256(raw.encode("utf-8")).hexdigest()
+
+
+def _prompt_for(post: models.Post, stats: schemas.ReviewStats) -> str:
+    author = post.author
+    return build_shop_prompt(
+        author.store_name if author else None,
+        author.market if author else None,
+        author.stall_no if author else None,
+        stats,
+    )
+
+
+def summary_is_fresh(db: Session, post: models.Post, stats: Optional[schemas.ReviewStats] = None) -> bool:
+    """저장된 소개문이 현재 입력으로 만든 것인지 (재생성이 필요 없는지)."""
+    if not post.ai_summary or not post.ai_summary_fp:
+        return False
+    if stats is None:
+        stats = review_stats.get_stats(db, post.id)
+    return post.ai_summary_fp == summary_fingerprint(_prompt_for(post, stats))
+
+
+def generate_summary(db: Session, post: models.Post, force: bool = False) -> Optional[str]:
+    """
+    게시글의 소개문을 생성해 post.ai_summary 에 저장합니다.
+    입력 지문이 저장된 것과 같으면 (force 가 아닌 한) Cortex 를 부르지 않고 기존 소개문을 반환합니다.
+    Cortex 가 모두 실패하면, 기존 소개문이 없을 때만 리뷰 통계 기반 폴백 문구를 씁니다.
+    """
+    store_name = post.author.store_name if post.author else None
+    market = post.author.market if post.author else None
+    stall_no = post.author.stall_no if post.author else None
+    stats = review_stats.get_stats(db, post.id)
+
+    prompt = _prompt_for(post, stats)
+    fp = summary_fingerprint(prompt)
+    if not force and post.ai_summary and post.ai_summary_fp == fp:
+        _log_kv("요약 캐시 적중", post_id=post.id)
+        return post.ai_summary
+
+    _log_kv("요약생성 시작", post_id=post.id, store_name=store_name, market=market, stall_no=stall_no, reviews_total=stats.total)
+
+    text: Optional[str] = None
+    try:
+        text = cortex_complete(prompt)
+    except Exception as e:
+        logger.error("Snowflake 호출 실패: %s", e)
+        logger.error("TRACE:\n%s", traceback.format_exc())
+        if not post.ai_summary:
+            text = _fallback_text(store_name, stats)
+            fp = None   # 폴백 문구는 캐시로 취급하지 않음 (다음 요청 때 다시 시도)
+            _log_kv("폴백 소개문 사용", length=len(text))
+
+    if text is None:
+        return None
+
+    post.ai_summary = text
+    post.ai_summary_fp = fp
+    db.commit()
+    _log_kv("소개문 저장 완료", post_id=post.id, length=len(text))
+    return text
+
+
+def find_stale(db: Session, market: Optional[str] = None, include_missing: bool = False) -> list[int]:
+    """
+    입력 지문이 달라진(또는 지문이 없는) 소개문을 가진 게시글 id 목록.
+    include_missing 이면 소개문이 아직 없는 게시글도 포함합니다.
+    """
+    q = db.query(models.Post).options(joinedload(models.Post.author))
+    if market:
+        q = q.join(models.User, models.Post.author_id == models.User.id).filter(models.User.market == market)
+    if not include_missing:
+        q = q.filter(models.Post.ai_summary.isnot(None))
+    posts = q.order_by(models.Post.id.asc()).all()
+    stats = review_stats.get_stats_bulk(db, [p.id for p in posts])
+    return [p.id for p in posts if not summary_is_fresh(db, p, stats[p.id])]
+
+
+def _regenerate_market(post_ids: list[int]) -> tuple[int, int]:
+    from .database import SessionLocal
+
+    db = SessionLocal()
+    try:
+        posts = (
+            db.query(models.Post)
+            .options(joinedload(models.Post.author))
+            .filter(models.Post.id.in_(post_ids))
+            .all()
+        )
+        stats = review_stats.get_stats_bulk(db, [p.id for p in posts])
+        prompts = {p.id: _prompt_for(p, stats[p.id]) for p in posts}
+        try:
+            texts = cortex_complete_many(prompts)
+        except Exception:
+            logger.error("일괄 재생성 실패 | posts=%s\n%s", len(posts), traceback.format_exc())
+            return 0, len(post_ids)
+        for p in posts:
+            if p.id in texts:
+                p.ai_summary = texts[p.id]
+                p.ai_summary_fp = summary_fingerprint(prompts[p.id])
+        db.commit()
+        return len(texts), len(post_ids) - len(texts)
+    finally:
+        db.close()
+
+
+def regenerate_stale(db: Session, post_ids: list[int], concurrency: int) -> tuple[int, int]:
+    """
+    주어진 게시글들의 소개문을 시장별로 묶어 일괄 재생성합니다.
+    시장 하나가 Cortex 왕복 한 번(cortex_batch_size 단위)이며, 최대 concurrency 개 시장을 동시에 처리합니다.
+    (성공, 실패) 수를 반환합니다.
+    """
+    by_market: dict[Optional[str], list[int]] = defaultdict(list)
+    rows = (
+        db.query(models.Post.id, models.User.market)
+        .join(models.User, models.Post.author_id == models.User.id)
+        .filter(models.Post.id.in_(post_ids))
+        .all()
+    )
+    for post_id, market in rows:
+        by_market[market].append(post_id)
+
+    ok = failed = 0
+    with ThreadPoolExecutor(max_workers=max(1, concurrency), thread_name_prefix="summary") as ex:
+        for n_ok, n_failed in ex.map(_regenerate_market, by_market.values()):
+            ok += n_ok
+            failed += n_failed
+    return ok, failed
+
+
+def main(argv=None):
+    from .database import Base, engine, SessionLocal, add_missing_columns
+
+    parser = argparse.ArgumentParser(description="Regenerate stale shop summaries")
+    parser.add_argument("--market", default=None, help="특정 시장의 가게만")
+    parser.add_argument("--concurrency", type=int, default=settings.summary_concurrency,
+                        help="동시에 처리할 시장(일괄 호출) 수")
+    parser.add_argument("--include-missing", action="store_true", help="소개문이 없는 게시글도 생성")
+    parser.add_argument("--dry-run", action="store_true", help="대상 게시글만 출력")
+    args = parser.parse_args(argv)
+
+    Base.metadata.create_all(bind=engine)
+    add_missing_columns(models.Post.__table__)
+    db = SessionLocal()
+    try:
+        post_ids = find_stale(db, args.market, args.include_missing)
+        print(f"재생성 대상: {len(post_ids)}개 게시글")
+        if args.dry_run or not post_ids:
+            if post_ids:
+                print(" ".join(map(str, post_ids)))
+            return
+        ok, failed = regenerate_stale(db, post_ids, args.concurrency)
+        print(f"소개문 재생성 완료: 성공 {ok} / 실패 {failed}")
+    finally:
+        db.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,99 @@
+# backend/app/transcode.py
+# 분석용 프록시 영상: 원본(흔히 4K/60fps)을 짧은 변 720px / 15fps / 1초 간격 키프레임으로 줄여
+# Gemini 업로드와 3D 복원 서버 전송에 사용합니다. 썸네일은 설정에 따라 원본에서 추출합니다.
+# ffmpeg 실행 파일이 없으면 프록시 없이 원본을 그대로 사용합니다.
+from __future__ import annotations
+import os
+import shutil
+import subprocess
+from pathlib import Path
+from typing import Optional
+
+from .config import settings
+
+PROXY_SUFFIX = ".proxy.mp4"
+
+
+def proxy_path_for(video_path: str | Path) -> Path:
+    p = Path(video_path)
+    return p.with_name(p.stem + PROXY_SUFFIX)
+
+
+def _probe(video_path: Path) -> tuple[int, int, float]:
+    """(가로, 세로, fps). 읽지 못하면 0 을 채워 반환합니다."""
+    import cv2  # API 프로세스는 pipeline 을 import 하므로 워커에서만 필요한 cv2 는 지연 import
+    cap = cv2.VideoCapture(str(video_path))
+    try:
+        if not cap.isOpened():
+            return 0, 0, 0.0
+        return (
+            int(cap.get(cv2.CAP_PROP_FRAME_WIDTH) or 0),
+            int(cap.get(cv2.CAP_PROP_FRAME_HEIGHT) or 0),
+            float(cap.get(cv2.CAP_PROP_FPS) or 0.0),
+        )
+    finally:
+        cap.release()
+
+
+def _needs_proxy(video_path: Path) -> bool:
+    w, h, fps = _probe(video_path)
+    if not w or not h:
+        return True  # 메타데이터를 못 읽으면 일단 변환 시도 (ffmpeg 가 더 관대함)
+    return min(w, h) > settings.proxy_short_side or fps > settings.proxy_fps + 0.5
+
+
+def _ffmpeg_cmd(src: Path, dst: Path) -> list[str]:
+    s = settings.proxy_short_side
+    # 짧은 변 기준 축소 (세로 영상도 같은 해상도), 원본보다 키우지는 않음. -2 는 짝수 유지
+    scale = (f"scale='if(gte(iw,ih),-2,min({s},iw))':'if(gte(iw,ih),min({s},ih),-2)'")
+    gop = max(1, round(settings.proxy_fps * settings.proxy_keyframe_sec))
+    return [
+        settings.ffmpeg_bin, "-hide_banner", "-loglevel", "error", "-y",
+        "-i", str(src),
+        "-vf", f"{scale},fps={settings.proxy_fps}",
+        "-c:v", "libx264", "-preset", "veryfast", "-crf", str(settings.proxy_crf),
+        "-pix_fmt", "yuv420p",
+        # 고정 간격 키프레임: 썸네일/복원 쪽 seek 가 가까운 키프레임에서 바로 시작
+        "-g", str(gop), "-keyint_min", str(gop), "-sc_threshold", "0",
+        # 가격을 말로 하는 경우가 있어 오디오는 모노 저비트레이트로 유지
+        "-c:a", "aac", "-ac", "1", "-b:a", "64k",
+        "-movflags", "+faststart",
+        str(dst),
+    ]
+
+
+def make_analysis_proxy(video_path: str | Path) -> Optional[Path]:
+    """
+    원본 옆에 '{stem}.proxy.mp4' 를 만들어 경로를 반환합니다.
+    이미 원본보다 새 프록시가 있으면 재사용하고, 변환이 필요 없거나 불가능하면 None (원본 사용).
+    """
+    src = Path(video_path)
+    if not settings.proxy_enabled:
+        return None
+    dst = proxy_path_for(src)
+    if dst.exists() and dst.stat().st_mtime >= src.stat().st_mtime and dst.stat().st_size > 0:
+        return dst
+    if shutil.which(settings.ffmpeg_bin) is None:
+        print(f"ffmpeg 를 찾을 수 없어 원본으로 분석합니다. ({settings.ffmpeg_bin})")
+        return None
+    if not _needs_proxy(src):
+        print(f"이미 분석 해상도/프레임레이트 이하라 원본을 사용합니다: '{src.name}'")
+        return None
+
+    tmp = dst.with_name(dst.name + ".part.mp4")
+    try:
+        subprocess.run(_ffmpeg_cmd(src, tmp), check=True, capture_output=True, text=True,
+                       timeout=settings.proxy_timeout)
+    except subprocess.CalledProcessError as e:
+        tmp.unlink(missing_ok=True)
+        print(f"프록시 변환 실패(원본 사용): {(e.stderr or '').strip()[-500:]}")
+        return None
+    except subprocess.TimeoutExpired:
+        tmp.unlink(missing_ok=True)
+        print(f"프록시 변환 시간 초과(원본 사용): {settings.proxy_timeout}s")
+        return None
+    os.replace(tmp, dst)
+
+    before, after = src.stat().st_size, dst.stat().st_size
+    print(f"분석용 프록시 생성: '{dst.name}' {before / 1e6:.1f}MB -> {after / 1e6:.1f}MB")
+    return dst
@@ -0,0 +1,256 @@
+# backend/app/uploads.py
+# 이어받기 가능한 청크 업로드: 세션 생성 -> 청크(번호, sha256) 전송 -> 완료
+# 청크는 메모리에서 길이/해시를 검증한 뒤 임시 파일 없이 최종 영상 경로의 해당 오프셋에 바로 기록합니다.
+# 연결이 끊기면 GET /uploads/{id} 의 received 를 보고 빠진 청크만 다시 보내면 됩니다.
+from __future__ import annotations
+import hashlib
+import shutil
+import time
+from datetime import datetime, timedelta
+from pathlib import Path
+from typing import AsyncIterator, Optional
+
+from fastapi import HTTPException
+from sqlalchemy import and_, or_, update
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.orm import Session
+
+from .config import settings
+from . import models
+
+media_root = Path(settings.media_dir)
+
+MIN_CHUNK_SIZE = 1024 * 1024
+MAX_CHUNK_SIZE = 64 * 1024 * 1024
+FINALIZE_STALE_SECONDS = 600   # 완료 처리 중(finalizing) 프로세스가 죽었다고 보고 다시 잡을 수 있는 시간
+FINALIZE_WAIT_SECONDS = 60     # 동시에 들어온 complete 가 먼저 들어온 쪽의 완료를 기다리는 최대 시간
+
+
+def upload_out(db: Session, up: models.Upload) -> dict:
+    received = [
+        idx for (idx,) in db.query(models.UploadChunk.idx)
+        .filter(models.UploadChunk.upload_id == up.id)
+        .order_by(models.UploadChunk.idx.asc())
+    ]
+    return {
+        "id": up.id,
+        "status": up.status,
+        "size": up.size,
+        "chunk_size": up.chunk_size,
+        "total_chunks": up.total_chunks,
+        "received": received,
+        "post_id": up.post_id,
+    }
+
+
+def get_upload(db: Session, upload_id: int, user_id: int) -> models.Upload:
+    up = db.get(models.Upload, upload_id)
+    if not up or up.user_id != user_id:
+        raise HTTPException(status_code=404, detail="upload_not_found")
+    return up
+
+
+def purge_expired(db: Session) -> int:
+    """upload_ttl_hours 동안 완료되지 않은(게시글이 없는) 세션을 작업 폴더와 함께 정리합니다."""
+    cutoff = datetime.utcnow() - timedelta(hours=settings.upload_ttl_hours)
+    stale = db.query(models.Upload).filter(
+        models.Upload.status.in_(("uploading", "finalizing")),
+        models.Upload.post_id.is_(None),
+        models.Upload.updated_at < cutoff,
+    ).all()
+    for up in stale:
+        shutil.rmtree(media_root / Path(up.video_path).parent, ignore_errors=True)
+        db.delete(up)
+    if stale:
+        db.commit()
+    return len(stale)
+
+
+def create_upload(
+    db: Session,
+    user_id: int,
+    filename: str,
+    video_rel: str,
+    size: int,
+    chunk_size: Optional[int] = None,
+    sha256: Optional[str] = None,
+) -> models.Upload:
+    """
+    세션을 만들고 최종 경로에 전체 크기의 파일을 미리 잡아 둡니다.
+    (video_rel 의 작업 폴더는 호출 측에서 이미 만들어 이름을 선점한 상태)
+    """
+    if size <= 0 or size > settings.upload_max_bytes:
+        raise HTTPException(status_code=413 if size > 0 else 400, detail="invalid_size")
+    chunk_size = min(max(chunk_size or settings.upload_chunk_size, MIN_CHUNK_SIZE), MAX_CHUNK_SIZE)
+
+    with open(media_root / video_rel, "wb") as f:
+        f.truncate(size)
+
+    up = models.Upload(
+        user_id=user_id,
+        filename=filename,
+        video_path=video_rel,
+        size=size,
+        chunk_size=chunk_size,
+        total_chunks=(size + chunk_size - 1) // chunk_size,
+        sha256=(sha256 or "").lower() or None,
+    )
+    db.add(up)
+    db.commit()
+    db.refresh(up)
+    return up
+
+
+def _chunk_length(up: models.Upload, idx: int) -> int:
+    if idx == up.total_chunks - 1:
+        return up.size - idx * up.chunk_size
+    return up.chunk_size
+
+
+def check_chunk(up: models.Upload, idx: int) -> int:
+    """청크를 받을 수 있는 세션/번호인지 확인하고, 그 청크의 길이를 반환합니다."""
+    if up.status != "uploading":
+        raise HTTPException(status_code=409, detail="upload_complete")
+    if not 0 <= idx < up.total_chunks:
+        raise HTTPException(status_code=400, detail="invalid_chunk_index")
+    return _chunk_length(up, idx)
+
+
+async def read_chunk(body: AsyncIterator[bytes], expected_len: int) -> bytearray:
+    """
+    청크 본문을 메모리에 받습니다(최대 MAX_CHUNK_SIZE). 이벤트 루프에서는 수신만 하고
+    해시/파일 쓰기/DB 는 write_chunk 를 스레드풀에서 호출해 처리합니다.
+    """
+    buf = bytearray()
+    async for piece in body:
+        buf += piece
+        if len(buf) > expected_len:
+            raise HTTPException(status_code=400, detail="chunk_length_mismatch")
+    if len(buf) != expected_len:
+        raise HTTPException(status_code=400, detail="chunk_length_mismatch")
+    return buf
+
+
+def write_chunk(
+    db: Session,
+    up: models.Upload,
+    idx: int,
+    buf: bytes,
+    expected_sha256: Optional[str] = None,
+) -> None:
+    """
+    read_chunk 로 받은 청크의 해시를 확인한 뒤에만 최종 파일의 idx * chunk_size 위치에 씁니다.
+    길이나 해시가 맞지 않거나 도중에 끊기면 파일은 건드리지 않으므로(400) 클라이언트는 같은 청크를 다시 보내면 됩니다.
+    이미 받은 청크를 다시 보내도(응답 유실 후 재시도) 검증을 통과한 같은 내용으로 덮어쓸 뿐입니다.
+    (블로킹 함수: async 핸들러에서는 run_in_threadpool 로 호출)
+    """
+    if len(buf) != check_chunk(up, idx):
+        raise HTTPException(status_code=400, detail="chunk_length_mismatch")
+    chunk_sha = hashlib.sha256(buf).hexdigest()
+    if expected_sha256 and expected_sha256.lower() != chunk_sha:
+        raise HTTPException(status_code=400, detail="chunk_hash_mismatch")
+
+    with open(media_root / up.video_path, "r+b") as f:
+        f.seek(idx * up.chunk_size)
+        f.write(buf)
+
+    row = db.query(models.UploadChunk).filter_by(upload_id=up.id, idx=idx).first()
+    if row is None:
+        db.add(models.UploadChunk(upload_id=up.id, idx=idx, sha256=chunk_sha))
+    else:
+        row.sha256 = chunk_sha
+    up.updated_at = datetime.utcnow()
+    try:
+        db.commit()
+    except IntegrityError:
+        # 같은 청크가 동시에 두 번 도착한 경우: 먼저 기록된 쪽으로 충분
+        db.rollback()
+
+
+def _file_sha256(path: Path) -> str:
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        while True:
+            chunk = f.read(1024 * 1024)
+            if not chunk:
+                break
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def _finalizable(now: datetime):
+    # 업로드 중이거나, 완료 처리하던 프로세스가 죽어 finalizing 에 멈춘 세션
+    return or_(
+        models.Upload.status == "uploading",
+        and_(
+            models.Upload.status == "finalizing",
+            models.Upload.updated_at < now - timedelta(seconds=FINALIZE_STALE_SECONDS),
+        ),
+    )
+
+
+def finalize(db: Session, up: models.Upload) -> Optional[str]:
+    """
+    모든 청크가 도착했는지 확인하고 조건부 UPDATE 로 세션을 finalizing 으로 선점한 뒤,
+    중복 영상 판정(video_sha256)에 쓰는 전체 해시를 반환합니다.
+    다른 요청이 이미 완료 처리 중이면 None (호출 측은 wait_finalized 로 그 결과를 기다림).
+    complete 로의 전환과 post_id 기록은 게시글 생성과 같은 트랜잭션에서 호출 측이 하고,
+    그 전에 실패하면 release 로 uploading 으로 되돌립니다.
+    """
+    received = db.query(models.UploadChunk).filter(models.UploadChunk.upload_id == up.id).count()
+    if received < up.total_chunks:
+        raise HTTPException(status_code=409, detail="upload_incomplete")
+
+    now = datetime.utcnow()
+    res = db.execute(
+        update(models.Upload)
+        .where(models.Upload.id == up.id, models.Upload.post_id.is_(None), _finalizable(now))
+        .values(status="finalizing", updated_at=now)
+    )
+    db.commit()
+    if res.rowcount != 1:
+        return None
+    db.refresh(up)
+
+    try:
+        full_sha = _file_sha256(media_root / up.video_path)
+    except Exception:
+        release(db, up)
+        raise
+    if up.sha256 and up.sha256 != full_sha:
+        # 청크 해시는 모두 맞았는데 전체가 다르면 클라이언트 쪽 계산 문제: 처음부터 다시 받도록 초기화
+        db.query(models.UploadChunk).filter(models.UploadChunk.upload_id == up.id).delete()
+        db.commit()
+        release(db, up)
+        raise HTTPException(status_code=409, detail="sha256_mismatch")
+    return full_sha
+
+
+def mark_complete(up: models.Upload, post_id: int) -> None:
+    """게시글 생성 트랜잭션 안에서 호출 (commit 은 호출 측)."""
+    up.post_id = post_id
+    up.status = "complete"
+
+
+def release(db: Session, up: models.Upload) -> None:
+    """완료 처리 실패: 게시글이 연결되지 않은 finalizing 세션을 uploading 으로 되돌립니다."""
+    db.rollback()
+    db.execute(
+        update(models.Upload)
+        .where(models.Upload.id == up.id, models.Upload.status == "finalizing", models.Upload.post_id.is_(None))
+        .values(status="uploading", updated_at=datetime.utcnow())
+    )
+    db.commit()
+    db.refresh(up)
+
+
+def wait_finalized(db: Session, up: models.Upload, timeout: float = FINALIZE_WAIT_SECONDS) -> Optional[int]:
+    """다른 요청의 완료 처리를 기다려 게시글 id 를 반환합니다. 실패로 되돌려졌거나 시간이 지나면 None."""
+    deadline = time.monotonic() + timeout
+    while True:
+        db.refresh(up)
+        if up.post_id is not None:
+            return up.post_id
+        if up.status != "finalizing" or time.monotonic() >= deadline:
+            return None
+        time.sleep(0.5)
@@ -0,0 +1,191 @@
+# backend/app/worker.py
+# 작업 워커 진입점: python -m app.worker [--concurrency N] [--summary-concurrency M]
+# 영상 처리(kind="video")와 소개문 생성(kind="summary")을 서로 다른 슬롯에서 실행합니다.
+# API 프로세스와 같은 DB(jobs 테이블)를 바라보며, API 레플리카와 별개로 수를 늘릴 수 있습니다.
+import argparse
+import json
+import logging
+import os
+import socket
+import threading
+import time
+import traceback
+
+from .config import settings
+from .database import Base, engine, SessionLocal
+from . import models, jobs
+from .pipeline import process_video_job
+from .summary import generate_summary
+
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger("board.worker")
+
+
+def _set_post_status(post_id: int, status: str):
+    db = SessionLocal()
+    try:
+        post = db.get(models.Post, post_id)
+        if post:
+            post.status = status
+            db.commit()
+    finally:
+        db.close()
+
+
+def _recover(db):
+    requeued, failed_posts = jobs.recover_orphaned_jobs(db)
+    for post_id in failed_posts:
+        _set_post_status(post_id, "error")
+    if requeued or failed_posts:
+        logger.info("고아 작업 정리 | requeued=%s failed=%s", requeued, len(failed_posts))
+
+
+def _heartbeat_loop(job_id: int, worker_id: str, stop: threading.Event, lost: threading.Event):
+    interval = max(1.0, settings.job_lease_seconds / 3)
+    db = SessionLocal()
+    try:
+        while not stop.wait(interval):
+            try:
+                if not jobs.heartbeat(db, job_id, worker_id):
+                    logger.warning("lease 상실 | job_id=%s worker=%s", job_id, worker_id)
+                    lost.set()
+                    return
+            except Exception as e:
+                logger.warning("heartbeat 실패 | job_id=%s err=%s", job_id, e)
+                db.rollback()
+    finally:
+        db.close()
+
+
+def _run_summary_job(job: models.Job, worker_id: str, lost: threading.Event) -> tuple[bool, str | None]:
+    payload = json.loads(job.payload or "{}")
+    db = SessionLocal()
+    try:
+        post = db.get(models.Post, job.post_id)
+        if not post:
+            return False, "post_not_found"
+        text = generate_summary(db, post, force=bool(payload.get("force")))
+        return (True, None) if text is not None else (False, "summary_generation_failed")
+    finally:
+        db.close()
+
+
+def _run_video_job(job: models.Job, worker_id: str, lost: threading.Event) -> tuple[bool, str | None]:
+    payload = json.loads(job.payload or "{}")
+    # lease 를 잃으면 다음 단계를 시작하지 않고, 게시글 기록은 lease 확인과 같은 트랜잭션으로만 커밋
+    process_video_job(
+        job.post_id, payload["video_rel"], payload["log_rel"],
+        cancel=lost,
+        fence=lambda db: jobs.hold_lease(db, job.id, worker_id),
+    )
+
+    # process_video_job 은 예외를 삼키고 post.status 로 결과를 남깁니다.
+    db = SessionLocal()
+    try:
+        post = db.get(models.Post, job.post_id)
+        ok = bool(post and post.status == "done")
+        return ok, None if ok else f"post_status={post.status if post else None}"
+    finally:
+        db.close()
+
+
+_RUNNERS = {
+    "video": _run_video_job,
+    "summary": _run_summary_job,
+}
+
+
+def _run_job(job: models.Job, worker_id: str) -> tuple[bool, str | None]:
+    runner = _RUNNERS.get(job.kind)
+    if runner is None:
+        return False, f"unknown_job_kind: {job.kind}"
+
+    stop, lost = threading.Event(), threading.Event()
+    hb = threading.Thread(target=_heartbeat_loop, args=(job.id, worker_id, stop, lost), daemon=True)
+    hb.start()
+    try:
+        return runner(job, worker_id, lost)
+    except Exception:
+        return False, traceback.format_exc()
+    finally:
+        stop.set()
+        hb.join()
+
+
+def _slot_loop(slot: str, kinds: tuple[str, ...], stop: threading.Event):
+    worker_id = f"{socket.gethostname()}:{os.getpid()}:{slot}"
+    db = SessionLocal()
+    try:
+        while not stop.is_set():
+            try:
+                job = jobs.claim_next_job(db, worker_id, kinds)
+            except Exception as e:
+                logger.warning("작업 획득 실패 | worker=%s err=%s", worker_id, e)
+                db.rollback()
+                job = None
+            if job is None:
+                stop.wait(settings.job_poll_interval)
+                continue
+
+            logger.info("작업 시작 | job_id=%s post_id=%s attempt=%s/%s worker=%s",
+                        job.id, job.post_id, job.attempts, job.max_attempts, worker_id)
+            ok, err = _run_job(job, worker_id)
+            db.refresh(job)
+            final = jobs.finish_job(db, job, worker_id, ok, err)
+            if final is None:
+                # lease 만료로 다른 워커가 이미 가져간 작업: 그쪽 결과를 덮어쓰지 않음
+                logger.warning("작업 결과 폐기(lease 상실) | job_id=%s worker=%s", job.id, worker_id)
+                continue
+            if job.kind == "video":
+                if final == "queued":
+                    _set_post_status(job.post_id, "processing")
+                elif final == "failed":
+                    _set_post_status(job.post_id, "error")
+            logger.info("작업 종료 | job_id=%s status=%s", job.id, final)
+    finally:
+        db.close()
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Market3D job worker (video processing, summaries)")
+    parser.add_argument("--concurrency", type=int, default=settings.worker_concurrency,
+                        help="동시에 실행할 영상 작업 수")
+    parser.add_argument("--summary-concurrency", type=int, default=settings.summary_concurrency,
+                        help="동시에 실행할 소개문 생성 작업 수 (영상 작업 뒤에 밀리지 않도록 별도 슬롯)")
+    args = parser.parse_args(argv)
+
+    Base.metadata.create_all(bind=engine)
+    db = SessionLocal()
+    try:
+        _recover(db)
+    finally:
+        db.close()
+
+    stop = threading.Event()
+    slots = [(f"video-{i}", ("video",)) for i in range(max(1, args.concurrency))]
+    slots += [(f"summary-{i}", ("summary",)) for i in range(max(0, args.summary_concurrency))]
+    threads = [
+        threading.Thread(target=_slot_loop, args=(name, kinds, stop), name=f"worker-{name}", daemon=True)
+        for name, kinds in slots
+    ]
+    for t in threads:
+        t.start()
+    logger.info("워커 시작 | video=%s summary=%s", args.concurrency, args.summary_concurrency)
+
+    try:
+        while any(t.is_alive() for t in threads):
+            time.sleep(settings.job_lease_seconds)
+            db = SessionLocal()
+            try:
+                _recover(db)
+            finally:
+                db.close()
+    except KeyboardInterrupt:
+        logger.info("종료 요청 수신, 실행 중인 작업이 끝나면 종료합니다.")
+        stop.set()
+        for t in threads:
+            t.join()
+
+
+if __name__ == "__main__":
+    main()
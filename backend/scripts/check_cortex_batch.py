@@ -0,0 +1,77 @@
+# backend/scripts/check_cortex_batch.py
+# Snowflake 없이 일괄 생성(cortex_complete_many)을 확인하기 위한 가짜 커넥션/커서 (런타임 패키지 app 밖의 개발용 스크립트)
+# 실행: cd backend && python -m scripts.check_cortex_batch
+#   (청크 분할, 모델 폴백, 결과 행 -> post_id 매핑, VALUES 바인드 파라미터 개수를 검사)
+from __future__ import annotations
+import re
+from typing import Optional
+
+_VALUES_RE = re.compile(r"FROM \(VALUES ((?:\(%s, %s\)(?:, )?)+)\) AS v\(ID, PROMPT\)")
+
+
+class FakeCursor:
+    def __init__(self, conn: "FakeConnection"):
+        self.conn = conn
+        self._rows: list[tuple] = []
+
+    def execute(self, sql: str, params=None, timeout: Optional[int] = None):
+        m = _VALUES_RE.search(sql)
+        if not m or sql.count("%s") != len(params or ()):
+            raise ValueError(f"바인드 파라미터 불일치: placeholders={sql.count('%s')} params={len(params or ())}")
+        model, flat = params[0], list(params[1:])
+        pairs = list(zip(flat[0::2], flat[1::2]))
+        self.conn.calls.append((model, [pid for pid, _ in pairs]))
+        if model in self.conn.fail_models:
+            raise RuntimeError(f"stub: {model} 호출 실패")
+        nulls = self.conn.null_ids.get(model, set())
+        # 실제 Snowflake 처럼 결과 행 순서는 입력 순서를 보장하지 않음
+        self._rows = [
+            (pid, None if pid in nulls else f"[{model}] {prompt}")
+            for pid, prompt in reversed(pairs)
+        ]
+
+    def fetchall(self) -> list[tuple]:
+        return self._rows
+
+    def close(self):
+        pass
+
+
+class FakeConnection:
+    """
+    fail_models: 문장 전체가 실패하는 모델
+    null_ids: {모델: 해당 모델에서 NULL 을 돌려줄 post_id 집합}
+    calls: 실행된 (모델, [post_id...]) 기록
+    """
+    def __init__(self, fail_models: tuple[str, ...] = (), null_ids: Optional[dict[str, set[int]]] = None):
+        self.fail_models = set(fail_models)
+        self.null_ids = null_ids or {}
+        self.calls: list[tuple[str, list[int]]] = []
+
+    def cursor(self) -> FakeCursor:
+        return FakeCursor(self)
+
+
+def main():
+    from app.summary import cortex_complete_many
+
+    prompts = {pid: f"prompt-{pid}" for pid in range(101, 108)}
+
+    # 1) 첫 모델 성공: 3개씩 청크 -> 3번 호출, 모든 post_id 가 자기 프롬프트와 매핑
+    conn = FakeConnection()
+    out = cortex_complete_many(prompts, ["m1", "m2"], conn=conn, batch_size=3)
+    assert [len(ids) for _, ids in conn.calls] == [3, 3, 1], conn.calls
+    assert out == {pid: f"[m1] {p}" for pid, p in prompts.items()}, out
+
+    # 2) 일부 NULL + 모델 전체 실패: m1 의 NULL 항목만 m2 로, m2 가 실패하면 m3 로
+    conn = FakeConnection(fail_models=("m2",), null_ids={"m1": {102, 106}, "m3": {106}})
+    out = cortex_complete_many(prompts, ["m1", "m2", "m3"], conn=conn, batch_size=3)
+    assert conn.calls[3:] == [("m2", [102, 106]), ("m3", [102, 106])], conn.calls
+    assert out[102] == "[m3] prompt-102" and 106 not in out, out
+    assert all(out[pid] == f"[m1] prompt-{pid}" for pid in prompts if pid not in (102, 106))
+
+    print("cortex_complete_many 스텁 확인 완료: 청크 분할 / 모델 폴백 / post_id 매핑")
+
+
+if __name__ == "__main__":
+    main()
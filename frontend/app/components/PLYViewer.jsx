@@ -5,7 +5,78 @@ import * as THREE from "three";
 import { OrbitControls } from "three/examples/jsm/controls/OrbitControls.js";
 import { PLYLoader } from "three/examples/jsm/loaders/PLYLoader.js";
 
-export default function PlyViewer({ plyUrl, trajUrl, pointsUrl, height = "100vh" }) {
+// LOD 로딩 시 한 번에 올릴 최대 포인트 수 / 동시 요청 수
+const LOD_POINT_BUDGET = 3_000_000;
+const LOD_CONCURRENCY = 4;
+
+// 백엔드 products.encode_anchors 형식: 16바이트 헤더 + float32 xyz + "\0" 구분 문자열(name, price 반복)
+function decodeAnchors(buf) {
+  const view = new DataView(buf);
+  const magic = String.fromCharCode(...new Uint8Array(buf, 0, 4));
+  if (magic !== "ANCH") throw new Error("invalid anchors file");
+  const count = view.getUint32(8, true);
+  const stringsLen = view.getUint32(12, true);
+  const xyz = new Float32Array(buf.slice(16, 16 + count * 12));
+  const strings = new TextDecoder().decode(new Uint8Array(buf, 16 + count * 12, stringsLen)).split("\0");
+  const anchors = [];
+  for (let i = 0; i < count; i++) {
+    anchors.push({
+      xyz: [xyz[i * 3], xyz[i * 3 + 1], xyz[i * 3 + 2]],
+      name: strings[i * 2] ?? "",
+      price: strings[i * 2 + 1] ?? ""
+    });
+  }
+  return anchors;
+}
+
+// 백엔드 pointcloud.encode_qpc 형식: 36바이트 헤더 + [u32 길이 + deflate] 블록(position, color)
+async function inflate(bytes) {
+  const stream = new Blob([bytes]).stream().pipeThrough(new DecompressionStream("deflate"));
+  return new Uint8Array(await new Response(stream).arrayBuffer());
+}
+
+async function decodeQPC(buf) {
+  const view = new DataView(buf);
+  const magic = String.fromCharCode(...new Uint8Array(buf, 0, 4));
+  if (magic !== "QPC1") throw new Error("invalid qpc file");
+  const n = view.getUint32(4, true);
+  const hasColor = (view.getUint8(8) & 1) === 1;
+  const min = [0, 1, 2].map((i) => view.getFloat32(12 + i * 4, true));
+  const scale = [0, 1, 2].map((i) => view.getFloat32(24 + i * 4, true));
+
+  let offset = 36;
+  const nextBlock = () => {
+    const len = view.getUint32(offset, true);
+    const bytes = new Uint8Array(buf, offset + 4, len);
+    offset += 4 + len;
+    return inflate(bytes);
+  };
+
+  // 축별로 [하위 바이트 n개][상위 바이트 n개]
+  const planes = await nextBlock();
+  const position = new Float32Array(n * 3);
+  for (let a = 0; a < 3; a++) {
+    const lo = a * 2 * n;
+    const hi = lo + n;
+    for (let i = 0; i < n; i++) {
+      position[i * 3 + a] = min[a] + (planes[lo + i] | (planes[hi + i] << 8)) * scale[a];
+    }
+  }
+  const geometry = new THREE.BufferGeometry();
+  geometry.setAttribute("position", new THREE.BufferAttribute(position, 3));
+
+  if (hasColor) {
+    const rgbPlanes = await nextBlock();
+    const color = new Uint8Array(n * 3);
+    for (let a = 0; a < 3; a++) {
+      for (let i = 0; i < n; i++) color[i * 3 + a] = rgbPlanes[a * n + i];
+    }
+    geometry.setAttribute("color", new THREE.BufferAttribute(color, 3, true));
+  }
+  return geometry;
+}
+
+export default function PlyViewer({ plyUrl, lodUrl, trajUrl, pointsUrl, anchorsUrl, height = "100vh" }) {
   const containerRef = useRef(null);
   const [loading, setLoading] = useState(false);
   const uiScaleRef = useRef(0.5); // marker 크기 내부 스케일
@@ -54,6 +125,7 @@ export default function PlyViewer({ plyUrl, trajUrl, pointsUrl, height = "100vh"
     let glowPoints = null;
     let bboxDiag = 0;
     let coordsArray = null;
+    let disposed = false;
 
     function fitTo(obj) {
       const box = new THREE.Box3().setFromObject(obj);
@@ -100,7 +172,8 @@ export default function PlyViewer({ plyUrl, trajUrl, pointsUrl, height = "100vh"
     async function loadPLYFromUrl(url) {
       setLoading(true);
       try {
-        const r = await fetch(url, { cache: "no-store" });
+        // ?v= 버전 URL 이라 브라우저 캐시를 그대로 사용 (다시 볼 때 요청 없음)
+        const r = await fetch(url);
         const buf = await r.arrayBuffer();
         loadPLYFromArrayBuffer(buf);
       } finally {
@@ -108,6 +181,80 @@ export default function PlyViewer({ plyUrl, trajUrl, pointsUrl, height = "100vh"
       }
     }
 
+    // LOD: manifest 의 루트 노드만 먼저 그리고, 화면에 크게 보이는 노드부터 백그라운드로 채움
+    async function loadLODFromUrl(url) {
+      setLoading(true);
+      const manifestUrl = new URL(url, window.location.href);
+      let manifest;
+      let material;
+      let group;
+      let root;
+      try {
+        // 타일 URL 에 내용 해시가 들어 있어 브라우저 캐시를 그대로 사용
+        manifest = await (await fetch(manifestUrl)).json();
+        material = new THREE.PointsMaterial({ size: 0.02, vertexColors: !!manifest.has_color });
+        if (!manifest.has_color) material.color.set(0x00ff00);
+
+        group = new THREE.Group();
+        if (pointCloud) world.remove(pointCloud);
+        pointCloud = group;
+        world.add(group);
+
+        root = manifest.nodes.find((n) => n.id === manifest.root);
+        await loadNode(root);
+        fitTo(group);
+        if (coordsArray?.length) drawMarkers(coordsArray, true);
+      } finally {
+        setLoading(false);
+      }
+
+      const byId = new Map(manifest.nodes.map((n) => [n.id, n]));
+      let loadedPoints = root.points;
+
+      async function loadNode(node) {
+        const r = await fetch(new URL(node.file, manifestUrl));
+        const buf = await r.arrayBuffer();
+        const geometry = manifest.format === "qpc" ? await decodeQPC(buf) : plyLoader.parse(buf);
+        if (disposed) {
+          geometry.dispose();
+          return;
+        }
+        group.add(new THREE.Points(geometry, material));
+      }
+
+      const pending = root.children.map((id) => byId.get(id));
+      const center = new THREE.Vector3();
+      const priority = (n) => {
+        center.set(n.min[0] + n.size / 2, n.min[1] + n.size / 2, n.min[2] + n.size / 2);
+        world.localToWorld(center);
+        return n.size / Math.max(center.distanceTo(camera.position), 1e-3);
+      };
+
+      let inFlight = 0;
+      const refine = async () => {
+        while (!disposed && loadedPoints < LOD_POINT_BUDGET && (pending.length || inFlight)) {
+          if (!pending.length) {
+            await new Promise((res) => setTimeout(res, 50));
+            continue;
+          }
+          let best = 0;
+          for (let i = 1; i < pending.length; i++) {
+            if (priority(pending[i]) > priority(pending[best])) best = i;
+          }
+          const [node] = pending.splice(best, 1);
+          loadedPoints += node.points;
+          inFlight++;
+          try {
+            await loadNode(node);
+            pending.push(...node.children.map((id) => byId.get(id)));
+          } finally {
+            inFlight--;
+          }
+        }
+      };
+      Promise.all(Array.from({ length: LOD_CONCURRENCY }, refine)).catch((e) => console.error(e));
+    }
+
     function parseCoordsText(text) {
       try {
         const j = JSON.parse(text);
@@ -267,7 +414,8 @@ export default function PlyViewer({ plyUrl, trajUrl, pointsUrl, height = "100vh"
     async function loadPointsFromUrl(url) {
       setLoading(true);
       try {
-        const r = await fetch(url, { cache: "no-store" });
+        // ?v= 버전 URL 이라 브라우저 캐시를 그대로 사용 (다시 볼 때 요청 없음)
+        const r = await fetch(url);
         const text = await r.text();
         const arr = parseCoordsText(text);
         drawMarkers(arr);
@@ -276,11 +424,34 @@ export default function PlyViewer({ plyUrl, trajUrl, pointsUrl, height = "100vh"
       }
     }
 
+    async function loadAnchorsFromUrl(url) {
+      // URL 에 내용 해시가 들어 있어 브라우저 캐시를 그대로 사용
+      const r = await fetch(url);
+      if (!r.ok) throw new Error(`anchors ${r.status}`);
+      const anchors = decodeAnchors(await r.arrayBuffer());
+      drawMarkers(anchors.map((a) => a.xyz).filter((v) => v.every(Number.isFinite)));
+    }
+
     (async () => {
       try {
-        if (plyUrl) await loadPLYFromUrl(plyUrl);
+        if (lodUrl) {
+          try {
+            await loadLODFromUrl(lodUrl);
+          } catch (e) {
+            // LOD 를 못 받으면 PLY 전체로 표시
+            console.error(e);
+            if (plyUrl) await loadPLYFromUrl(plyUrl);
+          }
+        } else if (plyUrl) await loadPLYFromUrl(plyUrl);
         // 궤적 비활성화: trajUrl 무시
-        if (pointsUrl) await loadPointsFromUrl(pointsUrl);
+        if (anchorsUrl) {
+          try {
+            await loadAnchorsFromUrl(anchorsUrl);
+          } catch (e) {
+            console.error(e);
+            if (pointsUrl) await loadPointsFromUrl(pointsUrl);
+          }
+        } else if (pointsUrl) await loadPointsFromUrl(pointsUrl);
       } catch (e) {
         console.error(e);
       }
@@ -308,6 +479,7 @@ export default function PlyViewer({ plyUrl, trajUrl, pointsUrl, height = "100vh"
     window.addEventListener("resize", onResize);
 
     return () => {
+      disposed = true;
       cancelAnimationFrame(raf);
       window.removeEventListener("resize", onResize);
       controls.dispose();
@@ -319,7 +491,7 @@ export default function PlyViewer({ plyUrl, trajUrl, pointsUrl, height = "100vh"
         mats.forEach((m) => m?.dispose?.());
       });
     };
-  }, [plyUrl, pointsUrl]);
+  }, [plyUrl, lodUrl, pointsUrl, anchorsUrl]);
 
   return (
     <div style={{ position: "relative", width: "100%", height }}>
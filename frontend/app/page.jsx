@@ -1,54 +1,67 @@
 "use client";
 
-import { useEffect, useMemo, useState } from "react";
+import { useCallback, useEffect, useMemo, useState } from "react";
 import Link from "next/link";
 import "./page.css";
 
 const BURL = process.env.NEXT_PUBLIC_BACKEND_URL;
+const PAGE_SIZE = 30;
 
 export default function Home() {
   const [state, setState] = useState({
     loading: true,
     error: null,
     posts: [],
+    nextBefore: null,
   });
   const [q, setQ] = useState("");
 
-  useEffect(() => {
-    const run = async () => {
-      if (!BURL) console.warn("NEXT_PUBLIC_BACKEND_URL is not defined");
-      try {
-        const res = await fetch(`${BURL}/posts`, {
-          cache: "no-store",
-          headers: { Accept: "application/json" },
-        });
-        if (!res.ok) {
-          const text = await res.text().catch(() => "");
-          throw new Error(`GET /posts ${res.status} ${text?.slice(0, 200)}`);
-        }
-        const data = await res.json();
-        if (!Array.isArray(data)) {
-          setState({
-            loading: false,
-            error: "목록 응답 형식이 올바르지 않습니다.",
-            posts: [],
-          });
-          return;
-        }
-        setState({ loading: false, error: null, posts: data });
-      } catch (err) {
-        console.error("Failed to fetch /posts:", err);
-        setState({
+  // keyset 페이지네이션: before 커서가 없으면 첫 페이지
+  const loadPage = useCallback(async (before) => {
+    if (!BURL) console.warn("NEXT_PUBLIC_BACKEND_URL is not defined");
+    setState((s) => ({ ...s, loading: true }));
+    try {
+      const params = new URLSearchParams({ limit: String(PAGE_SIZE), include: "ai_summary" });
+      if (before) params.set("before", String(before));
+      const res = await fetch(`${BURL}/posts?${params}`, {
+        cache: "no-store",
+        headers: { Accept: "application/json" },
+      });
+      if (!res.ok) {
+        const text = await res.text().catch(() => "");
+        throw new Error(`GET /posts ${res.status} ${text?.slice(0, 200)}`);
+      }
+      const data = await res.json();
+      if (!Array.isArray(data)) {
+        setState((s) => ({
+          ...s,
           loading: false,
-          error: "목록을 불러오지 못했습니다. 서버가 켜져 있는지 확인하세요.",
-          posts: [],
-        });
+          error: "목록 응답 형식이 올바르지 않습니다.",
+        }));
+        return;
       }
-    };
-    run();
+      const nextBefore = res.headers.get("X-Next-Before");
+      setState((s) => ({
+        loading: false,
+        error: null,
+        posts: before ? [...s.posts, ...data] : data,
+        nextBefore: nextBefore ? Number(nextBefore) : null,
+      }));
+    } catch (err) {
+      console.error("Failed to fetch /posts:", err);
+      setState((s) => ({
+        ...s,
+        loading: false,
+        error: "목록을 불러오지 못했습니다. 서버가 켜져 있는지 확인하세요.",
+      }));
+    }
   }, []);
 
-  const { loading, error, posts } = state;
+  useEffect(() => {
+    loadPage(null);
+  }, [loadPage]);
+
+  const { loading, error, posts, nextBefore } = state;
 
   const filtered = useMemo(() => {
     const term = q.trim().toLowerCase();
@@ -117,6 +130,12 @@ export default function Home() {
           );
         })}
       </ul>
+
+      {!loading && !error && nextBefore && (
+        <button className="MoreBtn" onClick={() => loadPage(nextBefore)}>
+          더 보기
+        </button>
+      )}
     </main>
   );
 }
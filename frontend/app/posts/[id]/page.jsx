@@ -1,6 +1,6 @@
 "use client";
 
-import { useEffect, useState } from "react";
+import { useEffect, useRef, useState } from "react";
 import { useSession } from "next-auth/react";
 import dynamic from "next/dynamic";
 import "./page.css";
@@ -11,6 +11,18 @@ const BURL = process.env.NEXT_PUBLIC_BACKEND_URL;
 const PlyViewer = dynamic(() => import("../../components/PLYViewer.jsx"), { ssr: false });
 const ReactMarkdown = dynamic(() => import("react-markdown").then(m => m.default), { ssr: false });
 
+// 소개문 생성 상태 폴링: 1초부터 1.5배씩 늘려 최대 10초 간격, 3분 또는 40회를 넘기면 중단
+const SUMMARY_POLL_DEADLINE_MS = 180_000;
+const SUMMARY_POLL_MAX_ATTEMPTS = 40;
+const SUMMARY_POLL_MAX_DELAY_MS = 10_000;
+
+const sleep = (ms, signal) =>
+  new Promise((res, rej) => {
+    if (signal.aborted) return rej(new DOMException("aborted", "AbortError"));
+    const t = setTimeout(res, ms);
+    signal.addEventListener("abort", () => { clearTimeout(t); rej(new DOMException("aborted", "AbortError")); }, { once: true });
+  });
+
 const toInt = (v) => (v === "1" ? 1 : v === "-1" ? -1 : 0);
 
 function StatLine({ label, data }) {
@@ -68,6 +80,10 @@ export default function PostDetail({ params }) {
   const [genNote, setGenNote] = useState("");
   const [form, setForm] = useState({ kindness: 0, price: 0, variety: 0 });
   const [hovered, setHovered] = useState(-1);
+  const summaryPollRef = useRef(null);
+
+  // 페이지를 떠나면 진행 중인 소개문 상태 폴링 중단
+  useEffect(() => () => summaryPollRef.current?.abort(), []);
 
   useEffect(() => {
     const init = async () => {
@@ -109,19 +125,48 @@ export default function PostDetail({ params }) {
   };
 
   const genSummary = async () => {
+    summaryPollRef.current?.abort();
+    const ctrl = new AbortController();
+    summaryPollRef.current = ctrl;
     try {
-      setGenNote("소개문 생성 중…");
-      const r = await fetch(`${BURL}/posts/${id}/summary`, { method: "POST" });
+      setGenNote("소개문 생성 요청 중…");
+      const r = await fetch(`${BURL}/posts/${id}/summary`, { method: "POST", signal: ctrl.signal });
       if (!r.ok) {
         const e = await r.json().catch(() => ({}));
         throw new Error(e.detail || "gen_failed");
       }
-      const data = await r.json();
-      const summary = data.text ?? data.ai_summary ?? data.summary ?? data.message ?? "";
-      setPost((p) => ({ ...p, ai_summary: summary }));
-      setGenNote(summary ? "완료!" : "완료 — 내용 없음");
+      const first = await r.json();
+      if (first.cached) {
+        // 가게 정보/리뷰가 그대로라 기존 소개문을 그대로 사용
+        setPost((p) => ({ ...p, ai_summary: first.text ?? first.ai_summary ?? "" }));
+        setGenNote("최신 상태입니다.");
+        return;
+      }
+      setGenNote("소개문 생성 중…");
+
+      // 생성은 워커에서 비동기로 진행되므로 완료될 때까지 상태를 폴링 (워커가 없거나 작업이 멈추면 제한에서 중단)
+      const deadline = Date.now() + SUMMARY_POLL_DEADLINE_MS;
+      let delay = 1000;
+      for (let attempt = 0; attempt < SUMMARY_POLL_MAX_ATTEMPTS && Date.now() < deadline; attempt++) {
+        await sleep(delay, ctrl.signal);
+        delay = Math.min(delay * 1.5, SUMMARY_POLL_MAX_DELAY_MS);
+        const s = await fetch(`${BURL}/posts/${id}/summary/status`, { cache: "no-store", signal: ctrl.signal });
+        if (!s.ok) throw new Error("status_failed");
+        const data = await s.json();
+        if (data.status === "done") {
+          const summary = data.text ?? data.ai_summary ?? "";
+          setPost((p) => ({ ...p, ai_summary: summary }));
+          setGenNote(summary ? "완료!" : "완료 — 내용 없음");
+          return;
+        }
+        if (data.status === "failed") throw new Error("gen_failed");
+      }
+      setGenNote("생성이 지연되고 있습니다. 잠시 후 다시 시도해 주세요.");
     } catch (e) {
+      if (e.name === "AbortError") return;
       setGenNote(`에러: ${e.message}`);
+    } finally {
+      if (summaryPollRef.current === ctrl) summaryPollRef.current = null;
     }
   };
 
@@ -130,6 +175,8 @@ export default function PostDetail({ params }) {
   const plyUrl = post.ply_url ? `${BURL}${post.ply_url}` : null;
   const trajUrl = post.traj_url ? `${BURL}${post.traj_url}` : null;
   const pointsUrl = post.points_url ? `${BURL}${post.points_url}` : null;
+  const lodUrl = post.lod_url ? `${BURL}${post.lod_url}` : null;
+  const anchorsUrl = post.anchors_url ? `${BURL}${post.anchors_url}` : null;
 
   const isBuyer = me?.role === "BUYER";
   const stats = post?.review_stats ?? null;
@@ -170,7 +217,7 @@ export default function PostDetail({ params }) {
         </section>
 
         <div style={{ minHeight: "70vh", marginTop: 16 }}>
-          <PlyViewer plyUrl={plyUrl} trajUrl={trajUrl} pointsUrl={pointsUrl} height="78vh" />
+          <PlyViewer plyUrl={plyUrl} lodUrl={lodUrl} trajUrl={trajUrl} pointsUrl={pointsUrl} anchorsUrl={anchorsUrl} height="78vh" />
         </div>
       </div>
 
@@ -3,6 +3,77 @@ import { useSession } from "next-auth/react";
 import { useEffect, useRef, useState } from "react";
 
 const BURL = process.env.NEXT_PUBLIC_BACKEND_URL;
+const CHUNK_RETRIES = 5;
+
+// 같은 파일을 다시 고르면 이전 업로드 세션을 이어받기 위한 키
+const uploadKey = (file) => `upload:${file.name}:${file.size}:${file.lastModified}`;
+
+async function sha256Hex(buf) {
+  // crypto.subtle 은 보안 컨텍스트(https/localhost)에서만 있음: 없으면 서버는 길이만 검증
+  if (!globalThis.crypto?.subtle) return null;
+  const h = await crypto.subtle.digest("SHA-256", buf);
+  return Array.from(new Uint8Array(h), (b) => b.toString(16).padStart(2, "0")).join("");
+}
+
+async function api(path, idt, init = {}) {
+  const r = await fetch(`${BURL}${path}`, {
+    ...init,
+    headers: { Authorization: `Bearer ${idt}`, ...(init.headers || {}) },
+  });
+  const text = await r.text();
+  if (!r.ok) {
+    const err = new Error(text || `HTTP ${r.status}`);
+    err.status = r.status;
+    throw err;
+  }
+  return JSON.parse(text || "{}");
+}
+
+// 청크 업로드: 끊겨도 받은 청크는 서버에 남아 있으므로 빠진 청크만 다시 보냄
+async function uploadVideo(file, idt, onProgress) {
+  const key = uploadKey(file);
+  let session = null;
+  const saved = localStorage.getItem(key);
+  if (saved) {
+    session = await api(`/uploads/${saved}`, idt).catch(() => null);
+    if (session?.post_id) session = null; // 이미 게시된 세션이면 새로 시작
+  }
+  if (!session || session.status !== "uploading") {
+    session = await api("/uploads/video", idt, {
+      method: "POST",
+      headers: { "Content-Type": "application/json" },
+      body: JSON.stringify({ filename: file.name, size: file.size }),
+    });
+    localStorage.setItem(key, String(session.id));
+  }
+
+  const received = new Set(session.received);
+  let done = received.size;
+  onProgress(done, session.total_chunks);
+  for (let i = 0; i < session.total_chunks; i++) {
+    if (received.has(i)) continue;
+    const buf = await file.slice(i * session.chunk_size, (i + 1) * session.chunk_size).arrayBuffer();
+    const hash = await sha256Hex(buf);
+    for (let attempt = 1; ; attempt++) {
+      try {
+        await api(`/uploads/${session.id}/chunks/${i}`, idt, {
+          method: "PUT",
+          headers: hash ? { "X-Chunk-Sha256": hash } : {},
+          body: buf,
+        });
+        break;
+      } catch (e) {
+        if (attempt >= CHUNK_RETRIES || (e.status && e.status !== 400 && e.status < 500)) throw e;
+        await new Promise((res) => setTimeout(res, 1000 * 2 ** (attempt - 1)));
+      }
+    }
+    onProgress(++done, session.total_chunks);
+  }
+
+  const post = await api(`/uploads/${session.id}/complete`, idt, { method: "POST" });
+  localStorage.removeItem(key);
+  return post;
+}
 
 export default function NewPostPage() {
   const { status, data } = useSession();
@@ -44,7 +115,8 @@ export default function NewPostPage() {
     const fetchLog = async () => {
       try {
         if (!logUrl) return;
-        const r = await fetch(logUrl, { cache: "no-store" });
+        // 서버가 ETag 로 재검증하므로 로그가 그대로면 304
+        const r = await fetch(logUrl, { cache: "no-cache" });
         if (r.ok) {
           const t = await r.text();
           setLogText(t);
@@ -81,18 +153,12 @@ export default function NewPostPage() {
     if (!video) return alert("MP4 파일을 선택하세요.");
     setBusy(true);
     setLogText("업로드 시작…");
-    setStatusText("processing");
+    setStatusText("uploading");
     try {
-      const fd = new FormData();
-      fd.append("video", video);
-      const r = await fetch(`${BURL}/posts/video`, {
-        method: "POST",
-        headers: { Authorization: `Bearer ${idt}` },
-        body: fd,
-      });
-      const text = await r.text();
-      if (!r.ok) throw new Error(text || `HTTP ${r.status}`);
-      const j = JSON.parse(text || "{}");
+      const j = await uploadVideo(video, idt, (done, total) =>
+        setLogText(`업로드 중… ${Math.round((done / total) * 100)}% (${done}/${total} 청크)`)
+      );
+      setStatusText(j?.status || "processing");
       setPostId(j?.id);
       if (j?.log_url) setLogUrl(`${BURL}${j.log_url}`);
       setLogText((prev) => prev + "\n서버 처리 대기/진행 중…");
@@ -115,7 +181,7 @@ export default function NewPostPage() {
           required
         />
         <button type="submit" disabled={busy}>
-          {busy ? (statusText === "processing" ? "처리 중…" : "업로드 중…") : "등록"}
+          {busy ? (statusText === "uploading" ? "업로드 중…" : "처리 중…") : "등록"}
         </button>
       </form>
       {!!postId && (
@@ -1,66 +1,438 @@
 import os
+import sys
+import shutil
+import importlib.util
 import uuid
+import hashlib
+import sqlite3
+import argparse
 import subprocess
 import zipfile
-import io
-from flask import Flask, request, jsonify, send_file
-from multiprocessing import Process, Queue, Manager
+import time
+import threading
+from contextlib import closing, redirect_stdout, redirect_stderr
+from flask import Flask, request, jsonify, send_file, send_from_directory, abort
+from multiprocessing import Process, Manager
 
 # --- 설정 (기존과 동일) ---
 UPLOAD_FOLDER = 'uploads'
 LOGS_FOLDER = 'logs'
 CONFIG_FILE = 'config/base.yaml'
+JOBS_DB = os.path.join(LOGS_FOLDER, 'jobs.sqlite3')   # 작업 상태 저장소 (재시작해도 유지)
+WORKER_POLL_INTERVAL = 1.0                            # 빈 큐 확인 주기(초)
+ETA_SAMPLE_SIZE = 20                                  # ETA 계산에 쓰는 최근 완료 작업 수
+NUM_WORKERS = 1                                       # 재구성 워커 프로세스 수 (실행 시 --workers 로 지정)
+JOB_LEASE_SECONDS = 120                               # 처리 중 작업의 lease. 워커가 이 시간 동안 heartbeat 가 없으면 다른 워커가 회수
+HEARTBEAT_INTERVAL = 30                               # 처리 중 lease 연장 주기(초)
+SUPERVISE_INTERVAL = 5.0                              # 죽은 워커 프로세스 확인 주기(초)
+# 기본은 작업마다 'python main.py' 서브프로세스로 재구성합니다. (MASt3R-SLAM 의 main.py 는
+# __main__ 에서 spawn 시작 방식을 지정하고 자체 백엔드 프로세스를 띄우므로 워커 안에서 스크립트째 실행할 수 없음)
+# RECON_IN_PROCESS=1 이면 main.py 를 모듈로 한 번 import 해 RECON_ENTRY_POINT 함수(argv 리스트를 받음)를
+# 작업마다 호출합니다(torch 등 import 비용을 작업마다 다시 내지 않음). 함수가 없으면 서브프로세스로 실행합니다.
+# 이 함수가 하위 프로세스를 띄운다면 set_start_method 대신 mp.get_context('spawn') 을 써야 합니다.
+RECON_IN_PROCESS = os.environ.get('RECON_IN_PROCESS', '0') == '1'
+RECON_ENTRY_POINT = os.environ.get('RECON_ENTRY_POINT', 'run')
+OPTIMIZE_VOXEL_SIZE = 0.02
+OPTIMIZE_STD_RATIO = 5.0
+OPTIMIZE_ENGINE = os.environ.get('RECON_OPTIMIZE_ENGINE', 'open3d')   # 'open3d' | 'numpy'
+# 영상 대신 선별한 키프레임 이미지 시퀀스로 재구성 (--keyframes 의 기본값, 워커에는 인자로 전달, keyframes.py)
+KEYFRAMES = os.environ.get('RECON_KEYFRAMES', '0') == '1'
+# main.py 가 이미지 폴더 데이터셋에 붙이는 프레임 간격(fps). 궤적 시간을 원본 영상 시각으로 되돌릴 때 사용
+KEYFRAME_SEQUENCE_FPS = float(os.environ.get('RECON_SEQUENCE_FPS', 30))
 
 app = Flask(__name__)
 app.config['UPLOAD_FOLDER'] = UPLOAD_FOLDER
 app.config['LOGS_FOLDER'] = LOGS_FOLDER
 
-# --- 백그라운드 워커 함수 (기존과 동일) ---
-def process_queue(task_queue, job_status):
+# --- 작업 저장소 (SQLite) ---
+# 상태: queued -> processing -> completed | failed
+# 여러 워커 프로세스와 Flask 스레드가 각자 연결을 열어 사용합니다.
+# processing 작업은 lease_until 까지 worker 의 것이며, 워커가 죽어 heartbeat 가 끊기면 다른 워커가 다시 가져갑니다.
+# (backend/app/jobs.py 의 lease/heartbeat 와 같은 방식)
+def _db():
+    conn = sqlite3.connect(JOBS_DB, timeout=30, isolation_level=None)
+    conn.row_factory = sqlite3.Row
+    conn.execute('PRAGMA journal_mode=WAL')
+    return conn
+
+def init_job_store():
+    """
+    테이블을 만들고, 이전 실행에서 처리 중이던 작업을 다시 대기열로 돌립니다.
+    (서버가 죽으면 처리 중이던 워커도 함께 죽으므로)
+    """
+    with closing(_db()) as conn:
+        conn.execute("""
+            CREATE TABLE IF NOT EXISTS jobs (
+                id          TEXT PRIMARY KEY,
+                status      TEXT NOT NULL,
+                mp4_path    TEXT,
+                worker      TEXT,
+                error       TEXT,
+                created_at  REAL NOT NULL,
+                started_at  REAL,
+                finished_at REAL,
+                lease_until REAL
+            )
+        """)
+        # lease 도입 전 저장소에는 컬럼 추가
+        columns = {row['name'] for row in conn.execute("PRAGMA table_info(jobs)")}
+        if 'lease_until' not in columns:
+            conn.execute("ALTER TABLE jobs ADD COLUMN lease_until REAL")
+        conn.execute("CREATE INDEX IF NOT EXISTS ix_jobs_status_created ON jobs (status, created_at)")
+        cur = conn.execute(
+            "UPDATE jobs SET status = 'queued', worker = NULL, started_at = NULL, lease_until = NULL"
+            " WHERE status = 'processing'"
+        )
+        if cur.rowcount:
+            print(f"♻️ 처리 중이던 작업 {cur.rowcount}개를 대기열로 되돌렸습니다.")
+
+def get_job_status(job_id):
+    with closing(_db()) as conn:
+        row = conn.execute("SELECT status FROM jobs WHERE id = ?", (job_id,)).fetchone()
+    return row['status'] if row else None
+
+def set_job_status(job_id, status, mp4_path=None, error=None):
+    now = time.time()
+    with closing(_db()) as conn:
+        conn.execute(
+            """
+            INSERT INTO jobs (id, status, mp4_path, error, created_at, finished_at)
+            VALUES (?, ?, ?, ?, ?, ?)
+            ON CONFLICT(id) DO UPDATE SET
+                status = excluded.status,
+                mp4_path = COALESCE(excluded.mp4_path, jobs.mp4_path),
+                error = excluded.error,
+                created_at = CASE WHEN excluded.status = 'queued' THEN excluded.created_at ELSE jobs.created_at END,
+                started_at = CASE WHEN excluded.status = 'queued' THEN NULL ELSE jobs.started_at END,
+                finished_at = excluded.finished_at,
+                worker = CASE WHEN excluded.status = 'queued' THEN NULL ELSE jobs.worker END,
+                lease_until = NULL
+            """,
+            (job_id, status, mp4_path, error, now,
+             now if status in ('completed', 'failed') else None),
+        )
+
+def claim_next_job(worker_name):
+    """
+    가장 오래 기다린 작업 하나에 lease 를 잡아 processing 으로 바꾸고 (job_id, mp4_path) 를 반환합니다.
+    lease 가 만료된(처리하던 워커가 죽은) processing 작업도 대상입니다.
+    """
+    now = time.time()
+    with closing(_db()) as conn:
+        conn.execute('BEGIN IMMEDIATE')
+        row = conn.execute(
+            """
+            SELECT id, mp4_path, worker FROM jobs
+            WHERE status = 'queued' OR (status = 'processing' AND lease_until < ?)
+            ORDER BY created_at LIMIT 1
+            """,
+            (now,),
+        ).fetchone()
+        if row is None:
+            conn.execute('COMMIT')
+            return None
+        conn.execute(
+            "UPDATE jobs SET status = 'processing', worker = ?, started_at = ?, lease_until = ? WHERE id = ?",
+            (worker_name, now, now + JOB_LEASE_SECONDS, row['id']),
+        )
+        conn.execute('COMMIT')
+    if row['worker']:
+        print(f"♻️ [{worker_name}][{row['id']}] lease 가 만료된 작업을 회수했습니다. (이전 워커: {row['worker']})")
+    return row['id'], row['mp4_path']
+
+def heartbeat(job_id, worker_name):
+    """lease 연장. 다른 워커가 이미 회수한 작업이면 False."""
+    now = time.time()
+    with closing(_db()) as conn:
+        cur = conn.execute(
+            "UPDATE jobs SET lease_until = ? WHERE id = ? AND worker = ? AND status = 'processing'",
+            (now + JOB_LEASE_SECONDS, job_id, worker_name),
+        )
+    return cur.rowcount == 1
+
+def finish_job(job_id, worker_name, status, error=None, publish=None):
+    """
+    처리 결과 기록. 아직 이 워커가 lease 를 가진 경우에만 바꾸며,
+    그 사이 다른 워커가 회수한 작업이면 결과를 버리고 False 를 반환합니다.
+    publish 를 주면 조건부 UPDATE 가 성공한 뒤 같은 쓰기 트랜잭션 안에서 호출합니다(결과 파일 이동).
+    커밋 전까지 다른 워커는 작업을 회수할 수 없고 조회하는 쪽도 completed 를 보지 못하므로,
+    completed 가 보일 때는 결과 파일이 항상 제자리에 있습니다. publish 가 실패하면 롤백합니다.
+    """
+    now = time.time()
+    with closing(_db()) as conn:
+        conn.execute('BEGIN IMMEDIATE')
+        try:
+            cur = conn.execute(
+                """
+                UPDATE jobs SET status = ?, error = ?, finished_at = ?, lease_until = NULL
+                WHERE id = ? AND worker = ? AND status = 'processing'
+                """,
+                (status, error, now, job_id, worker_name),
+            )
+            if cur.rowcount == 1 and publish is not None:
+                publish()
+        except BaseException:
+            conn.execute('ROLLBACK')
+            raise
+        conn.execute('COMMIT')
+    return cur.rowcount == 1
+
+def requeue_worker_jobs(worker_name):
+    """죽은 워커가 잡고 있던 작업을 lease 만료를 기다리지 않고 바로 대기열로 돌립니다."""
+    with closing(_db()) as conn:
+        cur = conn.execute(
+            "UPDATE jobs SET status = 'queued', worker = NULL, started_at = NULL, lease_until = NULL"
+            " WHERE status = 'processing' AND worker = ?",
+            (worker_name,),
+        )
+    return cur.rowcount
+
+def queue_info(job_id):
+    """
+    대기/처리 중인 작업의 큐 길이, 대기 순번, 예상 완료까지 남은 시간(초)을 계산합니다.
+    ETA 는 최근 완료 작업들의 평균 처리 시간과 워커 수로 어림합니다.
+    """
+    with closing(_db()) as conn:
+        job = conn.execute("SELECT status, created_at, started_at FROM jobs WHERE id = ?", (job_id,)).fetchone()
+        depth = conn.execute("SELECT COUNT(*) FROM jobs WHERE status = 'queued'").fetchone()[0]
+        running = conn.execute("SELECT COUNT(*) FROM jobs WHERE status = 'processing'").fetchone()[0]
+        avg = conn.execute(
+            """
+            SELECT AVG(finished_at - started_at) FROM (
+                SELECT finished_at, started_at FROM jobs
+                WHERE status = 'completed' AND started_at IS NOT NULL AND finished_at IS NOT NULL
+                ORDER BY finished_at DESC LIMIT ?
+            )
+            """,
+            (ETA_SAMPLE_SIZE,),
+        ).fetchone()[0]
+        ahead = 0
+        if job is not None and job['status'] == 'queued':
+            ahead = conn.execute(
+                "SELECT COUNT(*) FROM jobs WHERE status = 'queued' AND created_at < ?",
+                (job['created_at'],),
+            ).fetchone()[0]
+
+    info = {"queue_depth": depth, "running": running, "workers": NUM_WORKERS}
+    if job is None:
+        return info
+    eta = None
+    if job['status'] == 'queued':
+        info["position"] = ahead + 1
+        if avg is not None:
+            # 처리 중/앞선 작업들이 워커 수만큼씩 병렬로 빠진다고 보고, 자기 처리 시간까지 더함
+            eta = ((ahead + running) // NUM_WORKERS) * avg + avg
+    elif job['status'] == 'processing':
+        info["position"] = 0
+        if avg is not None and job['started_at'] is not None:
+            eta = max(avg - (time.time() - job['started_at']), 0.0)
+    if eta is not None:
+        info["eta_seconds"] = round(eta)
+    return info
+
+
+# --- 백그라운드 워커 함수 ---
+def _notify(status_changed):
+    # /wait 롱폴링 중인 요청들을 깨웁니다.
+    with status_changed:
+        status_changed.notify_all()
+
+def _job_log_path(job_id):
+    return os.path.join(LOGS_FOLDER, f"{job_id}.log")
+
+def _log_tail(path, limit=2000):
+    try:
+        with open(path, 'rb') as f:
+            f.seek(max(os.path.getsize(path) - limit, 0))
+            return f.read().decode('utf-8', errors='replace')
+    except OSError:
+        return None
+
+def _load_reconstruction_entry(worker_name):
+    """
+    in-process 모드: main.py 를 (__main__ 이 아닌) 모듈로 import 해 RECON_ENTRY_POINT 함수를 반환합니다.
+    함수가 없거나 import 에 실패하면 None (서브프로세스로 실행).
+    """
+    try:
+        spec = importlib.util.spec_from_file_location('recon_main', 'main.py')
+        module = importlib.util.module_from_spec(spec)
+        spec.loader.exec_module(module)
+    except Exception as e:
+        print(f"[{worker_name}] main.py import 실패, 서브프로세스로 실행합니다: {e}")
+        return None
+    entry = getattr(module, RECON_ENTRY_POINT, None)
+    if not callable(entry):
+        print(f"[{worker_name}] main.py 에 {RECON_ENTRY_POINT}(argv) 가 없어 서브프로세스로 실행합니다.")
+        return None
+    return entry
+
+class LeaseLost(RuntimeError):
+    """처리 도중 lease 가 만료되어 다른 워커가 작업을 회수함."""
+
+def _run_reconstruction(dataset_path, save_as, log, lost, entry=None):
+    """
+    main.py 로 재구성. dataset_path 는 mp4 또는 이미지 폴더, 결과는 logs/{save_as}/ 에 저장됩니다.
+    출력은 log(작업별 로그 파일)로 바로 흘려보냅니다. 서브프로세스는 lost 가 set 되면 바로 종료시킵니다.
+    entry 를 주면(in-process 모드) 서브프로세스 대신 그 함수를 호출합니다(끝난 뒤에 lost 확인).
+    """
+    # job_id가 이미 파일(폴더)의 basename이므로 그대로 사용합니다.
+    argv = ['--dataset', dataset_path, '--config', CONFIG_FILE, '--no-viz', '--save-as', save_as]
+    if entry is None:
+        proc = subprocess.Popen([sys.executable, 'main.py', *argv], stdout=log, stderr=subprocess.STDOUT)
+        while proc.poll() is None:
+            if lost.wait(1.0):
+                proc.kill()
+                proc.wait()
+                raise LeaseLost()
+        if proc.returncode != 0:
+            raise RuntimeError(f"main.py 종료 코드 {proc.returncode}")
+        return
+
+    try:
+        with redirect_stdout(log), redirect_stderr(log):
+            code = entry(argv)
+    except SystemExit as e:
+        code = e.code
+    if code not in (None, 0):
+        raise RuntimeError(f"main.py 종료 코드 {code}")
+
+def _heartbeat_loop(job_id, worker_name, stop, lost):
+    # 재구성이 오래 걸려도 lease 가 만료되지 않도록 주기적으로 연장. 잃으면 lost 를 set 해 작업을 중단시킴
+    while not stop.wait(HEARTBEAT_INTERVAL):
+        try:
+            if not heartbeat(job_id, worker_name):
+                print(f"[{worker_name}][{job_id}] lease 를 잃었습니다. 작업을 중단합니다. (다른 워커가 회수)")
+                lost.set()
+                return
+        except sqlite3.Error as e:
+            print(f"[{worker_name}][{job_id}] heartbeat 실패: {e}")
+
+# 처리 시도(attempt)마다 따로 쓰는 작업 폴더. 같은 작업을 회수한 다른 워커와 파일이 겹치지 않도록
+# 결과는 logs/attempts/{attempt}/, 키프레임은 uploads/frames/{attempt}/{job_id}/ 에 만들고
+# 결과는 finish_job 이 성공했을 때만 logs/ 로 옮깁니다.
+ATTEMPTS_FOLDER = 'attempts'
+
+def _attempt_dir(attempt):
+    return os.path.join(LOGS_FOLDER, ATTEMPTS_FOLDER, attempt)
+
+def _keyframe_dir(attempt, job_id):
+    # main.py 가 데이터셋 basename 으로 결과 이름을 정하므로 폴더 이름을 job_id 로 맞춥니다.
+    return os.path.join(UPLOAD_FOLDER, 'frames', attempt, job_id)
+
+def _publish_attempt(attempt_dir):
+    # 같은 파일시스템 안의 os.replace 라 파일 하나하나는 원자적으로 바뀝니다.
+    for name in os.listdir(attempt_dir):
+        src = os.path.join(attempt_dir, name)
+        if os.path.isfile(src):
+            os.replace(src, os.path.join(LOGS_FOLDER, name))
+
+def _clear_attempts():
+    """시작 시 이전 실행이 남긴 attempt 폴더 정리 (워커를 띄우기 전에만 호출)."""
+    shutil.rmtree(os.path.join(LOGS_FOLDER, ATTEMPTS_FOLDER), ignore_errors=True)
+    shutil.rmtree(os.path.join(UPLOAD_FOLDER, 'frames'), ignore_errors=True)
+
+def process_queue(worker_name, status_changed, gpu=None, cpus=None, keyframes=False):
     """
-    Queue에서 작업을 가져와 순차적으로 3D 맵 생성 및 최적화를 수행합니다.
+    작업 저장소에서 대기 중인 작업을 하나씩 가져와 3D 맵 생성 및 최적화를 수행합니다.
+    워커 프로세스 여러 개가 동시에 실행되며, 상태가 바뀔 때마다 status_changed 를 notify 합니다.
+    gpu 를 주면 CUDA_VISIBLE_DEVICES 로, cpus 를 주면 CPU affinity 로 이 워커를 고정합니다.
+    keyframes 면 영상 대신 선별한 키프레임 이미지 시퀀스로 재구성합니다.
+    (설정은 모두 인자로 받으므로 spawn/forkserver 로 시작해도 같게 동작합니다)
+    재구성은 main.py 서브프로세스(in-process 모드면 main.py 의 진입 함수 호출)로, 최적화는 이 프로세스 안에서
+    함수 호출로 실행하고, 로그는 logs/{job_id}.log 에 남깁니다.
     """
+    if gpu is not None:
+        # torch 가 import 되기 전에 설정해야 적용됩니다.
+        os.environ['CUDA_VISIBLE_DEVICES'] = str(gpu)
+    if cpus and hasattr(os, 'sched_setaffinity'):
+        # 서브프로세스로 실행하는 main.py 도 affinity 를 물려받습니다.
+        os.sched_setaffinity(0, cpus)
+    entry = _load_reconstruction_entry(worker_name) if RECON_IN_PROCESS else None
+    # open3d 는 워커마다 한 번만 import
+    from optimize_ply import optimize_ply
+    if keyframes:
+        from keyframes import select_keyframes, remap_trajectory
+    print(f"[{worker_name}] 워커 시작 (gpu={gpu}, cpus={sorted(cpus) if cpus else None}, "
+          f"in_process={entry is not None}, keyframes={keyframes})")
+
     while True:
-        job_id, mp4_path = task_queue.get()
-        
+        claimed = claim_next_job(worker_name)
+        if claimed is None:
+            time.sleep(WORKER_POLL_INTERVAL)
+            continue
+        job_id, mp4_path = claimed
+        _notify(status_changed)
+        log_path = _job_log_path(job_id)
+        attempt = f"{worker_name}-{uuid.uuid4().hex[:8]}"
+        attempt_dir = _attempt_dir(attempt)
+        frames_dir = _keyframe_dir(attempt, job_id)
+        stop, lost = threading.Event(), threading.Event()
+        threading.Thread(target=_heartbeat_loop, args=(job_id, worker_name, stop, lost), daemon=True).start()
+
+        def check_lease():
+            if lost.is_set():
+                raise LeaseLost()
+
         try:
-            job_status[job_id] = 'processing'
-            print(f"[{job_id}] 처리 시작: {mp4_path}")
-            
-            # job_id가 이미 파일의 basename이므로 그대로 사용합니다.
-            main_cmd = [
-                'python', 'main.py',
-                '--dataset', mp4_path,
-                '--config', CONFIG_FILE,
-                '--no-viz'
-            ]
-            print(f"[{job_id}] main.py 실행...")
-            # main.py 실행 시 표준 출력/에러를 캡처하여 로그로 남길 수 있습니다.
-            result = subprocess.run(main_cmd, check=True, capture_output=True, text=True)
-            print(f"[{job_id}] main.py stdout: {result.stdout}")
-
-
-            original_ply_path = os.path.join(LOGS_FOLDER, f"{job_id}.ply")
-            optimized_ply_path = os.path.join(LOGS_FOLDER, f"{job_id}_optimized.ply")
-            
-            optimize_cmd = [
-                'python', 'optimize_ply.py',
-                original_ply_path,
-                optimized_ply_path
-            ]
-            print(f"[{job_id}] optimize_ply.py 실행...")
-            opt_result = subprocess.run(optimize_cmd, check=True, capture_output=True, text=True)
-            print(f"[{job_id}] optimize_ply.py stdout: {opt_result.stdout}")
-
-            job_status[job_id] = 'completed'
-            print(f"[{job_id}] 처리 완료")
-
-        except subprocess.CalledProcessError as e:
-            job_status[job_id] = 'failed'
-            print(f"[{job_id}] 처리 실패: {e.stderr}")
+            print(f"[{worker_name}][{job_id}] 처리 시작: {mp4_path} (attempt: {attempt}, 로그: {log_path})")
+            os.makedirs(attempt_dir, exist_ok=True)
+            with open(log_path, 'a', buffering=1, encoding='utf-8') as log:
+                dataset_path, frames = mp4_path, None
+                if keyframes:
+                    print(f"[{job_id}] 키프레임 선별...", file=log)
+                    with redirect_stdout(log), redirect_stderr(log):
+                        frames = select_keyframes(mp4_path, frames_dir)
+                    check_lease()
+                    if len(frames) >= 2:
+                        dataset_path = frames_dir
+                    else:
+                        print(f"[{job_id}] 선택된 프레임이 부족해 영상 그대로 재구성합니다.", file=log)
+                        frames = None
+
+                print(f"[{job_id}] main.py 실행...", file=log)
+                _run_reconstruction(dataset_path, os.path.join(ATTEMPTS_FOLDER, attempt), log, lost, entry)
+                check_lease()
+                if frames:
+                    # 궤적 시간을 원본 영상 시각으로 (상품 등장 시각과 좌표 매칭)
+                    n = remap_trajectory(os.path.join(attempt_dir, ARTIFACTS['traj'].format(job_id=job_id)),
+                                         [t for _, t in frames], KEYFRAME_SEQUENCE_FPS)
+                    print(f"[{job_id}] 궤적 시간 보정: {n}줄", file=log)
+
+                original_ply_path = os.path.join(attempt_dir, f"{job_id}.ply")
+                optimized_ply_path = os.path.join(attempt_dir, ARTIFACTS['ply'].format(job_id=job_id))
+
+                print(f"[{job_id}] PLY 최적화...", file=log)
+                with redirect_stdout(log), redirect_stderr(log):
+                    saved = optimize_ply(
+                        original_ply_path, optimized_ply_path,
+                        voxel_size=OPTIMIZE_VOXEL_SIZE, std_ratio=OPTIMIZE_STD_RATIO,
+                        engine=OPTIMIZE_ENGINE,
+                    )
+                if saved is None:
+                    raise RuntimeError("PLY 최적화 실패")
+                check_lease()
+
+            stop.set()
+            if finish_job(job_id, worker_name, 'completed', publish=lambda: _publish_attempt(attempt_dir)):
+                print(f"[{job_id}] 처리 완료")
+            else:
+                print(f"[{worker_name}][{job_id}] 다른 워커가 회수한 작업이라 결과를 기록하지 않습니다.")
+
+        except LeaseLost:
+            # 회수한 워커가 처리하므로 상태도 결과 파일도 건드리지 않음
+            print(f"[{worker_name}][{job_id}] lease 상실로 중단, 결과를 버립니다.")
         except Exception as e:
-            job_status[job_id] = 'failed'
-            print(f"[{job_id}] 처리 중 예외 발생: {e}")
+            stop.set()
+            if finish_job(job_id, worker_name, 'failed', error=_log_tail(log_path) or str(e)):
+                print(f"[{job_id}] 처리 실패: {e} (로그: {log_path})")
+            else:
+                print(f"[{worker_name}][{job_id}] 처리 실패(다른 워커가 회수한 작업이라 기록하지 않음): {e}")
+        finally:
+            stop.set()
+            # 성공/실패와 관계없이 이 시도의 작업 폴더(옮기지 않은 결과, 키프레임 이미지)는 남기지 않음
+            shutil.rmtree(attempt_dir, ignore_errors=True)
+            shutil.rmtree(os.path.dirname(frames_dir), ignore_errors=True)
+            _notify(status_changed)
 
 
 # --- API 엔드포인트 ---
@@ -72,31 +444,124 @@ def generate_map():
     if file.filename == '':
         return jsonify({"error": "파일이 선택되지 않았습니다."}), 400
     if file and file.filename.endswith('.mp4'):
-        # --- 수정된 부분: 파일명을 기반으로 job_id 생성 및 중복 확인 ---
-        basename = os.path.splitext(file.filename)[0]
-        job_id = basename
-        
+        # 업로드를 임시 파일로 받으면서 내용 해시(sha256)를 계산해 job_id 로 사용합니다.
+        # 파일명이 달라도 같은 영상이면 결과를 재사용하고, 이름만 같은 다른 영상은 새로 처리합니다.
+        tmp_path = os.path.join(app.config['UPLOAD_FOLDER'], f"{uuid.uuid4().hex}.part")
+        digest = hashlib.sha256()
+        with open(tmp_path, 'wb') as out:
+            while True:
+                chunk = file.stream.read(1024 * 1024)
+                if not chunk:
+                    break
+                digest.update(chunk)
+                out.write(chunk)
+        job_id = digest.hexdigest()
+
+        if get_job_status(job_id) in ('queued', 'processing'):
+            os.remove(tmp_path)
+            print(f"[{job_id}] 같은 영상이 이미 처리 중입니다.")
+            return jsonify({"id": job_id, "message": "Already in progress."})
+
         # 원본 ply 파일 존재 여부 확인
         ply_path = os.path.join(app.config['LOGS_FOLDER'], f"{job_id}_optimized.ply")
 
         if os.path.exists(ply_path):
             print(f"✔️ [{job_id}] 기존 파일이 존재하여 처리를 건너<binary data, 2 bytes, 1 bytes>니다.")
-            job_status[job_id] = 'completed' # 상태를 'completed'로 설정
+            set_job_status(job_id, 'completed') # 상태를 'completed'로 설정
+            _notify(status_changed)
+            os.remove(tmp_path)
             return jsonify({"id": job_id, "message": "Result already exists."})
         
         # 파일이 없으면 기존 로직 수행
         mp4_filename = f"{job_id}.mp4" # 저장할 파일명도 job_id와 통일
         mp4_path = os.path.join(app.config['UPLOAD_FOLDER'], mp4_filename)
-        file.save(mp4_path)
+        os.replace(tmp_path, mp4_path)
         
-        task_queue.put((job_id, mp4_path))
-        job_status[job_id] = 'queued'
+        set_job_status(job_id, 'queued', mp4_path=mp4_path)
         
         print(f"[{job_id}] 작업이 큐에 추가되었습니다: {mp4_path}")
-        return jsonify({"id": job_id})
+        return jsonify({"id": job_id, **queue_info(job_id)})
     else:
         return jsonify({"error": "mp4 파일만 업로드할 수 있습니다."}), 400
 
+def _resolve_status(job_id):
+    status = get_job_status(job_id)
+    # 작업 저장소 도입 전에 처리되어 기록은 없지만 파일은 존재할 경우를 대비
+    if status is None and os.path.exists(os.path.join(LOGS_FOLDER, f"{job_id}_optimized.ply")):
+        status = 'completed'
+    return status
+
+@app.route('/wait', methods=['GET'])
+def wait_status():
+    """
+    롱폴링: 작업이 끝나거나(완료/실패) timeout(초, 최대 60)이 지날 때까지 응답을 보류합니다.
+    status 1 = 완료(결과는 /search 로 다운로드), 0 = 진행 중, -1 = 실패 또는 없음.
+    """
+    job_id = request.args.get('id')
+    if not job_id:
+        return jsonify({"error": "id 파라미터가 필요합니다."}), 400
+    try:
+        timeout = min(max(float(request.args.get('timeout', 30)), 0.0), 60.0)
+    except ValueError:
+        timeout = 30.0
+
+    deadline = time.monotonic() + timeout
+    while True:
+        status = _resolve_status(job_id)
+        if status == 'completed':
+            return jsonify({"status": 1})
+        if status not in ('processing', 'queued'):
+            return jsonify({"status": -1})
+        remaining = deadline - time.monotonic()
+        if remaining <= 0:
+            return jsonify({"status": 0})
+        # notify 를 놓쳐도 1초 안에는 다시 확인합니다.
+        with status_changed:
+            status_changed.wait(min(remaining, 1.0))
+
+# 작업 결과물 종류 -> LOGS_FOLDER 안의 파일명
+ARTIFACTS = {
+    'traj': '{job_id}.txt',
+    'ply': '{job_id}_optimized.ply',
+}
+
+def _artifact_path(job_id, kind):
+    return os.path.join(LOGS_FOLDER, ARTIFACTS[kind].format(job_id=job_id))
+
+@app.route('/artifacts/<job_id>/<kind>', methods=['GET'])
+def get_artifact(job_id, kind):
+    """
+    결과물 하나를 디스크에서 바로 스트리밍합니다.
+    conditional=True 로 ETag / If-None-Match / Range(206) 를 werkzeug 가 처리합니다.
+    """
+    if kind not in ARTIFACTS:
+        abort(404)
+    if _resolve_status(job_id) != 'completed':
+        abort(404)
+    # send_from_directory 가 LOGS_FOLDER 밖으로의 경로 탈출을 막습니다.
+    return send_from_directory(
+        os.path.abspath(LOGS_FOLDER),
+        ARTIFACTS[kind].format(job_id=job_id),
+        conditional=True,
+        etag=True,
+        max_age=0,
+    )
+
+def _result_zip(job_id, members):
+    """
+    (하위 호환용) 결과 zip 을 디스크에 한 번만 만들어 두고 재사용합니다.
+    원본보다 오래된 zip 만 다시 만들며, 압축 없이(STORED) 파일 단위로 스트리밍해 기록합니다.
+    """
+    zip_path = os.path.join(LOGS_FOLDER, f"{job_id}_result.zip")
+    newest = max(os.path.getmtime(m) for m in members)
+    if not os.path.exists(zip_path) or os.path.getmtime(zip_path) < newest:
+        tmp_path = f"{zip_path}.{uuid.uuid4().hex}.tmp"
+        with zipfile.ZipFile(tmp_path, 'w', compression=zipfile.ZIP_STORED) as zf:
+            for m in members:
+                zf.write(m, os.path.basename(m))
+        os.replace(tmp_path, zip_path)
+    return zip_path
+
 @app.route('/search', methods=['GET'])
 def search_status():
     """
@@ -107,14 +572,14 @@ def search_status():
         return jsonify({"error": "id 파라미터가 필요합니다."}), 400
 
     # --- 수정된 부분: 특별 ID 로직 제거 및 통합 ---
-    status = job_status.get(job_id)
+    status = get_job_status(job_id)
 
-    # 서버 재시작 등으로 메모리(job_status)에는 없지만 파일은 존재할 경우를 대비
+    # 작업 저장소에 기록은 없지만 파일은 존재할 경우를 대비
     if status is None:
         optimized_ply_path_check = os.path.join(LOGS_FOLDER, f"{job_id}_optimized.ply")
         if os.path.exists(optimized_ply_path_check):
             status = 'completed'
-            print(f"🔍 [{job_id}] 메모리에 상태는 없지만 완료된 파일이 있어 'completed'로 처리합니다.")
+            print(f"🔍 [{job_id}] 저장소에 상태는 없지만 완료된 파일이 있어 'completed'로 처리합니다.")
 
 
     if status == 'completed':
@@ -122,44 +587,126 @@ def search_status():
         optimized_ply_path = os.path.join(LOGS_FOLDER, f"{job_id}_optimized.ply")
 
         if os.path.exists(txt_path) and os.path.exists(optimized_ply_path):
-            memory_file = io.BytesIO()
-            with zipfile.ZipFile(memory_file, 'w') as zf:
-                zf.write(txt_path, os.path.basename(txt_path))
-                zf.write(optimized_ply_path, os.path.basename(optimized_ply_path))
-            memory_file.seek(0)
-            
+            if request.args.get('format') == 'json':
+                # 개별 결과물 URL 안내 (클라이언트가 /artifacts 로 각각 스트리밍 다운로드)
+                return jsonify({
+                    "status": 1,
+                    "artifacts": {
+                        kind: {
+                            "url": f"/artifacts/{job_id}/{kind}",
+                            "filename": os.path.basename(_artifact_path(job_id, kind)),
+                            "size": os.path.getsize(_artifact_path(job_id, kind)),
+                        }
+                        for kind in ARTIFACTS
+                    },
+                })
+
+            zip_path = _result_zip(job_id, [txt_path, optimized_ply_path])
             print(f"✅ [{job_id}] 결과 파일 전송 완료.")
             return send_file(
-                memory_file,
+                zip_path,
                 download_name=f'{job_id}_result.zip',
                 mimetype='application/zip',
-                as_attachment=True
+                as_attachment=True,
+                conditional=True,
             )
         else:
             # 상태는 'completed'이지만 파일이 없는 예외적인 경우
-            job_status[job_id] = 'failed'
+            set_job_status(job_id, 'failed', error='missing result files')
             print(f"❌ [{job_id}] 상태는 'completed'지만 결과 파일을 찾을 수 없습니다.")
             return jsonify({"status": -1, "message": "결과 파일 생성에 실패했습니다."})
 
     elif status == 'processing' or status == 'queued':
-        print(f"⏳ [{job_id}] 작업 진행 중... (상태: {status})")
-        return jsonify({"status": 0})
+        info = queue_info(job_id)
+        print(f"⏳ [{job_id}] 작업 진행 중... (상태: {status}, 순번: {info.get('position')}, ETA: {info.get('eta_seconds')}s)")
+        # 대기열 길이 / 대기 순번(0 = 처리 중) / 예상 남은 시간(초, 완료 이력이 있을 때만)
+        return jsonify({"status": 0, "state": status, **info})
     else: # ID가 없거나 'failed' 상태인 경우
         print(f"❌ [{job_id}] 작업을 찾을 수 없거나 실패했습니다. (상태: {status})")
         return jsonify({"status": -1})
 
 
-# --- 서버 실행 (기존과 동일) ---
+def _parse_cpu_sets(spec):
+    """'0-3;4-7' -> [{0,1,2,3}, {4,5,6,7}] (워커 순서대로 사용)"""
+    sets = []
+    for group in filter(None, (g.strip() for g in spec.split(';'))):
+        cpus = set()
+        for part in group.split(','):
+            if '-' in part:
+                lo, hi = part.split('-')
+                cpus.update(range(int(lo), int(hi) + 1))
+            else:
+                cpus.add(int(part))
+        sets.append(cpus)
+    return sets
+
+def _start_worker(worker_args):
+    worker_process = Process(target=process_queue, args=worker_args)
+    # in-process 모드의 main.py 는 자체 하위 프로세스를 띄우므로 daemonic 이면 안 됨 (종료는 __main__ 에서 terminate)
+    worker_process.daemon = not RECON_IN_PROCESS
+    worker_process.start()
+    return worker_process
+
+def _supervise_workers(workers, status_changed, shutdown):
+    """
+    워커 프로세스가 죽으면(CUDA 오류, OOM kill 등) 잡고 있던 작업을 대기열로 돌리고 같은 설정으로 다시 띄웁니다.
+    workers: {워커 이름: [Process, process_queue 인자]}
+    """
+    while not shutdown.wait(SUPERVISE_INTERVAL):
+        for name, entry in workers.items():
+            worker_process, worker_args = entry
+            if worker_process.is_alive():
+                continue
+            requeued = requeue_worker_jobs(name)
+            print(f"⚠️ [{name}] 워커 종료 감지 (exitcode={worker_process.exitcode}), "
+                  f"작업 {requeued}개를 대기열로 되돌리고 다시 시작합니다.")
+            if requeued:
+                _notify(status_changed)
+            entry[0] = _start_worker(worker_args)
+
+
+# --- 서버 실행 ---
 if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='3D reconstruction server')
+    parser.add_argument('--workers', type=int, default=int(os.environ.get('RECON_WORKERS', 1)),
+                        help='동시에 재구성할 작업(워커 프로세스) 수')
+    parser.add_argument('--gpus', default=os.environ.get('RECON_GPUS', ''),
+                        help="워커에 돌아가며 배정할 GPU 번호, 예: '0,1'")
+    parser.add_argument('--cpu-sets', default=os.environ.get('RECON_CPU_SETS', ''),
+                        help="워커별 CPU 집합, 예: '0-7;8-15'")
+    parser.add_argument('--port', type=int, default=7141)
+    parser.add_argument('--keyframes', action='store_true', default=KEYFRAMES,
+                        help='흐리거나 중복된 프레임을 뺀 이미지 시퀀스로 재구성 (RECON_KEYFRAMES=1)')
+    args = parser.parse_args()
+
     os.makedirs(UPLOAD_FOLDER, exist_ok=True)
     os.makedirs(LOGS_FOLDER, exist_ok=True)
+    init_job_store()
+    _clear_attempts()
+
+    NUM_WORKERS = max(1, args.workers)
+    gpus = [g.strip() for g in args.gpus.split(',') if g.strip()]
+    cpu_sets = _parse_cpu_sets(args.cpu_sets)
 
     manager = Manager()
-    job_status = manager.dict()
-    task_queue = Queue()
+    status_changed = manager.Condition()
 
-    worker_process = Process(target=process_queue, args=(task_queue, job_status))
-    worker_process.daemon = True
-    worker_process.start()
+    workers = {}
+    for i in range(NUM_WORKERS):
+        worker_args = (f"worker-{i}", status_changed,
+                       gpus[i % len(gpus)] if gpus else None,
+                       cpu_sets[i % len(cpu_sets)] if cpu_sets else None,
+                       args.keyframes)
+        workers[worker_args[0]] = [_start_worker(worker_args), worker_args]
+    shutdown = threading.Event()
+    threading.Thread(target=_supervise_workers, args=(workers, status_changed, shutdown), daemon=True).start()
+    print(f"재구성 워커 {NUM_WORKERS}개 시작")
 
-    app.run(host='0.0.0.0', port=7141)
+    try:
+        # /wait 롱폴링이 다른 요청을 막지 않도록 스레드 모드로 실행
+        app.run(host='0.0.0.0', port=args.port, threaded=True)
+    finally:
+        # daemonic 이 아닌 워커(in-process 모드)가 서버 종료를 막지 않도록
+        shutdown.set()
+        for worker_process, _ in workers.values():
+            worker_process.terminate()
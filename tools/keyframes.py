@@ -0,0 +1,162 @@
+import os
+import argparse
+from collections import deque
+
+import cv2
+import numpy as np
+
+# 재구성 입력 프레임 선별
+# 천천히 걸으며 찍은 영상은 연속 프레임이 거의 같으므로, 흐린 프레임과 직전 선택 프레임 대비
+# 시차(optical flow 이동량)가 작은 프레임을 버리고 남은 프레임만 이미지 시퀀스로 저장합니다.
+# 저장한 폴더는 main.py --dataset 에 그대로 넘길 수 있습니다.
+
+TIMESTAMPS_FILE = 'timestamps.txt'   # "파일명 원본영상시각(초)" (궤적 시간을 원본 기준으로 되돌릴 때 사용)
+
+
+def focus_score(gray):
+    """
+    선명도 점수 (라플라시안 분산, 높을수록 선명).
+    backend 의 process_video.calculate_focus_score 와 같은 정의이며, 이미 흑백으로 줄인 프레임을 받습니다.
+    """
+    return cv2.Laplacian(gray, cv2.CV_64F).var()
+
+
+def _work_gray(frame, work_size):
+    """짧은 변을 work_size 로 줄인 흑백 프레임 (선명도/흐름 계산용)."""
+    h, w = frame.shape[:2]
+    scale = work_size / min(h, w)
+    if scale < 1.0:
+        frame = cv2.resize(frame, (round(w * scale), round(h * scale)), interpolation=cv2.INTER_AREA)
+    return cv2.cvtColor(frame, cv2.COLOR_BGR2GRAY)
+
+
+def _track_features(gray):
+    return cv2.goodFeaturesToTrack(gray, maxCorners=300, qualityLevel=0.01, minDistance=7)
+
+
+def flow_novelty(ref_gray, ref_pts, gray):
+    """
+    기준 프레임의 특징점을 현재 프레임으로 LK optical flow 추적합니다.
+    (이동량 중앙값 / 화면 대각선, 추적에 성공한 특징점 비율)을 반환합니다.
+    """
+    if ref_pts is None or len(ref_pts) < 10:
+        return float('inf'), 0.0
+    pts, status, _ = cv2.calcOpticalFlowPyrLK(ref_gray, gray, ref_pts, None, winSize=(21, 21), maxLevel=3)
+    ok = status.reshape(-1) == 1
+    if ok.sum() < 10:
+        return float('inf'), ok.mean()
+    disp = np.linalg.norm((pts - ref_pts).reshape(-1, 2)[ok], axis=1)
+    diag = float(np.hypot(*gray.shape[:2]))
+    return float(np.median(disp)) / diag, float(ok.mean())
+
+
+def select_keyframes(video_path, out_dir, min_flow=0.03, min_tracked=0.5, blur_ratio=0.6,
+                     max_gap_sec=1.0, work_size=320, max_side=1280, jpeg_quality=95):
+    """
+    동영상을 한 번 순차 디코딩하며 재구성에 쓸 프레임을 골라 out_dir 에 '000000.jpg' ... 로 저장합니다.
+
+    과정:
+    1. 흐린 프레임 제거: 선명도가 최근 약 1초 중앙값의 blur_ratio 배 미만이면 버림
+    2. 중복 프레임 제거: 직전 선택 프레임 대비 이동량이 min_flow(대각선 비율) 미만이면 버림
+       단, 추적 특징점 비율이 min_tracked 아래로 떨어지면(시야가 많이 바뀜) 바로 선택
+    3. 선택 간격이 max_gap_sec 를 넘으면 흐려도 선택 (추적이 끊기지 않도록)
+
+    :return: [(파일명, 원본 영상 시각(초)), ...]. 동영상을 열 수 없으면 빈 리스트.
+    """
+    cap = cv2.VideoCapture(video_path)
+    if not cap.isOpened():
+        print(f"동영상을 열 수 없습니다: {video_path}")
+        return []
+    os.makedirs(out_dir, exist_ok=True)
+    fps = cap.get(cv2.CAP_PROP_FPS) or 0.0
+    recent = deque(maxlen=max(5, round(fps) or 30))
+
+    kept = []
+    ref = None   # (흑백, 특징점, 시각)
+    total = blurry = redundant = 0
+    try:
+        while True:
+            ok, frame = cap.read()
+            if not ok:
+                break
+            t = total / fps if fps > 0 else cap.get(cv2.CAP_PROP_POS_MSEC) / 1000.0
+            total += 1
+
+            gray = _work_gray(frame, work_size)
+            score = focus_score(gray)
+            recent.append(score)
+            is_blurry = score < blur_ratio * float(np.median(recent))
+
+            if ref is None:
+                # 첫 프레임은 시작 1초 안에서 흐리지 않은 것으로
+                if is_blurry and t < 1.0:
+                    blurry += 1
+                    continue
+            elif t - ref[2] < max_gap_sec:
+                if is_blurry:
+                    blurry += 1
+                    continue
+                flow, tracked = flow_novelty(ref[0], ref[1], gray)
+                if flow < min_flow and tracked >= min_tracked:
+                    redundant += 1
+                    continue
+
+            h, w = frame.shape[:2]
+            scale = max_side / max(h, w)
+            if scale < 1.0:
+                frame = cv2.resize(frame, (round(w * scale), round(h * scale)), interpolation=cv2.INTER_AREA)
+            name = f"{len(kept):06d}.jpg"
+            cv2.imwrite(os.path.join(out_dir, name), frame, [cv2.IMWRITE_JPEG_QUALITY, jpeg_quality])
+            kept.append((name, t))
+            ref = (gray, _track_features(gray), t)
+    finally:
+        cap.release()
+
+    with open(os.path.join(out_dir, TIMESTAMPS_FILE), 'w', encoding='utf-8') as f:
+        for name, t in kept:
+            f.write(f"{name} {t:.6f}\n")
+    print(f"키프레임 선별: 전체 {total} -> 선택 {len(kept)} (흐림 {blurry}, 중복 {redundant} 제외)")
+    return kept
+
+
+def remap_trajectory(traj_path, timestamps, sequence_fps=30.0):
+    """
+    이미지 시퀀스로 재구성하면 궤적(TUM) 시간이 '프레임 번호 / sequence_fps' 가 되므로,
+    선택한 프레임의 원본 영상 시각으로 되돌려 씁니다. (상품 등장 시각과 좌표를 맞추기 위해)
+    바꾼 줄 수를 반환합니다.
+    """
+    if not os.path.exists(traj_path) or not timestamps:
+        return 0
+    out = []
+    changed = 0
+    with open(traj_path, 'r', encoding='utf-8') as f:
+        for line in f:
+            parts = line.split()
+            if parts and not parts[0].startswith('#'):
+                try:
+                    i = round(float(parts[0]) * sequence_fps)
+                except ValueError:
+                    i = -1
+                if 0 <= i < len(timestamps):
+                    parts[0] = f"{timestamps[i]:.6f}"
+                    line = ' '.join(parts) + '\n'
+                    changed += 1
+            out.append(line)
+    tmp = traj_path + '.tmp'
+    with open(tmp, 'w', encoding='utf-8') as f:
+        f.writelines(out)
+    os.replace(tmp, traj_path)
+    return changed
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Select sharp, non-redundant frames from a video for reconstruction.')
+    parser.add_argument('input_file', type=str, help='Input video file path.')
+    parser.add_argument('output_dir', type=str, help='Output image sequence directory.')
+    parser.add_argument('--min_flow', type=float, default=0.03, help='Minimum median flow (fraction of diagonal) to keep a frame.')
+    parser.add_argument('--blur_ratio', type=float, default=0.6, help='Drop frames whose focus score is below this fraction of the recent median.')
+    parser.add_argument('--max_gap', type=float, default=1.0, help='Always keep a frame after this many seconds.')
+    args = parser.parse_args()
+
+    select_keyframes(args.input_file, args.output_dir, min_flow=args.min_flow,
+                     blur_ratio=args.blur_ratio, max_gap_sec=args.max_gap)
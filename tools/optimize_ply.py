@@ -3,31 +3,19 @@ import open3d as o3d
 import numpy as np
 import os
 
-def optimize_ply(input_path, output_path, voxel_size=0.01, nb_neighbors=20, std_ratio=2.0):
+def optimize_point_cloud(pcd, voxel_size=0.01, nb_neighbors=20, std_ratio=2.0):
     """
-    PLY 파일(포인트 클라우드)을 최적화하고 압축합니다.
+    메모리에 있는 포인트 클라우드를 최적화해 새 포인트 클라우드를 반환합니다.
 
     과정:
     1. 통계적 이상점 제거 (Statistical Outlier Removal)
     2. 복셀 그리드 다운샘플링 (Voxel Grid Downsampling)
-    3. 바이너리 형식으로 저장하여 압축
 
-    :param input_path: 입력 PLY 파일 경로
-    :param output_path: 저장할 최적화된 PLY 파일 경로
+    :param pcd: open3d.geometry.PointCloud
     :param voxel_size: 다운샘플링 시 사용할 복셀(3D 픽셀)의 크기. 클수록 더 많이 압축됩니다.
     :param nb_neighbors: 이상점 계산 시 고려할 이웃 포인트의 수.
     :param std_ratio: 이상점으로 판단할 표준 편차의 배수. 클수록 이상점을 덜 제거합니다.
     """
-    print(f"'{input_path}' 파일 로딩 중...")
-    try:
-        pcd = o3d.io.read_point_cloud(input_path)
-        if not pcd.has_points():
-            print("오류: 포인트 클라우드를 로드할 수 없거나 포인트가 없습니다.")
-            return
-    except Exception as e:
-        print(f"파일 로딩 중 오류 발생: {e}")
-        return
-
     original_point_count = len(pcd.points)
     print(f"최적화 전 포인트 수: {original_point_count}")
 
@@ -43,6 +31,46 @@ def optimize_ply(input_path, output_path, voxel_size=0.01, nb_neighbors=20, std_
     pcd = pcd.voxel_down_sample(voxel_size=voxel_size)
     points_after_downsampling = len(pcd.points)
     print(f"다운샘플링 후 포인트 수: {points_after_downsampling} ({points_after_outlier_removal - points_after_downsampling}개 제거)")
+    return pcd
+
+
+def optimize_ply(input_path, output_path, voxel_size=0.01, nb_neighbors=20, std_ratio=2.0, pcd=None,
+                 engine='open3d'):
+    """
+    PLY 파일(포인트 클라우드)을 최적화하고 바이너리 형식으로 저장해 압축합니다.
+    pcd 를 주면 input_path 를 다시 읽지 않고 그 포인트 클라우드를 사용합니다.
+    engine='numpy' 면 memmap + 타일 병렬 처리 엔진(ply_numpy)을 쓰고,
+    그 엔진이 읽을 수 없는 형식(ascii PLY 등)이면 Open3D 로 처리합니다.
+    성공하면 output_path, 실패하면 None 을 반환합니다.
+
+    :param input_path: 입력 PLY 파일 경로
+    :param output_path: 저장할 최적화된 PLY 파일 경로
+    :param voxel_size: 다운샘플링 시 사용할 복셀(3D 픽셀)의 크기. 클수록 더 많이 압축됩니다.
+    :param nb_neighbors: 이상점 계산 시 고려할 이웃 포인트의 수.
+    :param std_ratio: 이상점으로 판단할 표준 편차의 배수. 클수록 이상점을 덜 제거합니다.
+    :param pcd: 이미 메모리에 있는 open3d.geometry.PointCloud (선택)
+    :param engine: 'open3d' | 'numpy'
+    """
+    if engine == 'numpy' and pcd is None:
+        from ply_numpy import optimize_ply_numpy
+        try:
+            return optimize_ply_numpy(input_path, output_path, voxel_size=voxel_size,
+                                      nb_neighbors=nb_neighbors, std_ratio=std_ratio)
+        except ValueError as e:
+            print(f"numpy 엔진으로 읽을 수 없어 Open3D 로 처리합니다: {e}")
+
+    if pcd is None:
+        print(f"'{input_path}' 파일 로딩 중...")
+        try:
+            pcd = o3d.io.read_point_cloud(input_path)
+        except Exception as e:
+            print(f"파일 로딩 중 오류 발생: {e}")
+            return None
+    if not pcd.has_points():
+        print("오류: 포인트 클라우드를 로드할 수 없거나 포인트가 없습니다.")
+        return None
+
+    pcd = optimize_point_cloud(pcd, voxel_size=voxel_size, nb_neighbors=nb_neighbors, std_ratio=std_ratio)
 
     # 3. 바이너리 형식으로 저장
     print("3단계: 바이너리 PLY 형식으로 파일 저장 중...")
@@ -50,15 +78,18 @@ def optimize_ply(input_path, output_path, voxel_size=0.01, nb_neighbors=20, std_
         o3d.io.write_point_cloud(output_path, pcd, write_ascii=False)
         final_size = os.path.getsize(output_path)
         print(f"성공! 최적화된 파일이 '{output_path}'에 저장되었습니다.")
-        print(f"최종 포인트 수: {points_after_downsampling}")
+        print(f"최종 포인트 수: {len(pcd.points)}")
         print(f"최종 파일 크기: {final_size / 1024 / 1024:.2f} MB")
 
-        original_size = os.path.getsize(input_path)
-        print(f"원본 파일 크기: {original_size / 1024 / 1024:.2f} MB")
-        print(f"압축률: {original_size / final_size:.2f}배")
+        if input_path and os.path.exists(input_path):
+            original_size = os.path.getsize(input_path)
+            print(f"원본 파일 크기: {original_size / 1024 / 1024:.2f} MB")
+            print(f"압축률: {original_size / final_size:.2f}배")
+        return output_path
 
     except Exception as e:
         print(f"파일 저장 중 오류 발생: {e}")
+        return None
 
 
 import argparse
@@ -69,10 +100,13 @@ if __name__ == '__main__':
     parser.add_argument('output_file', type=str, help='Output PLY file path.')
     parser.add_argument('--voxel_size', type=float, default=0.02, help='Voxel size for downsampling.')
     parser.add_argument('--std_ratio', type=float, default=5.0, help='Standard deviation ratio for outlier removal.')
+    parser.add_argument('--engine', choices=['open3d', 'numpy'], default='open3d',
+                        help='numpy: memmap + tiled parallel outlier removal (bounded memory).')
 
     args = parser.parse_args()
 
     if not os.path.exists(args.input_file):
         print(f"Error: Input file '{args.input_file}' not found.")
     else:
-        optimize_ply(args.input_file, args.output_file, voxel_size=args.voxel_size, std_ratio=args.std_ratio)
+        optimize_ply(args.input_file, args.output_file, voxel_size=args.voxel_size, std_ratio=args.std_ratio,
+                     engine=args.engine)
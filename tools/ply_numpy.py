@@ -0,0 +1,269 @@
+# tools/ply_numpy.py
+# Open3D 없이 numpy/scipy 만으로 PLY 포인트 클라우드를 최적화하는 엔진
+# - 바이너리 PLY 를 memmap 으로 열어 청크 단위로 읽음 (원본 전체를 메모리에 올리지 않음)
+# - 복셀 다운샘플링을 먼저 해서 kNN 대상 포인트 수를 줄임
+# - 공간을 타일로 나눠, 타일마다 halo(경계 여유분)를 포함한 KD-tree 로 통계적 이상점 제거를 병렬 수행
+import os
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+from scipy.spatial import cKDTree
+
+# PLY 타입 이름 -> numpy 타입 코드
+_PLY_TYPES = {
+    'char': 'i1', 'int8': 'i1',
+    'uchar': 'u1', 'uint8': 'u1',
+    'short': 'i2', 'int16': 'i2',
+    'ushort': 'u2', 'uint16': 'u2',
+    'int': 'i4', 'int32': 'i4',
+    'uint': 'u4', 'uint32': 'u4',
+    'float': 'f4', 'float32': 'f4',
+    'double': 'f8', 'float64': 'f8',
+}
+_NP_TO_PLY = {'i1': 'char', 'u1': 'uchar', 'i2': 'short', 'u2': 'ushort',
+              'i4': 'int', 'u4': 'uint', 'f4': 'float', 'f8': 'double'}
+
+
+def read_ply_memmap(path):
+    """
+    바이너리 PLY 의 vertex 를 구조화 배열 memmap 으로 엽니다. (vertex 외 element 가 없는 포인트 클라우드만)
+    ascii PLY 등 지원하지 않는 형식이면 ValueError.
+    """
+    with open(path, 'rb') as f:
+        if f.readline().strip() != b'ply':
+            raise ValueError(f"PLY 파일이 아닙니다: {path}")
+        fmt = None
+        count = None
+        fields = []
+        elements = []
+        while True:
+            line = f.readline()
+            if not line:
+                raise ValueError("PLY 헤더가 끝나지 않았습니다.")
+            tokens = line.decode('ascii', errors='replace').split()
+            if not tokens or tokens[0] in ('comment', 'obj_info'):
+                continue
+            if tokens[0] == 'end_header':
+                break
+            if tokens[0] == 'format':
+                fmt = tokens[1]
+            elif tokens[0] == 'element':
+                elements.append(tokens[1])
+                if tokens[1] == 'vertex':
+                    count = int(tokens[2])
+            elif tokens[0] == 'property' and elements and elements[-1] == 'vertex':
+                if tokens[1] == 'list':
+                    raise ValueError("vertex 의 list 속성은 지원하지 않습니다.")
+                fields.append((tokens[2], _PLY_TYPES[tokens[1]]))
+        offset = f.tell()
+
+    if fmt not in ('binary_little_endian', 'binary_big_endian'):
+        raise ValueError(f"지원하지 않는 PLY 형식: {fmt}")
+    if elements != ['vertex'] or count is None:
+        raise ValueError(f"vertex 만 있는 PLY 만 지원합니다: {elements}")
+    endian = '<' if fmt == 'binary_little_endian' else '>'
+    dtype = np.dtype([(name, endian + code) for name, code in fields])
+    return np.memmap(path, dtype=dtype, mode='r', offset=offset, shape=(count,))
+
+
+def write_ply(path, data):
+    """구조화 배열을 binary_little_endian PLY 로 저장합니다."""
+    data = np.asarray(data)
+    dtype = data.dtype.newbyteorder('<')
+    header = ['ply', 'format binary_little_endian 1.0', f'element vertex {len(data)}']
+    for name in dtype.names:
+        header.append(f"property {_NP_TO_PLY[dtype[name].str[1:]]} {name}")
+    header.append('end_header')
+    tmp_path = f"{path}.tmp"
+    with open(tmp_path, 'wb') as f:
+        f.write(('\n'.join(header) + '\n').encode('ascii'))
+        data.astype(dtype, copy=False).tofile(f)
+    os.replace(tmp_path, path)
+
+
+def _xyz(block):
+    return np.stack([block['x'], block['y'], block['z']], axis=1).astype(np.float64)
+
+
+def voxel_downsample(vertices, voxel_size, chunk_points=2_000_000):
+    """
+    복셀마다 포인트들의 평균(좌표/색상 등 모든 속성)을 남깁니다. (Open3D voxel_down_sample 과 같은 방식)
+    청크 단위로 부분합을 만든 뒤 합치므로, 메모리는 청크 하나 + 출력 복셀 수에 비례합니다.
+    """
+    n = len(vertices)
+    lo = np.full(3, np.inf)
+    for start in range(0, n, chunk_points):
+        lo = np.minimum(lo, _xyz(vertices[start:start + chunk_points]).min(axis=0))
+
+    names = vertices.dtype.names
+    keys_parts, sums_parts, counts_parts = [], [], []
+    for start in range(0, n, chunk_points):
+        block = np.asarray(vertices[start:start + chunk_points])
+        idx = np.floor((_xyz(block) - lo) / voxel_size).astype(np.int64)
+        # 복셀 좌표 3개를 int64 하나로 (좌표당 21비트)
+        keys = (idx[:, 0] << 42) | (idx[:, 1] << 21) | idx[:, 2]
+        uniq, inv = np.unique(keys, return_inverse=True)
+        values = np.stack([block[name].astype(np.float64) for name in names], axis=1)
+        sums = np.stack([np.bincount(inv, weights=values[:, i], minlength=len(uniq))
+                         for i in range(len(names))], axis=1)
+        keys_parts.append(uniq)
+        sums_parts.append(sums)
+        counts_parts.append(np.bincount(inv, minlength=len(uniq)))
+
+    keys = np.concatenate(keys_parts)
+    uniq, inv = np.unique(keys, return_inverse=True)
+    partial = np.concatenate(sums_parts)
+    sums = np.stack([np.bincount(inv, weights=partial[:, i], minlength=len(uniq))
+                     for i in range(len(names))], axis=1)
+    counts = np.bincount(inv, weights=np.concatenate(counts_parts), minlength=len(uniq))
+    means = sums / counts[:, None]
+
+    out = np.empty(len(uniq), dtype=vertices.dtype.newbyteorder('='))
+    for i, name in enumerate(names):
+        if np.issubdtype(out.dtype[name], np.integer):
+            info = np.iinfo(out.dtype[name])
+            out[name] = np.clip(np.rint(means[:, i]), info.min, info.max)
+        else:
+            out[name] = means[:, i]
+    return out
+
+
+def _knn_distances(points, cand, query, nb_neighbors):
+    """query 포인트들의 cand 안 k-이웃 거리 (len(query), min(k, len(cand)))."""
+    k = min(nb_neighbors, len(cand))
+    dist, _ = cKDTree(points[cand]).query(points[query], k=k)
+    return dist[:, None] if k == 1 else dist
+
+
+def _tile_mean_distances(points, order, bounds, tile_keys, rel, tile_key, tile_size, halo, nb_neighbors):
+    """
+    타일 하나의 (core 포인트 인덱스, 각 포인트의 k-이웃 평균 거리). 이웃은 halo 까지 포함해서 찾습니다.
+    halo 안에서 이웃을 k개 못 찾았거나 k번째 이웃이 halo 보다 먼 포인트(고립된 점)는 결과가 정확하지 않으므로
+    인접 타일 전체부터 시작해 범위를 2배씩 넓혀 다시 찾습니다. (고립 이상점이 자기 자신만 보고 평균 거리 0으로 남지 않도록)
+    """
+    core = order[bounds[tile_key][0]:bounds[tile_key][1]]
+    neighbor_tiles = [
+        tuple(np.add(tile_key, (dx, dy, dz)))
+        for dx in (-1, 0, 1) for dy in (-1, 0, 1) for dz in (-1, 0, 1)
+    ]
+    cand = np.concatenate([order[bounds[t][0]:bounds[t][1]] for t in neighbor_tiles if t in bounds])
+    lo = np.asarray(tile_key) * tile_size - halo
+    hi = (np.asarray(tile_key) + 1) * tile_size + halo
+    p = rel[cand]
+    cand = cand[np.all((p >= lo) & (p < hi), axis=1)]
+
+    dist = _knn_distances(points, cand, core, nb_neighbors)
+    mean = dist.mean(axis=1)
+    # 타일 경계에서 reach 이내의 이웃만 확실히 포함되어 있음
+    pending = np.full(len(core), dist.shape[1] < nb_neighbors) | (dist[:, -1] > halo)
+
+    ring = 0
+    while pending.any():
+        ring = max(1, ring * 2)  # 인접 27개 타일 전체 -> 5^3 -> 9^3 ...
+        near = tile_keys[np.max(np.abs(tile_keys - np.asarray(tile_key)), axis=1) <= ring]
+        cand = np.concatenate([order[bounds[tuple(t)][0]:bounds[tuple(t)][1]] for t in near])
+        q = np.flatnonzero(pending)
+        dist = _knn_distances(points, cand, core[q], nb_neighbors)
+        mean[q] = dist.mean(axis=1)
+        if len(near) == len(tile_keys):
+            break  # 전체 포인트를 봤으므로 정확
+        pending[q] = (dist.shape[1] < nb_neighbors) | (dist[:, -1] > ring * tile_size)
+    return core, mean
+
+
+def remove_statistical_outliers_tiled(points, nb_neighbors=20, std_ratio=2.0,
+                                      tile_size=None, halo=None, workers=None):
+    """
+    Open3D remove_statistical_outlier 와 같은 기준(자기 자신 포함 k-이웃 평균 거리가
+    전체 평균 + std_ratio * 표준편차 이상이면 제거)을 타일 단위로 병렬 계산합니다.
+    halo 밖까지 이웃을 찾아야 하는 포인트는 범위를 넓혀 다시 찾으므로 전체를 한 번에 계산한 결과와 같습니다.
+    남길 포인트의 boolean 마스크를 반환합니다.
+    """
+    n = len(points)
+    if n == 0:
+        return np.zeros(0, dtype=bool)
+    lo = points.min(axis=0)
+    rel = points - lo
+    if tile_size is None:
+        # 타일당 대략 20만 포인트가 되도록
+        extent = np.maximum(rel.max(axis=0), 1e-9)
+        tiles_wanted = max(1, n // 200_000)
+        tile_size = float(np.cbrt(np.prod(extent) / tiles_wanted))
+        tile_size = max(tile_size, float(extent.max()) / 256)
+    if halo is None:
+        halo = tile_size * 0.1
+    # 이웃 후보를 인접 27개 타일에서만 찾으므로 halo 는 타일 크기를 넘을 수 없음
+    tile_size = max(tile_size, halo)
+
+    tile_idx = np.floor(rel / tile_size).astype(np.int64)
+    tile_ids = (tile_idx[:, 0] << 42) | (tile_idx[:, 1] << 21) | tile_idx[:, 2]
+    order = np.argsort(tile_ids, kind='stable')
+    sorted_ids = tile_ids[order]
+    starts = np.flatnonzero(np.r_[True, sorted_ids[1:] != sorted_ids[:-1]])
+    ends = np.r_[starts[1:], n]
+    bounds = {tuple(tile_idx[order[s]]): (s, e) for s, e in zip(starts, ends)}
+    tile_keys = np.array(list(bounds), dtype=np.int64).reshape(-1, 3)
+
+    mean_dist = np.empty(n)
+    with ThreadPoolExecutor(max_workers=workers or os.cpu_count()) as ex:
+        # cKDTree 질의는 GIL 을 놓으므로 스레드로 병렬화됩니다.
+        futures = [
+            ex.submit(_tile_mean_distances, points, order, bounds, tile_keys, rel, key, tile_size, halo,
+                      nb_neighbors)
+            for key in bounds
+        ]
+        for fut in futures:
+            core, d = fut.result()
+            mean_dist[core] = d
+
+    avg = mean_dist.mean()
+    std = mean_dist.std(ddof=1) if n > 1 else 0.0
+    return mean_dist < avg + std_ratio * std
+
+
+def optimize_ply_numpy(input_path, output_path, voxel_size=0.01, nb_neighbors=20, std_ratio=2.0,
+                       tile_size=None, halo=None, workers=None, chunk_points=2_000_000):
+    """
+    optimize_ply 의 numpy 엔진. 복셀 다운샘플링 -> 타일 단위 통계적 이상점 제거 -> 바이너리 저장.
+    (Open3D 엔진과 순서가 반대라 결과 포인트 수는 약간 다를 수 있습니다.)
+    성공하면 output_path, 실패하면 None 을 반환합니다. 지원하지 않는 PLY 형식이면 ValueError.
+    """
+    print(f"'{input_path}' 파일 매핑 중...")
+    vertices = read_ply_memmap(input_path)
+    original_point_count = len(vertices)
+    print(f"최적화 전 포인트 수: {original_point_count}")
+    if original_point_count == 0:
+        print("오류: 포인트가 없습니다.")
+        return None
+
+    # 1. 복셀 그리드 다운샘플링
+    print(f"1단계: 복셀 크기 {voxel_size}로 다운샘플링 진행 중...")
+    down = voxel_downsample(vertices, voxel_size, chunk_points=chunk_points)
+    del vertices
+    print(f"다운샘플링 후 포인트 수: {len(down)} ({original_point_count - len(down)}개 제거)")
+
+    # 2. 타일 단위 통계적 이상점 제거 (halo 기본값: 복셀 4칸)
+    print("2단계: 타일 단위 통계적 이상점 제거 진행 중...")
+    keep = remove_statistical_outliers_tiled(
+        _xyz(down), nb_neighbors=nb_neighbors, std_ratio=std_ratio,
+        tile_size=tile_size, halo=halo if halo is not None else voxel_size * 4, workers=workers,
+    )
+    result = down[keep]
+    print(f"이상점 제거 후 포인트 수: {len(result)} ({len(down) - len(result)}개 제거)")
+
+    # 3. 바이너리 형식으로 저장
+    print("3단계: 바이너리 PLY 형식으로 파일 저장 중...")
+    try:
+        write_ply(output_path, result)
+    except Exception as e:
+        print(f"파일 저장 중 오류 발생: {e}")
+        return None
+    final_size = os.path.getsize(output_path)
+    original_size = os.path.getsize(input_path)
+    print(f"성공! 최적화된 파일이 '{output_path}'에 저장되었습니다.")
+    print(f"최종 포인트 수: {len(result)}")
+    print(f"최종 파일 크기: {final_size / 1024 / 1024:.2f} MB")
+    print(f"원본 파일 크기: {original_size / 1024 / 1024:.2f} MB")
+    print(f"압축률: {original_size / final_size:.2f}배")
+    return output_path
+